@@ -1,14 +1,42 @@
 # backend/api_server.py
+import asyncio
+import base64
+import hashlib
+import json
 import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape as xml_escape
 
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from auth_utils import create_access_token, decode_token, verify_password
+from etl_customer_reports import MODULE_XML_RENDERERS
+from etl_unified_customer_reports import build_unified_xml
+from report_codec import CONTENT_ENCODINGS, decode_doc
+from report_store import fetch_blob, join_doc, module_json_head, unified_json_head
+from report_stream import (
+    BROTLI,
+    GZIP,
+    brotli,
+    compress_chunks,
+    decode_chunks,
+    json_string_chunks,
+    read_stored_chunks,
+    stored_size,
+)
 
 # -----------------------------
 # ENV (load database.env explicitly)
@@ -38,7 +66,30 @@ DEFAULT_DB = Path(__file__).resolve().parent.parent / "database" / "MCH_DB.db"
 DB_PATH = Path(os.getenv("EURCOM_DB_PATH", str(DEFAULT_DB))).expanduser().resolve()
 
 
+# Read paths share a pool of read-only connections (query_only, mmap, larger page and
+# statement caches); one connection per request through the get_db dependency, which
+# FastAPI caches per request so get_current_user and the endpoint use the same one; a
+# streamed response body keeps using it until sent (stream_report).
+# Read endpoints are async: their queries run on a dedicated DB executor (run_db), so
+# they don't queue behind login hashing or other work in the shared worker threads.
+DB_POOL_SIZE = int(os.getenv("EURCOM_DB_POOL_SIZE", "8"))
+DB_WORKERS = int(os.getenv("EURCOM_DB_WORKERS", str(DB_POOL_SIZE)))
+DB_POOL_TIMEOUT = float(os.getenv("EURCOM_DB_POOL_TIMEOUT", "5"))
+DB_MMAP_SIZE = int(os.getenv("EURCOM_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KIB = int(os.getenv("EURCOM_DB_CACHE_SIZE_KIB", str(32 * 1024)))
+DB_STATEMENT_CACHE = int(os.getenv("EURCOM_DB_STATEMENT_CACHE", "256"))
+
+_db_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_db_pool_lock = threading.Lock()
+_db_pool_open = 0
+# checked-out connections with more than one holder (a request and its streamed body)
+_db_conn_holders: Dict[sqlite3.Connection, int] = {}
+_db_conn_discard: Set[sqlite3.Connection] = set()
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="eurcom-db")
+
+
 def get_conn() -> sqlite3.Connection:
+    """Read-write connection (login); read paths use get_db."""
     if not DB_PATH.exists():
         raise RuntimeError(f"Database not found: {DB_PATH}")
     conn = sqlite3.connect(str(DB_PATH))
@@ -46,6 +97,120 @@ def get_conn() -> sqlite3.Connection:
     return conn
 
 
+def open_read_conn() -> sqlite3.Connection:
+    if not DB_PATH.exists():
+        raise RuntimeError(f"Database not found: {DB_PATH}")
+    # check_same_thread=False: a request's dependency setup and teardown may run on
+    # different worker threads; a connection is only used by one request at a time
+    conn = sqlite3.connect(
+        f"{DB_PATH.as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KIB}")
+    return conn
+
+
+def acquire_read_conn() -> sqlite3.Connection:
+    global _db_pool_open
+    try:
+        return _db_pool.get_nowait()
+    except queue.Empty:
+        pass
+
+    with _db_pool_lock:
+        can_open = _db_pool_open < DB_POOL_SIZE
+        if can_open:
+            _db_pool_open += 1
+    if can_open:
+        try:
+            return open_read_conn()
+        except Exception:
+            with _db_pool_lock:
+                _db_pool_open -= 1
+            raise
+
+    try:
+        return _db_pool.get(timeout=DB_POOL_TIMEOUT)
+    except queue.Empty:
+        raise HTTPException(
+            status_code=503,
+            detail="Database busy, try again",
+            headers={"Retry-After": "1"},
+        )
+
+
+def hold_read_conn(conn: sqlite3.Connection):
+    """One more holder of a checked-out connection; it goes back on the last release_read_conn()."""
+    with _db_pool_lock:
+        _db_conn_holders[conn] = _db_conn_holders.get(conn, 1) + 1
+
+
+def release_read_conn(conn: sqlite3.Connection, discard: bool = False):
+    global _db_pool_open
+    with _db_pool_lock:
+        holders = _db_conn_holders.pop(conn, 1) - 1
+        if holders:
+            _db_conn_holders[conn] = holders
+            if discard:
+                _db_conn_discard.add(conn)
+            return
+        if conn in _db_conn_discard:
+            _db_conn_discard.remove(conn)
+            discard = True
+    if not discard:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+    if discard:
+        conn.close()
+        with _db_pool_lock:
+            _db_pool_open -= 1
+        return
+    _db_pool.put(conn)
+
+
+async def run_db(fn: Callable, *args) -> Any:
+    """fn(*args) on the DB executor."""
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, partial(fn, *args))
+
+
+@contextmanager
+def pooled_read_conn():
+    """A pooled read-only connection outside a request's dependencies (startup warm-up)."""
+    conn = acquire_read_conn()
+    discard = False
+    try:
+        yield conn
+    except sqlite3.Error:
+        discard = True
+        raise
+    finally:
+        release_read_conn(conn, discard)
+
+
+async def get_db():
+    """FastAPI dependency: one pooled read-only connection per request."""
+    # waiting for a free connection happens off the DB executor: its threads are busy
+    # running the queries of the requests that hold the connections
+    conn = await asyncio.to_thread(acquire_read_conn)
+    discard = False
+    try:
+        yield conn
+    except sqlite3.Error:
+        # don't hand a connection that failed mid-query to the next request
+        discard = True
+        raise
+    finally:
+        release_read_conn(conn, discard)
+
+
 def row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
     return {k: row[k] for k in row.keys()}
 
@@ -107,7 +272,11 @@ def count_distinct_customer_id(
 # -----------------------------
 @app.get("/api/health")
 def health():
-    return {"ok": True, "db_path": str(DB_PATH)}
+    return {
+        "ok": True,
+        "db_path": str(DB_PATH),
+        "db_pool": {"size": DB_POOL_SIZE, "open": _db_pool_open, "idle": _db_pool.qsize()},
+    }
 
 
 @app.get("/api/routes")
@@ -126,15 +295,34 @@ def routes():
 
 # -----------------------------
 # Auth
+# Argon2 verification runs on its own small executor: at most LOGIN_HASH_WORKERS hashes
+# at a time and LOGIN_HASH_QUEUE more waiting; past that, login answers 503 + Retry-After
+# instead of taking over the worker threads during a burst of logins.
 # -----------------------------
-@app.post("/api/auth/login")
-def login(payload: Dict[str, Any]):
-    username = (payload or {}).get("username")
-    password = (payload or {}).get("password")
+LOGIN_HASH_WORKERS = int(os.getenv("EURCOM_LOGIN_HASH_WORKERS", "2"))
+LOGIN_HASH_QUEUE = int(os.getenv("EURCOM_LOGIN_HASH_QUEUE", "32"))
+LOGIN_RETRY_AFTER = os.getenv("EURCOM_LOGIN_RETRY_AFTER", "2")
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=LOGIN_HASH_WORKERS, thread_name_prefix="eurcom-argon2"
+)
+_hash_slots = threading.BoundedSemaphore(LOGIN_HASH_WORKERS + LOGIN_HASH_QUEUE)
 
-    if not username or not password:
-        raise HTTPException(status_code=400, detail="Missing username/password")
 
+async def verify_password_bounded(password: str, password_hash: str) -> bool:
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logins in progress, try again",
+            headers={"Retry-After": LOGIN_RETRY_AFTER},
+        )
+    future = _hash_executor.submit(verify_password, password, password_hash)
+    # the slot is freed when the hash is done, even if the client went away meanwhile
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+
+def fetch_login_user(username: str) -> Optional[sqlite3.Row]:
     conn = get_conn()
     try:
         cur = conn.cursor()
@@ -146,30 +334,115 @@ def login(payload: Dict[str, Any]):
             """,
             (username,),
         )
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        if not row["is_active"]:
-            raise HTTPException(status_code=403, detail="User disabled")
-        if not verify_password(password, row["password_hash"]):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return cur.fetchone()
+    finally:
+        conn.close()
 
-        cur.execute(
+
+def record_login(user_id: int):
+    conn = get_conn()
+    try:
+        conn.execute(
             "UPDATE ecs_users SET last_login_at = datetime('now') WHERE id = ?",
-            (row["id"],),
+            (user_id,),
         )
         conn.commit()
-
-        token = create_access_token(
-            sub=row["username"], role=row["role"], user_id=row["id"]
-        )
-        return {"access_token": token, "token_type": "bearer"}
     finally:
         conn.close()
 
 
-def get_current_user(
+@app.post("/api/auth/login")
+async def login(payload: Dict[str, Any]):
+    username = (payload or {}).get("username")
+    password = (payload or {}).get("password")
+
+    if not username or not password:
+        raise HTTPException(status_code=400, detail="Missing username/password")
+
+    row = await run_db(fetch_login_user, username)
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not row["is_active"]:
+        raise HTTPException(status_code=403, detail="User disabled")
+    if not await verify_password_bounded(password, row["password_hash"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    await run_db(record_login, row["id"])
+
+    token = create_access_token(
+        sub=row["username"], role=row["role"], user_id=row["id"]
+    )
+    return {"access_token": token, "token_type": "bearer"}
+
+
+def fetch_user(conn: sqlite3.Connection, uid: int) -> Optional[sqlite3.Row]:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id, username, role, customer_id, is_active FROM ecs_users WHERE id = ?",
+        (uid,),
+    )
+    return cur.fetchone()
+
+
+# -----------------------------
+# Principal cache
+# Active principals are cached by uid for PRINCIPAL_TTL seconds (bounded LRU). At most every
+# PRINCIPAL_VERSION_CHECK seconds a request reads ecs_users_version, which triggers bump on
+# any role / customer_id / is_active change or delete (sql/001_auth.sql); when it moved, the
+# whole cache is dropped, so a deactivation takes effect within that interval. Without the
+# version table, entries simply expire after the TTL.
+# -----------------------------
+PRINCIPAL_CACHE_SIZE = int(os.getenv("EURCOM_PRINCIPAL_CACHE_SIZE", "4096"))
+PRINCIPAL_TTL = float(os.getenv("EURCOM_PRINCIPAL_TTL", "60"))
+PRINCIPAL_VERSION_CHECK = float(os.getenv("EURCOM_PRINCIPAL_VERSION_CHECK", "2"))
+
+_principal_cache: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_principal_cache_lock = threading.Lock()
+_principal_version: Optional[int] = None
+_principal_checked_at = float("-inf")
+
+
+def fetch_users_version(conn: sqlite3.Connection) -> Optional[int]:
+    try:
+        row = conn.execute("SELECT version FROM ecs_users_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # database without sql/001_auth.sql's version table
+        return None
+    return row[0] if row else None
+
+
+def sync_principal_cache(version: Optional[int], now: float):
+    global _principal_version, _principal_checked_at
+    with _principal_cache_lock:
+        if version != _principal_version:
+            _principal_cache.clear()
+        _principal_version = version
+        _principal_checked_at = now
+
+
+def cached_principal(uid: int, now: float) -> Optional[Dict[str, Any]]:
+    with _principal_cache_lock:
+        entry = _principal_cache.get(uid)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _principal_cache[uid]
+            return None
+        _principal_cache.move_to_end(uid)
+        return entry[1]
+
+
+def cache_principal(uid: int, user: Dict[str, Any], now: float):
+    with _principal_cache_lock:
+        _principal_cache[uid] = (now + PRINCIPAL_TTL, user)
+        _principal_cache.move_to_end(uid)
+        while len(_principal_cache) > PRINCIPAL_CACHE_SIZE:
+            _principal_cache.popitem(last=False)
+
+
+async def get_current_user(
     authorization: Optional[str] = Header(default=None),
+    conn: sqlite3.Connection = Depends(get_db),
 ) -> Dict[str, Any]:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
@@ -184,243 +457,1207 @@ def get_current_user(
     if uid is None:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, username, role, customer_id, is_active FROM ecs_users WHERE id = ?",
-            (uid,),
-        )
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=401, detail="User not found")
-        if not row["is_active"]:
-            raise HTTPException(status_code=403, detail="User disabled")
-
-        return {
-            "id": row["id"],
-            "username": row["username"],
-            "role": row["role"],
-            "customer_id": row["customer_id"],
-        }
-    finally:
-        conn.close()
+    now = time.monotonic()
+    if now - _principal_checked_at >= PRINCIPAL_VERSION_CHECK:
+        sync_principal_cache(await run_db(fetch_users_version, conn), now)
+
+    user = cached_principal(uid, now)
+    if user is not None:
+        return dict(user)
+
+    row = await run_db(fetch_user, conn, uid)
+    if not row:
+        raise HTTPException(status_code=401, detail="User not found")
+    if not row["is_active"]:
+        raise HTTPException(status_code=403, detail="User disabled")
+
+    user = {
+        "id": row["id"],
+        "username": row["username"],
+        "role": row["role"],
+        "customer_id": row["customer_id"],
+    }
+    cache_principal(uid, user, now)
+    return dict(user)
 
 
 @app.get("/api/me")
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user)):
     return user
 
 
-def require_employee(user=Depends(get_current_user)):
+async def require_employee(user=Depends(get_current_user)):
     if user["role"] not in ("EMPLOYEE", "ADMIN"):
         raise HTTPException(status_code=403, detail="Employee access required")
     return user
 
 
-def require_customer(user=Depends(get_current_user)):
+async def require_customer(user=Depends(get_current_user)):
     if user["role"] != "CUSTOMER":
         raise HTTPException(status_code=403, detail="Customer access required")
     return user
 
 
+async def require_admin(user=Depends(get_current_user)):
+    if user["role"] != "ADMIN":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
 # -----------------------------
 # Customer source detection (NO hardcoding)
+# The tables with a customer_id column, the chosen customer source and its name columns
+# are worked out once and cached until PRAGMA schema_version changes (data_version can't
+# key a shared cache: it is per connection). After a data-only change that should move
+# the choice, e.g. loading ecs_customers, use POST /api/admin/catalog/refresh.
+# Per-table row counts are only needed by /api/debug/customers-sources (or when
+# ecs_customers is empty) and are cached with the catalog once computed.
 # -----------------------------
-def pick_best_customer_source(conn: sqlite3.Connection) -> Tuple[str, str]:
-    # Prefer ecs_customers if populated
-    if table_exists(conn, "ecs_customers"):
-        cols = {c.lower(): c for c in get_table_columns(conn, "ecs_customers")}
-        if "customer_id" in cols and count_rows(conn, "ecs_customers") > 0:
-            return ("ecs_customers", cols["customer_id"])
+_source_catalog: Optional[Dict[str, Any]] = None
+_source_catalog_lock = threading.Lock()
+
+
+def has_rows(conn: sqlite3.Connection, table_name: str) -> bool:
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT 1 FROM {table_name} LIMIT 1")
+        return cur.fetchone() is not None
+    except Exception:
+        return False
+
+
+def customer_table_stats(
+    conn: sqlite3.Connection, customer_id_tables: Dict[str, str]
+) -> List[Dict[str, Any]]:
+    stats = [
+        {
+            "table": t,
+            "customer_id_col": col,
+            "rows": count_rows(conn, t),
+            "distinct_customer_id": count_distinct_customer_id(conn, t, col),
+        }
+        for t, col in customer_id_tables.items()
+    ]
+    stats.sort(key=lambda x: x["distinct_customer_id"], reverse=True)
+    return stats
 
-    # Scan all tables with customer_id and pick max distinct
-    candidates: List[Tuple[str, str, int]] = []
+
+def build_source_catalog(conn: sqlite3.Connection, schema_version: int) -> Dict[str, Any]:
+    customer_id_tables: Dict[str, str] = {}
     for t in list_tables(conn):
-        cols = get_table_columns(conn, t)
-        if not cols:
-            continue
-        lower = {c.lower(): c for c in cols}
-        if "customer_id" not in lower:
-            continue
-        col = lower["customer_id"]
-        dcount = count_distinct_customer_id(conn, t, col)
-        if dcount > 0:
-            candidates.append((t, col, dcount))
+        lower = {c.lower(): c for c in get_table_columns(conn, t)}
+        if "customer_id" in lower:
+            customer_id_tables[t] = lower["customer_id"]
+
+    catalog: Dict[str, Any] = {
+        "schema_version": schema_version,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "customer_id_tables": customer_id_tables,
+        "chosen": None,
+        "name_columns": (None, None),
+        "stats": None,
+    }
+
+    # Prefer ecs_customers if populated
+    cols = {c.lower(): c for c in get_table_columns(conn, "ecs_customers")}
+    if "customer_id" in cols and has_rows(conn, "ecs_customers"):
+        catalog["chosen"] = ("ecs_customers", cols["customer_id"])
+        catalog["name_columns"] = (
+            cols.get("first_name") or cols.get("name"),
+            cols.get("last_name") or cols.get("surname"),
+        )
+        return catalog
+
+    # Otherwise the table with the most distinct customer_id values
+    catalog["stats"] = customer_table_stats(conn, customer_id_tables)
+    candidates = [x for x in catalog["stats"] if x["distinct_customer_id"] > 0]
+    if candidates:
+        catalog["chosen"] = (candidates[0]["table"], candidates[0]["customer_id_col"])
+    return catalog
+
+
+def get_source_catalog(conn: sqlite3.Connection, with_stats: bool = False) -> Dict[str, Any]:
+    global _source_catalog
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    catalog = _source_catalog
+    if (
+        catalog is not None
+        and catalog["schema_version"] == schema_version
+        and (catalog["stats"] is not None or not with_stats)
+    ):
+        return catalog
+
+    # one request builds it, concurrent ones wait for the result
+    with _source_catalog_lock:
+        catalog = _source_catalog
+        if catalog is None or catalog["schema_version"] != schema_version:
+            catalog = build_source_catalog(conn, schema_version)
+        if with_stats and catalog["stats"] is None:
+            catalog = dict(catalog, stats=customer_table_stats(conn, catalog["customer_id_tables"]))
+        # no populated source yet: don't keep it, looking again is cheap on empty tables
+        if catalog["chosen"] is not None:
+            _source_catalog = catalog
+    return catalog
+
+
+def refresh_source_catalog(conn: sqlite3.Connection) -> Dict[str, Any]:
+    global _source_catalog
+    with _source_catalog_lock:
+        _source_catalog = None
+    return get_source_catalog(conn)
+
+
+def warm_source_catalog():
+    try:
+        with pooled_read_conn() as conn:
+            get_source_catalog(conn)
+    except Exception as e:
+        print(f"[WARN] source catalog warm-up failed: {e}")
 
-    if not candidates:
+
+@app.on_event("startup")
+async def start_source_catalog():
+    # built in the background: startup doesn't wait for the scans
+    asyncio.get_running_loop().run_in_executor(_db_executor, warm_source_catalog)
+
+
+def pick_best_customer_source(conn: sqlite3.Connection) -> Tuple[str, str]:
+    chosen = get_source_catalog(conn)["chosen"]
+    if chosen is None:
         raise HTTPException(
             status_code=500,
             detail="No table found with a populated customer_id column.",
         )
+    return chosen
 
-    candidates.sort(key=lambda x: x[2], reverse=True)
-    return (candidates[0][0], candidates[0][1])
+
+@app.post("/api/admin/catalog/refresh")
+async def refresh_catalog(
+    user=Depends(require_admin), conn: sqlite3.Connection = Depends(get_db)
+):
+    catalog = await run_db(refresh_source_catalog, conn)
+    chosen = catalog["chosen"]
+    return {
+        "schema_version": catalog["schema_version"],
+        "built_at": catalog["built_at"],
+        "chosen": {"table": chosen[0], "customer_id_col": chosen[1]} if chosen else None,
+        "tables_with_customer_id": sorted(catalog["customer_id_tables"]),
+    }
 
 
 # -----------------------------
 # Customers list (employee-only)
 # -----------------------------
+# Pages are ordered by (last_name, first_name, customer_id) for ecs_customers (served by
+# idx_customers_name, which ends in the rowid) and by customer_id otherwise. Each page
+# returns next_cursor, the opaque sort key of its last row: passing it back as ?cursor=
+# seeks straight to the next page (row-value comparison on the index) instead of stepping
+# over `offset` rows. ?offset= still works.
+def encode_cursor(source_table: str, values: List[Any]) -> str:
+    raw = json.dumps([source_table] + list(values), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, source_table: str, n_keys: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except ValueError:
+        values = None
+    # a cursor from another customer source (catalog changed) can't be continued; the keys
+    # are bound as query parameters, so they must be values SQLite can bind
+    if (
+        not isinstance(values, list)
+        or len(values) != n_keys + 1
+        or values[0] != source_table
+        or not all(cursor_key_ok(v) for v in values[1:])
+    ):
+        raise HTTPException(status_code=400, detail="Invalid or outdated cursor")
+    return values[1:]
+
+
+def cursor_key_ok(value: Any) -> bool:
+    if isinstance(value, int):
+        return -2 ** 63 <= value < 2 ** 63  # SQLite INTEGER range
+    return value is None or isinstance(value, (str, float))
+
+
+def fetch_customers_page(
+    conn: sqlite3.Connection, limit: int, offset: int, cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    source_table, cid_col = pick_best_customer_source(conn)
+    cur = conn.cursor()
+
+    # If the best table is ecs_customers, include names if possible
+    if source_table == "ecs_customers":
+        first, last = get_source_catalog(conn)["name_columns"]
+
+        select_cols = [f"{cid_col} AS customer_id"]
+        select_cols.append(
+            f"{first} AS first_name" if first else "NULL AS first_name"
+        )
+        select_cols.append(f"{last} AS last_name" if last else "NULL AS last_name")
+        distinct = ""
+
+        # (column, output name) of the page order; customer_id last makes it a total order
+        keys = [(col, name) for col, name in ((last, "last_name"), (first, "first_name")) if col]
+        keys.append((cid_col, "customer_id"))
+    else:
+        # Generic distinct listing
+        select_cols = [f"{cid_col} AS customer_id"]
+        distinct = "DISTINCT "
+        keys = [(cid_col, "customer_id")]
+
+    # one row more than asked tells whether there is a next page
+    params: Dict[str, Any] = {"limit": limit + 1, "offset": offset}
+    where = ""
+    if cursor is not None:
+        values = decode_cursor(cursor, source_table, len(keys))
+        where = "WHERE ({}) > ({})".format(
+            ", ".join(col for col, _ in keys), ", ".join(f":k{i}" for i in range(len(keys)))
+        )
+        params.update({f"k{i}": v for i, v in enumerate(values)})
+
+    sql = f"""
+        SELECT {distinct}{", ".join(select_cols)}
+        FROM {source_table}
+        {where}
+        ORDER BY {", ".join(f"{name} ASC" for _, name in keys)}
+        LIMIT :limit OFFSET :offset
+    """
+    cur.execute(sql, params)
+    items = rows_to_dicts(cur.fetchall())
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(source_table, [items[-1][name] for _, name in keys])
+    return {
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "source": source_table,
+        "next_cursor": next_cursor,
+    }
+
+
 @app.get("/api/customers")
-def list_customers(
+async def list_customers(
     limit: int = Query(default=1000, ge=1, le=50000),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None),
     user=Depends(require_employee),
+    conn: sqlite3.Connection = Depends(get_db),
 ):
-    conn = get_conn()
-    try:
-        source_table, cid_col = pick_best_customer_source(conn)
-        cur = conn.cursor()
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
+    return await run_db(fetch_customers_page, conn, limit, offset, cursor)
 
-        # If the best table is ecs_customers, include names if possible
-        if source_table == "ecs_customers":
-            cols = {c.lower(): c for c in get_table_columns(conn, "ecs_customers")}
-            first = cols.get("first_name") or cols.get("name")
-            last = cols.get("last_name") or cols.get("surname")
 
-            select_cols = [f"{cid_col} AS customer_id"]
-            select_cols.append(
-                f"{first} AS first_name" if first else "NULL AS first_name"
-            )
-            select_cols.append(f"{last} AS last_name" if last else "NULL AS last_name")
-
-            order_by = "ORDER BY customer_id ASC"
-            if last and first:
-                order_by = "ORDER BY last_name ASC, first_name ASC"
-            elif last:
-                order_by = "ORDER BY last_name ASC"
-            elif first:
-                order_by = "ORDER BY first_name ASC"
-
-            sql = f"""
-                SELECT {", ".join(select_cols)}
-                FROM {source_table}
-                {order_by}
-                LIMIT :limit OFFSET :offset
-            """
-            cur.execute(sql, {"limit": limit, "offset": offset})
-            items = rows_to_dicts(cur.fetchall())
-            return {
-                "items": items,
-                "limit": limit,
-                "offset": offset,
-                "source": source_table,
-            }
+# -----------------------------
+# Customer search (employee-only)
+# ecs_customer_search is an FTS5 index with one row per customer (rowid = customer_id):
+# names, email, contact values, account numbers and ID document numbers, kept current by
+# triggers (database/Customer_Search.sql). Every word of q must match as a prefix
+# ("jo smi" -> jo* AND smi*). Matches come back in customer_id order, the order FTS5
+# walks its doclists in, so the LIMIT ends the scan early instead of ranking every match
+# first. Declared before /api/customers/{customer_id}, which would match "search".
+# -----------------------------
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_TERMS = 8
+SEARCH_MIN_PREFIX = 2  # shorter prefixes have no prefix index and match most of the table
 
-        # Generic distinct listing
-        sql = f"""
-            SELECT DISTINCT {cid_col} AS customer_id
-            FROM {source_table}
-            ORDER BY customer_id
-            LIMIT :limit OFFSET :offset
+
+def search_match_expr(q: str) -> str:
+    # words as the unicode61 tokenizer splits them; quoted, so FTS5 syntax in q is inert
+    terms = [t for t in re.findall(r"[^\W_]+", q) if len(t) >= SEARCH_MIN_PREFIX]
+    if not terms:
+        raise HTTPException(
+            status_code=400,
+            detail=f"q needs a word of at least {SEARCH_MIN_PREFIX} letters or digits",
+        )
+    return " ".join(f'"{t}"*' for t in terms[:SEARCH_MAX_TERMS])
+
+
+def search_customers(conn: sqlite3.Connection, q: str, limit: int) -> Dict[str, Any]:
+    if not table_exists(conn, "ecs_customer_search"):
+        raise HTTPException(
+            status_code=500,
+            detail="Search index ecs_customer_search not found. Apply database/Customer_Search.sql.",
+        )
+
+    cur = conn.cursor()
+    cur.execute(
         """
-        cur.execute(sql, {"limit": limit, "offset": offset})
-        items = rows_to_dicts(cur.fetchall())
-        return {
-            "items": items,
-            "limit": limit,
-            "offset": offset,
-            "source": source_table,
-        }
-    finally:
-        conn.close()
+        SELECT c.customer_id, c.first_name, c.last_name, c.email
+        FROM ecs_customer_search s
+        JOIN ecs_customers c ON c.customer_id = s.rowid
+        WHERE ecs_customer_search MATCH ?
+        ORDER BY s.rowid
+        LIMIT ?
+        """,
+        (search_match_expr(q), limit),
+    )
+    return {"items": rows_to_dicts(cur.fetchall()), "q": q, "limit": limit}
+
+
+@app.get("/api/customers/search")
+async def search_customers_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(default=SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    user=Depends(require_employee),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    return await run_db(search_customers, conn, q, limit)
 
 
 # -----------------------------
-# Employee-only: customer latest report
+# Report documents
+# json_doc / xml_doc are TEXT or a compressed BLOB, per the row's codec (report_codec.py).
+# xml_doc = '' means the ETL ran with STORE_XML = False: the XML is rendered from json_doc
+# on request and kept in a bounded LRU cache keyed by (run_id, customer_id).
+# Rows with doc_hash set (DEDUP_DOCS) keep their body in ecs_rpt_doc_blobs; the envelope
+# is rebuilt from the row and the run's as_of_date (report_store.py).
+# Responses are streamed: stored documents are read in chunks through the blob API,
+# decoded and JSON-escaped chunk by chunk and compressed on the fly (gzip, or br with the
+# brotli package), so a multi-MB report is never held whole in memory. Rows whose
+# documents have to be rebuilt (deduplicated, XML not stored) are built in memory, as
+# before, and then streamed the same way.
 # -----------------------------
-@app.get("/api/customers/{customer_id}")
-def get_customer_latest_report(customer_id: str, user=Depends(require_employee)):
-    conn = get_conn()
+DOC_MEDIA_TYPES = {"json": "application/json", "xml": "application/xml"}
+XML_CACHE_SIZE = int(os.getenv("EURCOM_XML_CACHE_SIZE", "256"))
+# A stored report row never changes, so responses carry a strong ETag computed from
+# (run_id, customer_id, generated_at) and the representation; If-None-Match is checked
+# against the index-only head query (idx_cr_customer_listing) before any document is read.
+# "private, no-cache": browsers may keep the report but revalidate, since "latest" moves
+# with each run.
+REPORT_CACHE_CONTROL = os.getenv("EURCOM_REPORT_CACHE_CONTROL", "private, no-cache")
+# ?fields= of a report row; json_bytes / xml_bytes are missing on tables written before sizes
+REPORT_FIELDS = ("run_id", "customer_id", "json_doc", "xml_doc", "generated_at", "json_bytes", "xml_bytes")
+REPORT_DOC_COLUMNS = ("json_doc", "xml_doc")
+
+_xml_cache: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+_xml_cache_lock = threading.Lock()
+
+
+def render_report_xml(run_id: int, customer_id: int, json_doc: str) -> str:
+    key = (run_id, customer_id)
+    with _xml_cache_lock:
+        xml_doc = _xml_cache.get(key)
+        if xml_doc is not None:
+            _xml_cache.move_to_end(key)
+            return xml_doc
+
+    doc = json.loads(json_doc)
+    xml_doc = build_unified_xml(doc["customerId"], doc["asOfDate"], doc["modules"])
+
+    with _xml_cache_lock:
+        _xml_cache[key] = xml_doc
+        while len(_xml_cache) > XML_CACHE_SIZE:
+            _xml_cache.popitem(last=False)
+    return xml_doc
+
+
+def accepts_encoding(accept_encoding: Optional[str], token: str) -> bool:
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() not in (token, "*"):
+            continue
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def load_report_docs(conn: sqlite3.Connection, row: sqlite3.Row) -> Tuple[str, str]:
+    """Decoded (json_doc, xml_doc) of an ecs_customer_rpt or ecs_customer_rpt_modules row."""
+    keys = row.keys()
+    codec = row["codec"] if "codec" in keys else None
+    doc_hash = row["doc_hash"] if "doc_hash" in keys else None
+    if not doc_hash:
+        return decode_doc(row["json_doc"], codec), decode_doc(row["xml_doc"], codec)
+
+    blob = fetch_blob(conn, doc_hash)
+    run = conn.execute(
+        "SELECT as_of_date FROM ecs_rpt_runs WHERE run_id = ?", (row["run_id"],)
+    ).fetchone()
+    if blob is None or run is None:
+        raise HTTPException(status_code=500, detail="Report document blob not found")
+    as_of_date, customer_id = run["as_of_date"], row["customer_id"]
+    if "module_code" in keys:
+        json_head = module_json_head(row["module_code"], as_of_date, customer_id)
+    else:
+        json_head = unified_json_head(as_of_date, customer_id)
+    return join_doc(json_head, blob[0], blob[1], as_of_date, customer_id)
+
+
+def decode_report_row(conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+    out = row_to_dict(row)
+    out.pop("codec", None)
+    out.pop("doc_hash", None)
+    out["json_doc"], out["xml_doc"] = load_report_docs(conn, row)
+    if out["xml_doc"] == "" and out["json_doc"]:
+        out["xml_doc"] = render_report_xml(out["run_id"], out["customer_id"], out["json_doc"])
+    return out
+
+
+def pick_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if brotli is not None and accepts_encoding(accept_encoding, BROTLI):
+        return BROTLI
+    if accepts_encoding(accept_encoding, GZIP):
+        return GZIP
+    return None
+
+
+def report_row_meta(conn: sqlite3.Connection, row_id: int) -> sqlite3.Row:
+    """Every ecs_customer_rpt column except the documents."""
+    cols = [c for c in get_table_columns(conn, "ecs_customer_rpt") if c not in ("json_doc", "xml_doc")]
+    return conn.execute(
+        f"SELECT {', '.join(cols)} FROM ecs_customer_rpt WHERE rowid = ?", (row_id,)
+    ).fetchone()
+
+
+def stored_docs_usable(conn: sqlite3.Connection, meta: sqlite3.Row, row_id: int, columns) -> bool:
+    """True when the documents can be sent as stored: not deduplicated and not ''."""
+    if "doc_hash" in meta.keys() and meta["doc_hash"]:
+        return False
+    return all(stored_size(conn, "ecs_customer_rpt", c, row_id) > 0 for c in columns)
+
+
+def report_row_chunks(
+    conn: sqlite3.Connection, row_id: int, fields: Optional[List[str]] = None
+) -> Iterator[bytes]:
+    """An ecs_customer_rpt row as the JSON object decode_report_row() gives, or just `fields` of it."""
+    cols = [
+        c for c in get_table_columns(conn, "ecs_customer_rpt")
+        if c not in ("codec", "doc_hash") and (fields is None or c in fields)
+    ]
+    docs = [c for c in cols if c in REPORT_DOC_COLUMNS]
+    meta = report_row_meta(conn, row_id)
+    # a projection without documents never touches them
+    if docs and not stored_docs_usable(conn, meta, row_id, docs):
+        row = conn.execute("SELECT * FROM ecs_customer_rpt WHERE rowid = ?", (row_id,)).fetchone()
+        out = decode_report_row(conn, row)
+        yield json.dumps(
+            {c: out[c] for c in cols}, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        return
+
+    codec = meta["codec"] if "codec" in meta.keys() else None
+    sep = "{"
+    for col in cols:
+        yield f"{sep}{json.dumps(col)}:".encode("utf-8")
+        sep = ","
+        if col in REPORT_DOC_COLUMNS:
+            chunks = decode_chunks(read_stored_chunks(conn, "ecs_customer_rpt", col, row_id), codec)
+            for text in json_string_chunks(chunks):
+                yield text.encode("utf-8")
+        else:
+            yield json.dumps(meta[col], ensure_ascii=False).encode("utf-8")
+    yield b"}" if cols else b"{}"
+
+
+def report_doc_chunks(conn: sqlite3.Connection, row_id: int, fmt: str, raw: bool) -> Iterator[bytes]:
+    """One document; raw = as stored (still compressed), else decoded UTF-8."""
+    column = f"{fmt}_doc"
+    if raw:
+        yield from read_stored_chunks(conn, "ecs_customer_rpt", column, row_id)
+        return
+    meta = report_row_meta(conn, row_id)
+    if stored_docs_usable(conn, meta, row_id, (column,)):
+        codec = meta["codec"] if "codec" in meta.keys() else None
+        yield from decode_chunks(read_stored_chunks(conn, "ecs_customer_rpt", column, row_id), codec)
+        return
+    row = conn.execute("SELECT * FROM ecs_customer_rpt WHERE rowid = ?", (row_id,)).fetchone()
+    yield decode_report_row(conn, row)[column].encode("utf-8")
+
+
+def stream_report(
+    conn: sqlite3.Connection, make_chunks: Callable, encoding: Optional[str], *args
+) -> Iterator[bytes]:
+    """make_chunks(conn, *args), optionally compressed, as a response body on the request's connection."""
+    # The body holds the connection too: get_db's teardown may run before or after the
+    # body is sent (depends on the FastAPI version), the last of the two releases it
+    hold_read_conn(conn)
+    body = held_conn_body(conn, make_chunks, encoding, args)
+    next(body)  # inside the try: a body that is closed or dropped unsent still releases
+    return body
+
+
+def held_conn_body(
+    conn: sqlite3.Connection, make_chunks: Callable, encoding: Optional[str], args: tuple
+) -> Iterator[bytes]:
+    discard = False
     try:
-        if not table_exists(conn, "ecs_customer_rpt"):
-            raise HTTPException(
-                status_code=500,
-                detail="Table ecs_customer_rpt not found. Use /api/debug/customers-sources to identify the correct report table.",
-            )
+        yield b""
+        chunks = make_chunks(conn, *args)
+        if encoding:
+            chunks = compress_chunks(chunks, encoding)
+        yield from chunks
+    except sqlite3.Error:
+        discard = True
+        raise
+    finally:
+        release_read_conn(conn, discard)
 
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT *
-            FROM ecs_customer_rpt
-            WHERE customer_id = ?
-            ORDER BY run_id DESC
-            LIMIT 1
-            """,
-            (customer_id,),
+
+def report_head_columns(conn: sqlite3.Connection) -> str:
+    # codec is missing on report tables created before compressed storage
+    cols = get_table_columns(conn, "ecs_customer_rpt")
+    return "rowid AS row_id, run_id, customer_id, generated_at" + (
+        ", codec" if "codec" in cols else ""
+    )
+
+
+def report_etag(heads: List[Any], variant: str) -> str:
+    keys = [(r["run_id"], r["customer_id"], r["generated_at"]) for r in heads]
+    digest = hashlib.sha256(json.dumps([variant, keys]).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    return any(
+        t.strip().removeprefix("W/") == etag for t in if_none_match.split(",")
+    )
+
+
+def report_cache_headers(etag: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": REPORT_CACHE_CONTROL,
+        "Vary": "Accept-Encoding, Authorization",
+    }
+
+
+def serve_report(
+    conn: sqlite3.Connection,
+    head: sqlite3.Row,
+    fmt: Optional[str],
+    fields: Optional[List[str]],
+    accept_encoding: Optional[str],
+    if_none_match: Optional[str],
+) -> Response:
+    """
+    The report row `head` (report_head_columns()) as one document (fmt), the row's `fields`,
+    or the whole row; 304 when If-None-Match already has it.
+    """
+    # A document can go out still compressed as stored, compressed here, or plain: the tag
+    # covers everything the choice depends on, so each representation gets its own
+    token = CONTENT_ENCODINGS.get(head["codec"] if "codec" in head.keys() else None)
+    token_ok = fmt is not None and token is not None and accepts_encoding(accept_encoding, token)
+    encoding = pick_encoding(accept_encoding)
+    shape = fmt or ("row" if fields is None else f"row({','.join(sorted(fields))})")
+    variant = "+".join(v for v in (shape, token if token_ok else None, encoding) if v)
+    headers = report_cache_headers(report_etag([head], variant))
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    row_id = head["row_id"]
+    raw = token_ok and stored_docs_usable(
+        conn, report_row_meta(conn, row_id), row_id, (f"{fmt}_doc",)
+    )
+    if raw:
+        encoding = token
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if fmt is None:
+        body = stream_report(conn, report_row_chunks, encoding, row_id, fields)
+        return StreamingResponse(body, media_type="application/json", headers=headers)
+    body = stream_report(conn, report_doc_chunks, None if raw else encoding, row_id, fmt, raw)
+    return StreamingResponse(body, media_type=DOC_MEDIA_TYPES[fmt], headers=headers)
+
+
+# -----------------------------
+# Employee-only: customer latest report
+# -----------------------------
+def fetch_latest_report(
+    conn: sqlite3.Connection,
+    customer_id: str,
+    fmt: Optional[str],
+    accept_encoding: Optional[str],
+    if_none_match: Optional[str] = None,
+    run_id: Optional[int] = None,
+) -> Response:
+    if not table_exists(conn, "ecs_customer_rpt"):
+        raise HTTPException(
+            status_code=500,
+            detail="Table ecs_customer_rpt not found. Use /api/debug/customers-sources to identify the correct report table.",
         )
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Customer report not found")
-        return row_to_dict(row)
-    finally:
-        conn.close()
+
+    # latest run, or the given one
+    run_filter = "" if run_id is None else "AND run_id = ?"
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT {report_head_columns(conn)}
+        FROM ecs_customer_rpt
+        WHERE customer_id = ? {run_filter}
+        ORDER BY run_id DESC
+        LIMIT 1
+        """,
+        (customer_id,) + (() if run_id is None else (run_id,)),
+    )
+    head = cur.fetchone()
+    if not head:
+        raise HTTPException(status_code=404, detail="Customer report not found")
+    return serve_report(conn, head, fmt, None, accept_encoding, if_none_match)
+
+
+@app.get("/api/customers/{customer_id}")
+async def get_customer_latest_report(
+    customer_id: str,
+    fmt: Optional[str] = Query(default=None, alias="format"),
+    run_id: Optional[int] = Query(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    user=Depends(require_employee),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    # ?format=json|xml returns just that document instead of the report row;
+    # ?run_id= an earlier run's report instead of the latest
+    if fmt is not None and fmt not in DOC_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'xml'")
+    return await run_db(
+        fetch_latest_report, conn, customer_id, fmt, accept_encoding, if_none_match, run_id
+    )
 
 
 # -----------------------------
 # Customer: my reports
+# The listing is one row per run without the documents (sizes from the ETL) and comes from
+# idx_cr_customer_listing alone, plus the run's as_of_date; a report is then fetched by
+# run_id, optionally just one document (?format=) or some of its fields (?fields=).
 # -----------------------------
-@app.get("/api/customer/reports")
-def get_my_reports(user=Depends(require_customer)):
+def fetch_my_reports(
+    conn: sqlite3.Connection,
+    customer_id: int,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    if not table_exists(conn, "ecs_customer_rpt"):
+        raise HTTPException(
+            status_code=500, detail="Table ecs_customer_rpt not found"
+        )
+
+    # sizes are NULL on tables written before the ETL recorded them
+    cols = get_table_columns(conn, "ecs_customer_rpt")
+    sizes = ", ".join(f"r.{c}" if c in cols else f"NULL AS {c}" for c in ("json_bytes", "xml_bytes"))
+    as_of_date = "ru.as_of_date" if table_exists(conn, "ecs_rpt_runs") else "NULL"
+    join = "LEFT JOIN ecs_rpt_runs ru ON ru.run_id = r.run_id" if as_of_date != "NULL" else ""
+
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT r.run_id, r.customer_id, {as_of_date} AS as_of_date, r.generated_at, {sizes}
+        FROM ecs_customer_rpt r
+        {join}
+        WHERE r.customer_id = ?
+        ORDER BY r.run_id DESC
+        """,
+        (customer_id,),
+    )
+    rows = rows_to_dicts(cur.fetchall())
+    headers = report_cache_headers(report_etag(rows, "summary"))
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(rows, headers=headers)
+
+
+def fetch_my_report(
+    conn: sqlite3.Connection,
+    customer_id: int,
+    run_id: int,
+    fmt: Optional[str],
+    fields: Optional[List[str]],
+    accept_encoding: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    if not table_exists(conn, "ecs_customer_rpt"):
+        raise HTTPException(
+            status_code=500, detail="Table ecs_customer_rpt not found"
+        )
+
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT {report_head_columns(conn)}
+        FROM ecs_customer_rpt
+        WHERE customer_id = ? AND run_id = ?
+        """,
+        (customer_id, run_id),
+    )
+    head = cur.fetchone()
+    if not head:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return serve_report(conn, head, fmt, fields, accept_encoding, if_none_match)
+
+
+def my_customer_id(user: Dict[str, Any]) -> int:
     customer_id = user.get("customer_id")
     if customer_id is None:
         raise HTTPException(status_code=400, detail="Missing customer_id for this user")
+    return customer_id
 
-    conn = get_conn()
-    try:
-        if not table_exists(conn, "ecs_customer_rpt"):
+
+@app.get("/api/customer/reports")
+async def get_my_reports(
+    if_none_match: Optional[str] = Header(default=None),
+    user=Depends(require_customer),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    return await run_db(fetch_my_reports, conn, my_customer_id(user), if_none_match)
+
+
+@app.get("/api/customer/reports/{run_id}")
+async def get_my_report(
+    run_id: int,
+    fmt: Optional[str] = Query(default=None, alias="format"),
+    fields: Optional[str] = Query(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    user=Depends(require_customer),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    # ?format=json|xml returns just that document; ?fields=run_id,json_doc,... just those
+    # fields of the report row (a document left out is never read)
+    if fmt is not None and fmt not in DOC_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'xml'")
+    selected = None
+    if fields is not None:
+        if fmt is not None:
+            raise HTTPException(status_code=400, detail="Use either format or fields, not both")
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in REPORT_FIELDS]
+        if not selected or unknown:
             raise HTTPException(
-                status_code=500, detail="Table ecs_customer_rpt not found"
+                status_code=400,
+                detail=f"fields must be a comma-separated list of: {', '.join(REPORT_FIELDS)}",
             )
+    return await run_db(
+        fetch_my_report, conn, my_customer_id(user), run_id, fmt, selected, accept_encoding, if_none_match
+    )
 
-        cur = conn.cursor()
-        cur.execute(
+
+# -----------------------------
+# Module documents
+# One ecs_customer_rpt_modules row at a time, read through its (run_id, customer_id,
+# module_code) primary key, so a viewer can load the sections it shows instead of the
+# whole unified report. run_id defaults to the run of the customer's latest unified report,
+# the one /api/customers/{id} serves: the module stage writes a run's rows before the
+# unified stage, so the latest module run may not have a full report yet. Without any
+# unified report it is the latest module run (index-only, through idx_crm_customer_run).
+# ?path= is a SQLite JSON path ($.payload.transactions, ...) evaluated with json_extract,
+# so only that part is sent: in place when the row is stored uncompressed and inline,
+# else on the decoded document.
+# Unlike the unified report there is no ETag: generated_at sits after the documents in
+# the row, so checking it would already read the document pages.
+# -----------------------------
+def latest_module_run(conn: sqlite3.Connection, customer_id: int) -> int:
+    if table_exists(conn, "ecs_customer_rpt"):
+        r = conn.execute(
+            "SELECT MAX(run_id) AS run_id FROM ecs_customer_rpt WHERE customer_id = ?",
+            (customer_id,),
+        ).fetchone()
+        if r["run_id"] is not None:
+            return r["run_id"]
+    r = conn.execute(
+        "SELECT MAX(run_id) AS run_id FROM ecs_customer_rpt_modules WHERE customer_id = ?",
+        (customer_id,),
+    ).fetchone()
+    if r["run_id"] is None:
+        raise HTTPException(status_code=404, detail="Module reports not found")
+    return r["run_id"]
+
+
+def check_modules_table(conn: sqlite3.Connection):
+    if not table_exists(conn, "ecs_customer_rpt_modules"):
+        raise HTTPException(
+            status_code=500, detail="Table ecs_customer_rpt_modules not found"
+        )
+
+
+def fetch_module_list(
+    conn: sqlite3.Connection, customer_id: int, run_id: Optional[int] = None
+) -> Dict[str, Any]:
+    check_modules_table(conn)
+    if run_id is None:
+        run_id = latest_module_run(conn, customer_id)
+
+    modules = [
+        r["module_code"]
+        for r in conn.execute(
             """
-            SELECT *
-            FROM ecs_customer_rpt
-            WHERE customer_id = ?
-            ORDER BY run_id DESC
+            SELECT module_code
+            FROM ecs_customer_rpt_modules
+            WHERE customer_id = ? AND run_id = ?
+            ORDER BY module_code
             """,
-            (customer_id,),
+            (customer_id, run_id),
         )
-        return rows_to_dicts(cur.fetchall())
-    finally:
-        conn.close()
+    ]
+    if not modules:
+        raise HTTPException(status_code=404, detail="Module reports not found")
+
+    # generated_at of the run's unified report, when there is one (idx_cr_customer_listing)
+    generated_at = None
+    if table_exists(conn, "ecs_customer_rpt"):
+        r = conn.execute(
+            "SELECT generated_at FROM ecs_customer_rpt WHERE customer_id = ? AND run_id = ?",
+            (customer_id, run_id),
+        ).fetchone()
+        generated_at = r["generated_at"] if r else None
+
+    return {
+        "run_id": run_id,
+        "customer_id": customer_id,
+        "generated_at": generated_at,
+        "modules": modules,
+    }
+
+
+def module_inline_sql(conn: sqlite3.Connection) -> str:
+    # rows whose stored json_doc is the document itself: not compressed, not deduplicated
+    cols = get_table_columns(conn, "ecs_customer_rpt_modules")
+    conds = (["codec = 'identity'"] if "codec" in cols else []) + (
+        ["doc_hash IS NULL"] if "doc_hash" in cols else []
+    )
+    return " AND ".join(conds) or "1"
+
+
+def load_module_row(conn: sqlite3.Connection, row_id: int) -> sqlite3.Row:
+    return conn.execute(
+        "SELECT * FROM ecs_customer_rpt_modules WHERE rowid = ?", (row_id,)
+    ).fetchone()
+
+
+def module_json_value(conn: sqlite3.Connection, key: Tuple[int, int, str], path: str) -> str:
+    """json_extract(json_doc, path) of a module row as JSON text; 404 when the path has no value."""
+    inline = module_inline_sql(conn)
+    try:
+        r = conn.execute(
+            f"""
+            SELECT rowid AS row_id, ({inline}) AS inline,
+                   CASE WHEN {inline} THEN json_type(json_doc, ?) END AS value_type,
+                   CASE WHEN {inline} THEN json_quote(json_extract(json_doc, ?)) END AS value
+            FROM ecs_customer_rpt_modules
+            WHERE run_id = ? AND customer_id = ? AND module_code = ?
+            """,
+            (path, path) + key,
+        ).fetchone()
+        if r is None:
+            raise HTTPException(status_code=404, detail="Module report not found")
+        if not r["inline"]:
+            json_doc, _ = load_report_docs(conn, load_module_row(conn, r["row_id"]))
+            r = conn.execute(
+                "SELECT json_type(?1, ?2) AS value_type, json_quote(json_extract(?1, ?2)) AS value",
+                (json_doc, path),
+            ).fetchone()
+    except sqlite3.OperationalError as e:
+        if "path" not in str(e).lower():
+            raise
+        raise HTTPException(status_code=400, detail=f"Invalid JSON path: {e}")
+
+    if r["value_type"] is None:
+        raise HTTPException(status_code=404, detail=f"No value at {path}")
+    return r["value"]
+
+
+def module_doc_chunks(conn: sqlite3.Connection, key: Tuple[int, int, str], fmt: str) -> Iterator[bytes]:
+    """One document of a module row, decoded UTF-8; XML stored as '' is rendered."""
+    column = f"{fmt}_doc"
+    cols = get_table_columns(conn, "ecs_customer_rpt_modules")
+    meta = conn.execute(
+        f"""
+        SELECT rowid AS row_id, {'codec' if 'codec' in cols else 'NULL AS codec'},
+               {'doc_hash' if 'doc_hash' in cols else 'NULL AS doc_hash'}
+        FROM ecs_customer_rpt_modules
+        WHERE run_id = ? AND customer_id = ? AND module_code = ?
+        """,
+        key,
+    ).fetchone()
+    row_id = meta["row_id"]
+    if not meta["doc_hash"] and stored_size(conn, "ecs_customer_rpt_modules", column, row_id) > 0:
+        yield from decode_chunks(
+            read_stored_chunks(conn, "ecs_customer_rpt_modules", column, row_id), meta["codec"]
+        )
+        return
+
+    row = load_module_row(conn, row_id)
+    json_doc, xml_doc = load_report_docs(conn, row)
+    if fmt == "xml" and xml_doc == "":
+        doc = json.loads(json_doc)
+        render = MODULE_XML_RENDERERS[row["module_code"]]
+        xml_doc = render(doc["customerId"], doc["asOfDate"], doc["payload"])
+    yield (json_doc if fmt == "json" else xml_doc).encode("utf-8")
+
+
+def fetch_module_report(
+    conn: sqlite3.Connection,
+    customer_id: int,
+    module_code: str,
+    run_id: Optional[int],
+    fmt: Optional[str],
+    path: Optional[str],
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    check_modules_table(conn)
+    if run_id is None:
+        run_id = latest_module_run(conn, customer_id)
+    key = (run_id, customer_id, module_code)
+
+    encoding = pick_encoding(accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if path is not None:
+        # small enough to be built here; compressed like the streamed documents
+        chunks = [module_json_value(conn, key, path).encode("utf-8")]
+        body = compress_chunks(chunks, encoding) if encoding else chunks
+        return StreamingResponse(body, media_type="application/json", headers=headers)
+
+    fmt = fmt or "json"
+    found = conn.execute(
+        """
+        SELECT 1
+        FROM ecs_customer_rpt_modules
+        WHERE run_id = ? AND customer_id = ? AND module_code = ?
+        """,
+        key,
+    ).fetchone()
+    if not found:
+        raise HTTPException(status_code=404, detail="Module report not found")
+    body = stream_report(conn, module_doc_chunks, encoding, key, fmt)
+    return StreamingResponse(body, media_type=DOC_MEDIA_TYPES[fmt], headers=headers)
+
+
+def check_module_query(fmt: Optional[str], path: Optional[str]):
+    # ?format=json|xml picks the document (json by default); ?path= projects the JSON one
+    if fmt is not None and fmt not in DOC_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'xml'")
+    if path is not None and fmt == "xml":
+        raise HTTPException(status_code=400, detail="path applies to the JSON document only")
+
+
+@app.get("/api/customers/{customer_id}/modules")
+async def get_customer_modules(
+    customer_id: int,
+    run_id: Optional[int] = Query(default=None),
+    user=Depends(require_employee),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    return await run_db(fetch_module_list, conn, customer_id, run_id)
+
+
+@app.get("/api/customers/{customer_id}/modules/{module_code}")
+async def get_customer_module(
+    customer_id: int,
+    module_code: str,
+    run_id: Optional[int] = Query(default=None),
+    fmt: Optional[str] = Query(default=None, alias="format"),
+    path: Optional[str] = Query(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user=Depends(require_employee),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    check_module_query(fmt, path)
+    return await run_db(
+        fetch_module_report, conn, customer_id, module_code, run_id, fmt, path, accept_encoding
+    )
+
+
+@app.get("/api/customer/modules")
+async def get_my_modules(
+    run_id: Optional[int] = Query(default=None),
+    user=Depends(require_customer),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    return await run_db(fetch_module_list, conn, my_customer_id(user), run_id)
+
+
+@app.get("/api/customer/modules/{module_code}")
+async def get_my_module(
+    module_code: str,
+    run_id: Optional[int] = Query(default=None),
+    fmt: Optional[str] = Query(default=None, alias="format"),
+    path: Optional[str] = Query(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user=Depends(require_customer),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    check_module_query(fmt, path)
+    return await run_db(
+        fetch_module_report, conn, my_customer_id(user), module_code, run_id, fmt, path, accept_encoding
+    )
+
+
+# -----------------------------
+# Employee-only: bulk export of a run
+# Every unified report of a run in one streamed response, instead of one
+# /api/customers/{id} call (and one auth check) per customer:
+#   ndjson -> one json_doc per line
+#   xml    -> the xml_doc of each customer inside one <CustomerReportsExport> root
+# Rows are stepped through one cursor in primary-key order (run_id, customer_id) while
+# the documents are sent, so memory stays at about one document whatever the run size;
+# the export is one read snapshot of the run. from_customer_id (inclusive) and
+# to_customer_id (exclusive) split a run into ranges that can be exported in parallel.
+# -----------------------------
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "xml": "application/xml"}
+EXPORT_XML_ROOT = "CustomerReportsExport"
+
+
+def export_filter(
+    run_id: int, from_customer_id: Optional[int], to_customer_id: Optional[int]
+) -> Tuple[str, Tuple]:
+    where, params = ["run_id = ?"], [run_id]
+    if from_customer_id is not None:
+        where.append("customer_id >= ?")
+        params.append(from_customer_id)
+    if to_customer_id is not None:
+        where.append("customer_id < ?")
+        params.append(to_customer_id)
+    return " AND ".join(where), tuple(params)
+
+
+def export_doc_chunks(conn: sqlite3.Connection, head: sqlite3.Row, column: str) -> Iterator[bytes]:
+    row_id = head["row_id"]
+    if not head["doc_hash"] and stored_size(conn, "ecs_customer_rpt", column, row_id) > 0:
+        yield from decode_chunks(
+            read_stored_chunks(conn, "ecs_customer_rpt", column, row_id), head["codec"]
+        )
+        return
+
+    row = conn.execute("SELECT * FROM ecs_customer_rpt WHERE rowid = ?", (row_id,)).fetchone()
+    json_doc, xml_doc = load_report_docs(conn, row)
+    if column == "xml_doc" and xml_doc == "":
+        # rendered without render_report_xml(): a whole run would only churn its cache
+        doc = json.loads(json_doc)
+        xml_doc = build_unified_xml(doc["customerId"], doc["asOfDate"], doc["modules"])
+    yield (json_doc if column == "json_doc" else xml_doc).encode("utf-8")
+
+
+def export_chunks(
+    conn: sqlite3.Connection,
+    run_id: int,
+    fmt: str,
+    from_customer_id: Optional[int],
+    to_customer_id: Optional[int],
+) -> Iterator[bytes]:
+    column = "json_doc" if fmt == "ndjson" else "xml_doc"
+    cols = get_table_columns(conn, "ecs_customer_rpt")
+    where, params = export_filter(run_id, from_customer_id, to_customer_id)
+
+    if fmt == "xml":
+        run = conn.execute(
+            "SELECT as_of_date FROM ecs_rpt_runs WHERE run_id = ?", (run_id,)
+        ).fetchone() if table_exists(conn, "ecs_rpt_runs") else None
+        as_of_date = xml_escape(run["as_of_date"]) if run and run["as_of_date"] else ""
+        yield (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<{EXPORT_XML_ROOT} runId="{run_id}" asOfDate="{as_of_date}">'
+        ).encode("utf-8")
+
+    cur = conn.execute(
+        f"""
+        SELECT rowid AS row_id, customer_id,
+               {'codec' if 'codec' in cols else 'NULL AS codec'},
+               {'doc_hash' if 'doc_hash' in cols else 'NULL AS doc_hash'}
+        FROM ecs_customer_rpt
+        WHERE {where}
+        ORDER BY run_id, customer_id
+        """,
+        params,
+    )
+    for head in cur:
+        yield from export_doc_chunks(conn, head, column)
+        if fmt == "ndjson":
+            yield b"\n"
+
+    if fmt == "xml":
+        yield f"</{EXPORT_XML_ROOT}>".encode("utf-8")
+
+
+def fetch_run_export(
+    conn: sqlite3.Connection,
+    run_id: int,
+    fmt: str,
+    from_customer_id: Optional[int],
+    to_customer_id: Optional[int],
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    if not table_exists(conn, "ecs_customer_rpt"):
+        raise HTTPException(
+            status_code=500, detail="Table ecs_customer_rpt not found"
+        )
+
+    where, params = export_filter(run_id, from_customer_id, to_customer_id)
+    if not conn.execute(f"SELECT 1 FROM ecs_customer_rpt WHERE {where} LIMIT 1", params).fetchone():
+        raise HTTPException(status_code=404, detail="No reports for this run and customer range")
+
+    name = f"run_{run_id}"
+    if from_customer_id is not None or to_customer_id is not None:
+        lo, hi = (("" if v is None else v) for v in (from_customer_id, to_customer_id))
+        name += f"_customers_{lo}-{hi}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{fmt}"',
+        "Vary": "Accept-Encoding",
+    }
+    encoding = pick_encoding(accept_encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    body = stream_report(conn, export_chunks, encoding, run_id, fmt, from_customer_id, to_customer_id)
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[fmt], headers=headers)
+
+
+@app.get("/api/runs/{run_id}/export")
+async def export_run(
+    run_id: int,
+    fmt: str = Query(default="ndjson", alias="format"),
+    from_customer_id: Optional[int] = Query(default=None),
+    to_customer_id: Optional[int] = Query(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    user=Depends(require_employee),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'xml'")
+    if (
+        from_customer_id is not None
+        and to_customer_id is not None
+        and from_customer_id >= to_customer_id
+    ):
+        raise HTTPException(status_code=400, detail="from_customer_id must be below to_customer_id")
+    return await run_db(
+        fetch_run_export, conn, run_id, fmt, from_customer_id, to_customer_id, accept_encoding
+    )
 
 
 # -----------------------------
 # Debug: discover sources
 # -----------------------------
+def fetch_customers_sources(conn: sqlite3.Connection) -> Dict[str, Any]:
+    catalog = get_source_catalog(conn, with_stats=True)
+    chosen_table, chosen_col = pick_best_customer_source(conn)
+
+    return {
+        "db_path": str(DB_PATH),
+        "chosen": {"table": chosen_table, "customer_id_col": chosen_col},
+        "tables_with_customer_id": catalog["stats"],
+        "catalog_built_at": catalog["built_at"],
+    }
+
+
 @app.get("/api/debug/customers-sources")
-def debug_customers_sources(user=Depends(require_employee)):
-    conn = get_conn()
-    try:
-        all_tables = list_tables(conn)
-        with_customer_id = []
-        for t in all_tables:
-            cols = get_table_columns(conn, t)
-            lower = {c.lower(): c for c in cols}
-            if "customer_id" in lower:
-                col = lower["customer_id"]
-                with_customer_id.append(
-                    {
-                        "table": t,
-                        "customer_id_col": col,
-                        "rows": count_rows(conn, t),
-                        "distinct_customer_id": count_distinct_customer_id(
-                            conn, t, col
-                        ),
-                    }
-                )
-
-        chosen_table, chosen_col = pick_best_customer_source(conn)
-        with_customer_id.sort(key=lambda x: x["distinct_customer_id"], reverse=True)
-
-        return {
-            "db_path": str(DB_PATH),
-            "chosen": {"table": chosen_table, "customer_id_col": chosen_col},
-            "tables_with_customer_id": with_customer_id,
-        }
-    finally:
-        conn.close()
+async def debug_customers_sources(
+    user=Depends(require_employee), conn: sqlite3.Connection = Depends(get_db)
+):
+    return await run_db(fetch_customers_sources, conn)
@@ -0,0 +1,232 @@
+"""
+Benchmark: report ETL throughput by scale factor, on databases built by seed_synthetic_db.py.
+
+For every SCALE_FACTORS entry the database is generated (or reused, REUSE_DBS), then each
+step runs in a fresh process against a new report run:
+
+  seed               seed_synthetic_db.generate()   (skipped for a reused database)
+  <MODULE>           etl_customer_reports.py with MODULES_TO_RUN = [<MODULE>], one step per module
+  UNIFIED            etl_unified_customer_reports.py
+
+and is reported with its wall time, customers/s, rows/s (rows written by the step: seeded
+rows, module rows or unified rows), the peak RSS of the step's process (pool workers of
+ETL_SETTINGS["WORKERS"] > 1 not included) and how much the database file grew (WAL
+checkpointed first). ETL_SETTINGS overrides constants of both ETL scripts, e.g.
+{"STORAGE_CODEC": "zlib"} or {"STORE_XML": False}.
+"""
+import contextlib
+import csv
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional
+
+import seed_synthetic_db
+from etl_customer_reports import MODULES_TO_RUN
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # optional dependency: peak RSS on Windows
+    psutil = None
+
+WORK_DIR = r"C:/A/B/C/D/E/F/bench"
+
+SCALE_FACTORS = [10_000, 100_000, 1_000_000]  # customers; seed_synthetic_db.py goes up to 5_000_000
+SEED = seed_synthetic_db.SEED
+REUSE_DBS = False            # keep bench_<customers>.db between runs (each run adds a report run)
+MODULES = list(MODULES_TO_RUN)
+ETL_SETTINGS: Dict[str, object] = {}
+QUIET_STEPS = True           # drop the per-batch output of the steps
+RESULTS_CSV: Optional[str] = None
+
+UNIFIED = "UNIFIED"
+SEED_STEP = "seed"
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    return None
+
+
+def db_size(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    finally:
+        conn.close()
+    return sum(os.path.getsize(db_path + s) for s in ("", "-wal") if os.path.exists(db_path + s))
+
+
+def count_rows(db_path: str, step: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        run_id = conn.execute("SELECT MAX(run_id) FROM ecs_rpt_runs").fetchone()[0]
+        if step == UNIFIED:
+            return conn.execute("SELECT COUNT(*) FROM ecs_customer_rpt WHERE run_id=?", (run_id,)).fetchone()[0]
+        return conn.execute(
+            "SELECT COUNT(*) FROM ecs_customer_rpt_modules WHERE run_id=? AND module_code=?", (run_id, step)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def start_report_run(db_path: str):
+    # a reused database gets a new run (and worklist) like a freshly seeded one
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(seed_synthetic_db.REPORT_SQL_PATH.read_text(encoding="utf-8"))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# -------------------------
+# Steps (each in its own process)
+# -------------------------
+def run_step(step: str, db_path: str, customers: int, results):
+    if step == SEED_STEP:
+        def target():
+            return sum(seed_synthetic_db.generate(db_path, customers, SEED, overwrite=True).values())
+    else:
+        import etl_customer_reports
+        import etl_unified_customer_reports
+
+        module = etl_unified_customer_reports if step == UNIFIED else etl_customer_reports
+        for name, value in ETL_SETTINGS.items():
+            if hasattr(module, name):
+                setattr(module, name, value)
+        module.DB_PATH = db_path
+        if step != UNIFIED:
+            module.MODULES_TO_RUN = [step]
+            module.FUSED = False
+
+        def target():
+            module.main()
+            return None
+
+    out = open(os.devnull, "w") if QUIET_STEPS else None
+    try:
+        with contextlib.redirect_stdout(out) if out else contextlib.nullcontext():
+            t0 = time.perf_counter()
+            rows = target()
+            elapsed = time.perf_counter() - t0
+    finally:
+        if out:
+            out.close()
+    results.put((elapsed, rows, peak_rss_bytes()))
+
+
+def measure_step(step: str, db_path: str, customers: int) -> Dict:
+    size_before = db_size(db_path) if step != SEED_STEP else 0
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=run_step, args=(step, db_path, customers, results))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise SystemExit(f"step {step} failed (exit code {proc.exitcode}) on {db_path}")
+    elapsed, rows, peak_rss = results.get()
+    if rows is None:
+        rows = count_rows(db_path, step)
+    growth = db_size(db_path) - size_before
+    return {
+        "customers": customers,
+        "step": step,
+        "seconds": elapsed,
+        "customers_per_s": customers / elapsed,
+        "rows": rows,
+        "rows_per_s": rows / elapsed,
+        "peak_rss_mib": None if peak_rss is None else peak_rss / 2 ** 20,
+        "db_growth_mib": growth / 2 ** 20,
+    }
+
+
+def print_result(r: Dict):
+    rss = "n/a" if r["peak_rss_mib"] is None else f"{r['peak_rss_mib']:,.0f}"
+    print(f"  {r['step']:<17} {r['seconds']:>9.1f}s {r['customers_per_s']:>13,.0f} {r['rows']:>13,} "
+          f"{r['rows_per_s']:>11,.0f} {rss:>9} {r['db_growth_mib']:>11,.1f}")
+
+
+def bench_scale(customers: int) -> List[Dict]:
+    db_path = os.path.join(WORK_DIR, f"bench_{customers}.db")
+    print(f"\nSCALE {customers:,} customers  ({db_path})")
+    print(f"  {'step':<17} {'time':>10} {'customers/s':>13} {'rows':>13} {'rows/s':>11} {'RSS MiB':>9} "
+          f"{'growth MiB':>11}")
+    results = []
+    if REUSE_DBS and os.path.exists(db_path):
+        start_report_run(db_path)
+    else:
+        results.append(measure_step(SEED_STEP, db_path, customers))
+        print_result(results[-1])
+
+    etl = []
+    for step in MODULES + [UNIFIED]:
+        etl.append(measure_step(step, db_path, customers))
+        print_result(etl[-1])
+    seconds = sum(r["seconds"] for r in etl)
+    rows = sum(r["rows"] for r in etl)
+    total = {
+        "customers": customers,
+        "step": "ETL total",
+        "seconds": seconds,
+        "customers_per_s": customers / seconds,
+        "rows": rows,
+        "rows_per_s": rows / seconds,
+        "peak_rss_mib": max((r["peak_rss_mib"] for r in etl if r["peak_rss_mib"] is not None), default=None),
+        "db_growth_mib": sum(r["db_growth_mib"] for r in etl),
+    }
+    print_result(total)
+    print(f"  DB size after ETL: {db_size(db_path) / 2 ** 20:,.1f} MiB, "
+          f"ETL growth {total['db_growth_mib'] * 2 ** 20 / customers / 1024:,.1f} KiB per customer")
+    return results + etl + [total]
+
+
+def main():
+    os.makedirs(WORK_DIR, exist_ok=True)
+    print("=====================================================")
+    print("BENCH: report ETL by scale factor (synthetic data)")
+    print(f"WORK_DIR:      {WORK_DIR}")
+    print(f"SCALE_FACTORS: {SCALE_FACTORS}")
+    print(f"SEED:          {SEED}")
+    print(f"MODULES:       {MODULES}")
+    print(f"ETL_SETTINGS:  {ETL_SETTINGS}")
+    if resource is None and psutil is None:
+        print("Peak RSS:      n/a (needs the resource module or psutil)")
+    print("=====================================================")
+
+    results: List[Dict] = []
+    for customers in SCALE_FACTORS:
+        results += bench_scale(customers)
+
+    # how throughput holds up as the scale grows
+    steps = [SEED_STEP] + MODULES + [UNIFIED, "ETL total"]
+    print("\ncustomers/s by scale factor")
+    print(f"  {'step':<17}" + "".join(f"{c:>14,}" for c in SCALE_FACTORS))
+    for step in steps:
+        by_scale = {r["customers"]: r["customers_per_s"] for r in results if r["step"] == step}
+        if by_scale:
+            print(f"  {step:<17}" + "".join(
+                f"{by_scale[c]:>14,.0f}" if c in by_scale else f"{'-':>14}" for c in SCALE_FACTORS))
+
+    if RESULTS_CSV:
+        with open(RESULTS_CSV, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"\nResults written to {RESULTS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
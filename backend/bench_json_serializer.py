@@ -0,0 +1,109 @@
+"""
+Microbenchmark: module json_doc serialization per module (JSON_SERIALIZER in
+etl_customer_reports.py).
+
+  json.dumps     -> envelope dict + json.dumps(json_doc, ensure_ascii=False) per customer
+  prefix+stdlib  -> envelope pre-rendered once (module_json_prefix), payload through the
+                    prebuilt stdlib encoder; must be byte-identical to json.dumps
+  prefix+orjson  -> same with orjson (when installed); checked for equal parsed JSON only
+
+Read-only: uses the module payloads of the latest run for a sample of worklist customers.
+"""
+import json
+import sqlite3
+import time
+from typing import Callable, Dict
+
+from etl_unified_customer_reports import MODULES, fetch_module_docs, get_as_of_date, get_latest_run_id
+from report_json import ORJSON, STDLIB, dumps_stdlib, get_dumps, orjson
+from report_store import module_json_prefix
+
+DB_PATH = r"C:/A/B/C/D/D/E/######.db"
+
+SAMPLE_CUSTOMERS = 5000
+REPEAT = 5
+
+
+def best_of(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def dumps_envelope(module: str, as_of_date: str, payloads: Dict[int, Dict]) -> Dict[int, str]:
+    # what the builders did before: one envelope dict and one json.dumps per customer
+    return {
+        cid: json.dumps({
+            "schemaVersion": "1.0",
+            "module": module,
+            "asOfDate": as_of_date,
+            "customerId": cid,
+            "payload": payload
+        }, ensure_ascii=False)
+        for cid, payload in payloads.items()
+    }
+
+
+def dumps_prefixed(module: str, as_of_date: str, payloads: Dict[int, Dict],
+                   dumps: Callable[[Dict], str]) -> Dict[int, str]:
+    json_prefix = module_json_prefix(module, as_of_date)
+    return {cid: f'{json_prefix}{cid}, "payload": {dumps(payload)}}}' for cid, payload in payloads.items()}
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    run_id = get_latest_run_id(conn)
+    as_of_date = get_as_of_date(conn, run_id)
+    customer_ids = [int(r[0]) for r in conn.execute(
+        "SELECT customer_id FROM ecs_rpt_customer_worklist ORDER BY customer_id LIMIT ?", (SAMPLE_CUSTOMERS,))]
+    payloads_map, _ = fetch_module_docs(conn, run_id, customer_ids)
+    conn.close()
+
+    serializers = [STDLIB] + ([ORJSON] if orjson is not None else [])
+
+    print("=====================================================")
+    print("BENCH: module json_doc serialization")
+    print(f"DB_PATH:     {DB_PATH}")
+    print(f"RUN_ID:      {run_id}")
+    print(f"CUSTOMERS:   {len(customer_ids)}  (best of {REPEAT})")
+    print(f"SERIALIZERS: {serializers}{'' if orjson is not None else '  (orjson not installed)'}")
+    print("=====================================================")
+
+    totals: Dict[str, float] = {}
+    for module in MODULES:
+        payloads = {cid: payloads_map[cid][module] for cid in customer_ids if module in payloads_map[cid]}
+        if not payloads:
+            print(f"{module:<17} no stored documents, skipped")
+            continue
+
+        baseline = dumps_envelope(module, as_of_date, payloads)
+        t_base = best_of(lambda: dumps_envelope(module, as_of_date, payloads), REPEAT)
+        totals["json.dumps"] = totals.get("json.dumps", 0.0) + t_base
+        line = f"{module:<17} n={len(payloads):<6} json.dumps {t_base:7.3f}s"
+
+        for name in serializers:
+            dumps = get_dumps(name)
+            t = best_of(lambda: dumps_prefixed(module, as_of_date, payloads, dumps), REPEAT)
+            totals[name] = totals.get(name, 0.0) + t
+            docs = dumps_prefixed(module, as_of_date, payloads, dumps)
+            if dumps is dumps_stdlib:
+                same = sum(docs[cid] == baseline[cid] for cid in payloads)
+                check = f"identical {same}/{len(payloads)}"
+            else:
+                same = sum(json.loads(docs[cid]) == json.loads(baseline[cid]) for cid in payloads)
+                check = f"same JSON {same}/{len(payloads)}"
+            line += f" | prefix+{name} {t:7.3f}s x{t_base / t:4.1f} ({check})"
+        print(line)
+
+    print("-----------------------------------------------------")
+    for name, t in totals.items():
+        print(f"TOTAL {name:<12} {t:7.3f}s  x{totals['json.dumps'] / t:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark: unified XML built by json_to_xml (UNIFIED_XML_MODE="JSON_TO_XML") vs
+spliced from the stored module xml_doc fragments ("MODULE_FRAGMENTS").
+
+Read-only: uses the module rows of the latest run for a sample of worklist customers.
+Equivalence is checked per customer and module: both documents must parse, list the
+same modules in the same order, and every non-empty payload value must also appear
+(as element text or attribute value) in the module XML fragment. Misses are reported
+per module and payload path: those are fields the module XML layout leaves out or
+renders differently (e.g. the "limit" echo, booleans), not splicing errors.
+"""
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from typing import List
+
+from etl_unified_customer_reports import (
+    build_unified,
+    build_unified_xml,
+    build_unified_xml_from_fragments,
+    fetch_module_docs,
+    get_as_of_date,
+    get_latest_run_id,
+    order_module_fragments,
+    order_module_payloads,
+)
+
+DB_PATH = r"C:/A/B/C/D/D/E/######.db"
+
+SAMPLE_CUSTOMERS = 2000
+REPEAT = 3
+SHOW_MISSING_PATHS = 10
+
+
+def sample_customer_ids(conn: sqlite3.Connection, limit: int) -> List[int]:
+    rows = conn.execute("SELECT customer_id FROM ecs_rpt_customer_worklist ORDER BY customer_id LIMIT ?", (limit,))
+    return [int(r[0]) for r in rows]
+
+
+def best_of(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def payload_values(value, path: str, out: List) -> List:
+    """[(path, str(value))] for every non-empty scalar; list items share the path `list[]`."""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            payload_values(v, f"{path}.{k}" if path else str(k), out)
+    elif isinstance(value, list):
+        for v in value:
+            payload_values(v, f"{path}[]", out)
+    elif value is not None and str(value) != "":
+        out.append((path, str(value)))
+    return out
+
+
+def xml_values(elem: ET.Element) -> Counter:
+    out: Counter = Counter()
+    for e in elem.iter():
+        for v in e.attrib.values():
+            out[v] += 1
+        if e.text and e.text.strip():
+            out[e.text] += 1
+    return out
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    run_id = get_latest_run_id(conn)
+    as_of_date = get_as_of_date(conn, run_id)
+    customer_ids = sample_customer_ids(conn, SAMPLE_CUSTOMERS)
+
+    print("=====================================================")
+    print("BENCH: unified XML (JSON_TO_XML vs MODULE_FRAGMENTS)")
+    print(f"DB_PATH:   {DB_PATH}")
+    print(f"RUN_ID:    {run_id}")
+    print(f"CUSTOMERS: {len(customer_ids)}  (best of {REPEAT})")
+    print("=====================================================")
+
+    payloads_map, fragments_map = fetch_module_docs(conn, run_id, customer_ids, with_xml=True)
+    payloads = {cid: order_module_payloads(payloads_map[cid]) for cid in customer_ids}
+    fragments = {cid: order_module_fragments(fragments_map[cid]) for cid in customer_ids}
+
+    # XML assembly only (module docs already in memory)
+    t_json = best_of(lambda: [build_unified_xml(cid, as_of_date, payloads[cid]) for cid in customer_ids], REPEAT)
+    t_frag = best_of(lambda: [build_unified_xml_from_fragments(cid, as_of_date, fragments[cid])
+                              for cid in customer_ids], REPEAT)
+
+    # Full unify step per mode: read module rows + build unified json_doc and xml_doc
+    def unify(with_xml: bool):
+        p_map, f_map = fetch_module_docs(conn, run_id, customer_ids, with_xml=with_xml)
+        for cid in customer_ids:
+            frags = order_module_fragments(f_map[cid]) if with_xml else None
+            build_unified(cid, as_of_date, order_module_payloads(p_map[cid]), frags)
+
+    t_json_full = best_of(lambda: unify(False), REPEAT)
+    t_frag_full = best_of(lambda: unify(True), REPEAT)
+
+    # Output checks
+    size_json = size_frag = 0
+    bad_xml = 0
+    mismatches = []
+    missing_paths: Counter = Counter()
+    for cid in customer_ids:
+        xml_json = build_unified_xml(cid, as_of_date, payloads[cid])
+        xml_frag = build_unified_xml_from_fragments(cid, as_of_date, fragments[cid])
+        size_json += len(xml_json.encode("utf-8"))
+        size_frag += len(xml_frag.encode("utf-8"))
+        try:
+            root_json = ET.fromstring(xml_json)
+            root_frag = ET.fromstring(xml_frag)
+        except ET.ParseError as e:
+            bad_xml += 1
+            mismatches.append((cid, "*", f"parse error: {e}"))
+            continue
+
+        mods_json = [m.tag for m in root_json.find("Modules")]
+        mods_frag = [m.tag for m in root_frag.find("Modules")]
+        if mods_json != mods_frag:
+            mismatches.append((cid, "*", f"module order {mods_json} != {mods_frag}"))
+            continue
+
+        for module_elem in root_frag.find("Modules"):
+            module_code = module_elem.tag
+            available = xml_values(module_elem)
+            missed = False
+            for path, value in payload_values(payloads[cid][module_code], "", []):
+                if available[value] > 0:
+                    available[value] -= 1
+                else:
+                    missing_paths[(module_code, path)] += 1
+                    missed = True
+            if missed:
+                mismatches.append((cid, module_code, "payload values missing from module XML"))
+
+    print(f"XML assembly      JSON_TO_XML      {t_json:8.3f}s  ({len(customer_ids) / t_json:,.0f} customers/s)")
+    print(f"XML assembly      MODULE_FRAGMENTS {t_frag:8.3f}s  ({len(customer_ids) / t_frag:,.0f} customers/s)"
+          f"  x{t_json / t_frag:.1f}")
+    print(f"Read + unify      JSON_TO_XML      {t_json_full:8.3f}s")
+    print(f"Read + unify      MODULE_FRAGMENTS {t_frag_full:8.3f}s  x{t_json_full / t_frag_full:.1f}")
+    print(f"XML bytes         JSON_TO_XML      {size_json:,}")
+    print(f"XML bytes         MODULE_FRAGMENTS {size_frag:,}")
+    print(f"Not well-formed:  {bad_xml}")
+    print(f"Value mismatches: {len(mismatches)} (customer/module pairs)")
+    for cid, module_code, msg in [m for m in mismatches if m[1] == "*"][:SHOW_MISSING_PATHS]:
+        print(f"  customer={cid}: {msg}")
+    for (module_code, path), n in missing_paths.most_common(SHOW_MISSING_PATHS):
+        print(f"  {module_code}: payload.{path} missing {n}x")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,48 @@
 import sqlite3
 import json
+import multiprocessing
+import os
+import traceback
 from datetime import datetime, date, timezone
 from xml.sax.saxutils import escape as xml_escape
-from typing import Dict, List, Tuple, Optional, DefaultDict
+from typing import Any, Callable, Dict, List, Tuple, Optional, DefaultDict
 from collections import defaultdict
+from dataclasses import dataclass, field
+from queue import Empty
+
+from etl_unified_customer_reports import (
+    CHECKPOINT_MODULE as UNIFIED_CHECKPOINT,
+    MODULES as UNIFIED_MODULES,
+    build_unified,
+    encode_unified_rows,
+    ensure_size_columns,
+    fetch_module_docs,
+    insert_unified_rows,
+    order_module_fragments,
+    order_module_payloads,
+)
+from report_checkpoints import (
+    ensure_checkpoint_table,
+    fail_checkpoint,
+    get_done_checkpoints,
+    set_checkpoint,
+    set_run_status,
+)
+from report_codec import check_codec, decode_doc, encode_doc
+from report_json import check_serializer, get_dumps
+from report_store import dedup_doc, ensure_codec_columns, ensure_doc_store, insert_blobs, module_json_head, module_json_prefix, new_blob_rows
+from report_xml import (
+    compile_xml_layout,
+    xml_attr,
+    xml_each,
+    xml_element,
+    xml_field,
+    xml_fields,
+    xml_object,
+    xml_switch,
+    xml_text,
+    xml_when,
+)
 
 DB_PATH = r"C:/A/B/C/D/E/F/######.db"
 
@@ -31,6 +70,50 @@ PROGRESS_EVERY = 500
 INSERT_CHUNK_SIZE = 500
 SQLITE_TIMEOUT_SECONDS = 60
 
+# How id sets are bound into batch queries:
+#   "JSON_EACH" -> one `IN (SELECT value FROM json_each(?))` per query (fixed SQL text, statement cache hits)
+#   "IN_CHUNKS" -> legacy `IN (?,?,...)` lists of at most 900 ids (SQLite builds without JSON1)
+BATCH_QUERY_MODE = "JSON_EACH"
+
+# Parallelism: 1 = serial (single connection). >1 = batches are built by a
+# pool of worker processes (one read connection each) and written by the
+# main process, which is the only one holding the WAL write connection.
+WORKERS = 1
+WRITER_QUEUE_MAX = 16
+WORKER_POLL_SECONDS = 5  # how often the writer checks that no worker process has died
+
+# Incremental runs (requires database/Customer_Report_Change_Tracking.sql):
+# only (customer, module) pairs changed since the previous tracked run are rebuilt,
+# every other document is carried forward from that run. Without a previous
+# tracked run the ETL falls back to a full run.
+INCREMENTAL = False
+
+# Fused mode: each batch also writes its unified ecs_customer_rpt rows, built from the
+# module payloads still in memory instead of re-reading and re-parsing module json_doc.
+# The run is marked SUCCESS here; etl_unified_customer_reports.py stays available to
+# rebuild unified docs from existing module rows.
+FUSED = False
+# Unified XML layout for FUSED runs, see UNIFIED_XML_MODE in etl_unified_customer_reports.py
+UNIFIED_XML_MODE = "JSON_TO_XML"
+
+# JSON-only storage: STORE_XML = False skips module XML rendering and stores xml_doc = ''
+# (FUSED runs then store no unified XML either); the API renders XML on request.
+STORE_XML = True
+
+# How json_doc / xml_doc are stored: "identity" (TEXT), "zlib" or "zstd" (compressed BLOB),
+# recorded per row in the `codec` column (see report_codec.py)
+STORAGE_CODEC = "identity"
+
+# Content-addressed storage (see report_store.py): documents are stored once in
+# ecs_rpt_doc_blobs without their envelope (asOfDate etc.) and rows point to them by
+# doc_hash, so documents unchanged since an earlier run are not stored again.
+DEDUP_DOCS = False
+
+# Module json_doc serializer (see report_json.py): "stdlib" (byte-identical to json.dumps)
+# or "orjson" (faster, compact separators). The envelope is rendered once per batch
+# and module either way; only the payload is serialized per customer.
+JSON_SERIALIZER = "stdlib"
+
 
 # -------------------------
 # DB helpers
@@ -75,16 +158,10 @@ def now_utc_z() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
 
 
-def xml_tag(tag: str, content) -> str:
-    if content is None:
-        content = ""
-    return f"<{tag}>{xml_escape(str(content))}</{tag}>"
-
-
 INSERT_SQL = """
 INSERT OR IGNORE INTO ecs_customer_rpt_modules
-  (run_id, customer_id, module_code, json_doc, xml_doc, generated_at)
-VALUES (?, ?, ?, ?, ?, ?)
+  (run_id, customer_id, module_code, json_doc, xml_doc, generated_at, codec, doc_hash)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
 """
 
 
@@ -110,15 +187,110 @@ def in_clause_params(ids: List[int]) -> Tuple[str, Tuple]:
     return placeholders, tuple(ids)
 
 
+def id_sets(ids: List[int]) -> List[Tuple[str, Tuple]]:
+    """
+    Returns (sql, params) pairs covering `ids`, used as `WHERE col IN {sql}`.
+    JSON_EACH mode binds the whole set as a single JSON array parameter, so the
+    statement text never changes and the query runs once per id set.
+    """
+    if not ids:
+        return []
+    if BATCH_QUERY_MODE == "JSON_EACH":
+        return [("(SELECT value FROM json_each(?))", (json.dumps(ids),))]
+    out = []
+    for sub in chunked(ids, 900):
+        ph, params = in_clause_params(sub)
+        out.append((f"({ph})", params))
+    return out
+
+
+# Indexes the batch queries rely on (created on start-up if missing)
+# (ecs_transactions is served by the existing idx_transactions_account_ts, scanned backwards)
+ETL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_account_holders_party ON ecs_account_holders(party_id, account_id)",
+    "CREATE INDEX IF NOT EXISTS idx_postings_account_ts ON ecs_account_postings(account_id, posting_ts DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_fees_account_ts ON ecs_fees_applied(account_id, applied_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_auth_card_status_ts ON ecs_card_authorizations(card_id, status, auth_ts DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_loan_payments_loan_ts ON ecs_loan_payments(loan_id, paid_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_flags_party_status_ts ON ecs_compliance_flags(party_id, status, created_at DESC)",
+]
+
+
+def ensure_etl_indexes(conn: sqlite3.Connection):
+    for ddl in ETL_INDEXES:
+        conn.execute(ddl)
+    conn.commit()
+
+
 def table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
     r = dict_row(conn, "SELECT 1 AS ok FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (table_name,))
     return bool(r)
 
 
+# -------------------------
+# Batch context (shared by all module builders)
+# -------------------------
+@dataclass
+class BatchContext:
+    """Per-batch prefetch: account holdings are read once and reused by every module."""
+    customer_ids: List[int]
+    cust_to_accounts: Dict[int, List[int]] = field(default_factory=dict)
+    account_to_customers: Dict[int, List[int]] = field(default_factory=dict)
+    account_ids: List[int] = field(default_factory=list)
+    # {module_code: {customer_id: payload}}; only collected when not None (FUSED)
+    payloads: Optional[Dict[str, Dict[int, Dict]]] = None
+    # {module_code: {customer_id: xml_doc}}; only collected when not None (FUSED + MODULE_FRAGMENTS)
+    fragments: Optional[Dict[str, Dict[int, str]]] = None
+
+
+def keep_payload(ctx: Optional[BatchContext], module: str, customer_id: int, payload: Dict):
+    if ctx is not None and ctx.payloads is not None:
+        ctx.payloads.setdefault(module, {})[customer_id] = payload
+
+
+# resolved once, not per document: main() and _init_worker re-resolve it from JSON_SERIALIZER
+_json_dumps: Callable[[Any], str] = get_dumps(JSON_SERIALIZER)
+
+
+def set_json_serializer(name: str):
+    global _json_dumps
+    _json_dumps = get_dumps(name)
+
+
+def module_json_doc(json_prefix: str, customer_id: int, payload: Dict) -> str:
+    """Module json_doc from the batch's pre-rendered envelope prefix (module_json_prefix)."""
+    return f'{json_prefix}{customer_id}, "payload": {_json_dumps(payload)}}}'
+
+
+def build_batch_context(conn, customer_ids: List[int]) -> BatchContext:
+    cust_to_accounts: DefaultDict[int, List[int]] = defaultdict(list)
+    account_to_customers: DefaultDict[int, List[int]] = defaultdict(list)
+
+    for ids_sql, params in id_sets(customer_ids):
+        for row in dict_rows(conn, f"""
+            SELECT party_id, account_id
+            FROM ecs_account_holders
+            WHERE party_id IN {ids_sql}
+            ORDER BY party_id, account_id
+        """, params):
+            pid = int(row["party_id"])
+            aid = int(row["account_id"])
+            cust_to_accounts[pid].append(aid)
+            account_to_customers[aid].append(pid)
+
+    return BatchContext(
+        customer_ids=customer_ids,
+        cust_to_accounts=dict(cust_to_accounts),
+        account_to_customers=dict(account_to_customers),
+        account_ids=sorted(account_to_customers),
+    )
+
+
 # -------------------------
 # CUSTOMER_PROFILE
 # -------------------------
-def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                                       ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
@@ -127,20 +299,19 @@ def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_d
     addresses_map: DefaultDict[int, List[Dict]] = defaultdict(list)
     docs_map: DefaultDict[int, List[Dict]] = defaultdict(list)
 
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
+    for ids_sql, params in id_sets(customer_ids):
 
         for row in dict_rows(conn, f"""
             SELECT customer_id, first_name, last_name, email, created_at
             FROM ecs_customers
-            WHERE customer_id IN ({ph})
+            WHERE customer_id IN {ids_sql}
         """, params):
             customers_map[int(row["customer_id"])] = row
 
         for row in dict_rows(conn, f"""
             SELECT party_id, type, value, is_primary
             FROM ecs_party_contacts
-            WHERE party_id IN ({ph})
+            WHERE party_id IN {ids_sql}
             ORDER BY party_id, is_primary DESC, type, value
         """, params):
             contacts_map[int(row["party_id"])].append({
@@ -152,7 +323,7 @@ def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_d
                    a.line1, a.line2, a.city, a.region, a.postal_code, a.country
             FROM ecs_party_addresses pa
             JOIN ecs_addresses a ON a.address_id = pa.address_id
-            WHERE pa.party_id IN ({ph})
+            WHERE pa.party_id IN {ids_sql}
             ORDER BY pa.party_id, pa.is_primary DESC, pa.addr_type
         """, params):
             addresses_map[int(row["party_id"])].append({
@@ -165,7 +336,7 @@ def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_d
         for row in dict_rows(conn, f"""
             SELECT party_id, doc_type, doc_number, issued_by, expires_on
             FROM ecs_party_id_documents
-            WHERE party_id IN ({ph})
+            WHERE party_id IN {ids_sql}
             ORDER BY party_id, doc_type, doc_number
         """, params):
             docs_map[int(row["party_id"])].append({
@@ -174,6 +345,7 @@ def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_d
             })
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("CUSTOMER_PROFILE", as_of_date)
 
     for cid in customer_ids:
         c = customers_map.get(cid)
@@ -192,109 +364,72 @@ def build_customer_profile_docs_for_batch(conn, customer_ids: List[int], as_of_d
             "kycDocuments": docs_map.get(cid, []),
         }
 
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "CUSTOMER_PROFILE",
-            "asOfDate": as_of_date,
-            "customerId": cid,
-            "payload": payload
-        }
-
-        xml_parts = [
-            f'<CustomerProfileReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}">',
-            "<Customer>",
-            xml_tag("CustomerId", cid),
-        ]
-        if c:
-            xml_parts += [
-                xml_tag("FirstName", c["first_name"]),
-                xml_tag("LastName", c["last_name"]),
-                xml_tag("Email", c["email"]),
-                xml_tag("CreatedAt", c["created_at"]),
-            ]
-        else:
-            xml_parts.append("<MissingCustomer>true</MissingCustomer>")
-        xml_parts.append("</Customer>")
-
-        xml_parts.append("<Contacts>")
-        for ct in contacts_map.get(cid, []):
-            xml_parts.append(
-                f'<Contact type="{xml_escape(ct["type"])}" isPrimary="{ct["is_primary"]}">'
-                f'{xml_tag("Value", ct["value"])}'
-                f"</Contact>"
-            )
-        xml_parts.append("</Contacts>")
-
-        xml_parts.append("<Addresses>")
-        for ad in addresses_map.get(cid, []):
-            xml_parts.append(
-                f'<Address addrType="{xml_escape(ad["addr_type"])}" isPrimary="{ad["is_primary"]}">'
-                f'{xml_tag("Line1", ad["line1"])}'
-                f'{xml_tag("Line2", ad["line2"])}'
-                f'{xml_tag("City", ad["city"])}'
-                f'{xml_tag("Region", ad["region"])}'
-                f'{xml_tag("PostalCode", ad["postal_code"])}'
-                f'{xml_tag("Country", ad["country"])}'
-                f"</Address>"
-            )
-        xml_parts.append("</Addresses>")
-
-        xml_parts.append("<KycDocuments>")
-        for d in docs_map.get(cid, []):
-            xml_parts.append(
-                f'<Document docType="{xml_escape(d["doc_type"])}">'
-                f'{xml_tag("DocNumber", d["doc_number"])}'
-                f'{xml_tag("IssuedBy", d["issued_by"])}'
-                f'{xml_tag("ExpiresOn", d["expires_on"])}'
-                f"</Document>"
-            )
-        xml_parts.append("</KycDocuments>")
-
-        xml_parts.append("</CustomerProfileReport>")
-        out[cid] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "CUSTOMER_PROFILE", cid, payload)
+        xml_doc = render_customer_profile_xml(cid, as_of_date, payload) if STORE_XML else ""
+        out[cid] = (module_json_doc(json_prefix, cid, payload), xml_doc)
 
     return out
 
 
+CUSTOMER_PROFILE_XML = [
+    xml_object("customer", "Customer", [
+        xml_field("CustomerId", "customerId"),
+        xml_when("existsInEcsCustomers", [
+            xml_field("FirstName", "firstName"),
+            xml_field("LastName", "lastName"),
+            xml_field("Email", "email"),
+            xml_field("CreatedAt", "createdAt"),
+        ], otherwise=[xml_text("<MissingCustomer>true</MissingCustomer>")]),
+    ]),
+    xml_element("Contacts", [
+        xml_each("contacts", "Contact", [xml_field("Value", "value")],
+                 attrs=[xml_attr("type", "type"), xml_attr("isPrimary", "is_primary", escape=False)]),
+    ]),
+    xml_element("Addresses", [
+        xml_each("addresses", "Address", [
+            xml_field("Line1", "line1"),
+            xml_field("Line2", "line2"),
+            xml_field("City", "city"),
+            xml_field("Region", "region"),
+            xml_field("PostalCode", "postal_code"),
+            xml_field("Country", "country"),
+        ], attrs=[xml_attr("addrType", "addr_type"), xml_attr("isPrimary", "is_primary", escape=False)]),
+    ]),
+    xml_element("KycDocuments", [
+        xml_each("kycDocuments", "Document", [
+            xml_field("DocNumber", "doc_number"),
+            xml_field("IssuedBy", "issued_by"),
+            xml_field("ExpiresOn", "expires_on"),
+        ], attrs=[xml_attr("docType", "doc_type")]),
+    ]),
+]
+render_customer_profile_xml = compile_xml_layout("CustomerProfileReport", CUSTOMER_PROFILE_XML)
+
 # -------------------------
 # ACCOUNTS
 # -------------------------
-def build_accounts_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_accounts_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                               ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
-    cust_to_accounts: DefaultDict[int, List[int]] = defaultdict(list)
-    account_ids_set = set()
-
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
-        for row in dict_rows(conn, f"""
-            SELECT party_id, account_id
-            FROM ecs_account_holders
-            WHERE party_id IN ({ph})
-            ORDER BY party_id, account_id
-        """, params):
-            pid = int(row["party_id"])
-            aid = int(row["account_id"])
-            cust_to_accounts[pid].append(aid)
-            account_ids_set.add(aid)
-
-    account_ids = sorted(account_ids_set)
+    ctx = ctx or build_batch_context(conn, customer_ids)
+    cust_to_accounts = ctx.cust_to_accounts
+    account_ids = ctx.account_ids
 
     acc_map: Dict[int, Dict] = {}
     holders_map: DefaultDict[int, List[Dict]] = defaultdict(list)
     bal_map: Dict[int, float] = defaultdict(float)
 
     if account_ids:
-        for aids in chunked(account_ids, 900):
-            ph, params = in_clause_params(aids)
+        for ids_sql, params in id_sets(account_ids):
             for row in dict_rows(conn, f"""
                 SELECT a.account_id, a.account_number, a.status,
                        dp.code AS product_code, dp.name AS product_name, dp.currency_code,
                        dp.overdraft_allowed, dp.overdraft_limit
                 FROM ecs_accounts a
                 JOIN ecs_deposit_products dp ON dp.product_id = a.product_id
-                WHERE a.account_id IN ({ph})
+                WHERE a.account_id IN {ids_sql}
             """, params):
                 acc_map[int(row["account_id"])] = {
                     "account_id": row["account_id"],
@@ -309,13 +444,12 @@ def build_accounts_docs_for_batch(conn, customer_ids: List[int], as_of_date: str
                     "balance": 0.0,
                 }
 
-        for aids in chunked(account_ids, 900):
-            ph, params = in_clause_params(aids)
+        for ids_sql, params in id_sets(account_ids):
             for row in dict_rows(conn, f"""
                 SELECT h.account_id, h.party_id, h.role, p.full_name
                 FROM ecs_account_holders h
                 JOIN ecs_parties p ON p.party_id = h.party_id
-                WHERE h.account_id IN ({ph})
+                WHERE h.account_id IN {ids_sql}
                 ORDER BY h.account_id,
                          CASE h.role WHEN 'PRIMARY' THEN 0 WHEN 'JOINT' THEN 1 ELSE 2 END,
                          h.party_id
@@ -326,14 +460,13 @@ def build_accounts_docs_for_batch(conn, customer_ids: List[int], as_of_date: str
                     "full_name": row["full_name"],
                 })
 
-        for aids in chunked(account_ids, 900):
-            ph, params = in_clause_params(aids)
+        for ids_sql, params in id_sets(account_ids):
             for row in dict_rows(conn, f"""
                 SELECT ap.account_id, ROUND(COALESCE(SUM(ap.amount),0), 2) AS balance
                 FROM ecs_account_postings ap
                 JOIN ecs_journal_entries je ON je.entry_id = ap.entry_id
                 WHERE je.status='POSTED'
-                  AND ap.account_id IN ({ph})
+                  AND ap.account_id IN {ids_sql}
                 GROUP BY ap.account_id
             """, params):
                 bal_map[int(row["account_id"])] = float(row["balance"])
@@ -343,207 +476,173 @@ def build_accounts_docs_for_batch(conn, customer_ids: List[int], as_of_date: str
             acc["balance"] = bal_map.get(aid, 0.0)
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("ACCOUNTS", as_of_date)
     for cid in customer_ids:
         aids = cust_to_accounts.get(cid, [])
         accounts = [acc_map[aid] for aid in aids if aid in acc_map]
 
         payload = {"accounts": accounts}
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "ACCOUNTS",
-            "asOfDate": as_of_date,
-            "customerId": cid,
-            "payload": payload
-        }
-
-        xml_parts = [
-            f'<AccountsReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}">',
-            "<Accounts>"
-        ]
-        for a in accounts:
-            xml_parts.append("<Account>")
-            xml_parts.append(xml_tag("AccountId", a["account_id"]))
-            xml_parts.append(xml_tag("AccountNumber", a["account_number"]))
-            xml_parts.append(xml_tag("Status", a["status"]))
-            xml_parts.append(xml_tag("Currency", a["currency_code"]))
-            xml_parts.append(f'<Product code="{xml_escape(a["product_code"])}">{xml_escape(a["product_name"])}</Product>')
-            xml_parts.append(xml_tag("Balance", a["balance"]))
-            xml_parts.append(f'<Overdraft allowed="{a["overdraft_allowed"]}">{xml_tag("Limit", a["overdraft_limit"])}</Overdraft>')
-            xml_parts.append("<Holders>")
-            for h in a["holders"]:
-                xml_parts.append(
-                    f'<Holder role="{xml_escape(h["role"])}">'
-                    f'{xml_tag("PartyId", h["party_id"])}'
-                    f'{xml_tag("FullName", h["full_name"])}'
-                    f"</Holder>"
-                )
-            xml_parts.append("</Holders>")
-            xml_parts.append("</Account>")
-        xml_parts.append("</Accounts></AccountsReport>")
 
-        out[cid] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "ACCOUNTS", cid, payload)
+        xml_doc = render_accounts_xml(cid, as_of_date, payload) if STORE_XML else ""
+        out[cid] = (module_json_doc(json_prefix, cid, payload), xml_doc)
 
     return out
 
 
+ACCOUNTS_XML = [
+    xml_element("Accounts", [
+        xml_each("accounts", "Account", [
+            xml_field("AccountId", "account_id"),
+            xml_field("AccountNumber", "account_number"),
+            xml_field("Status", "status"),
+            xml_field("Currency", "currency_code"),
+            xml_element("Product", attrs=[xml_attr("code", "product_code")], text="product_name"),
+            xml_field("Balance", "balance"),
+            xml_element("Overdraft", [xml_field("Limit", "overdraft_limit")],
+                        attrs=[xml_attr("allowed", "overdraft_allowed", escape=False)]),
+            xml_element("Holders", [
+                xml_each("holders", "Holder", [
+                    xml_field("PartyId", "party_id"),
+                    xml_field("FullName", "full_name"),
+                ], attrs=[xml_attr("role", "role")]),
+            ]),
+        ]),
+    ]),
+]
+render_accounts_xml = compile_xml_layout("AccountsReport", ACCOUNTS_XML)
+
 # -------------------------
 # TRANSACTIONS
 # Uses ecs_transactions if present & has rows; otherwise uses postings+journal_entries.
 # Output: last N transactions per customer across all their accounts.
 # -------------------------
-def build_transactions_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_transactions_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                                   ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
     has_ecs_transactions = table_exists(conn, "ecs_transactions")
-    txn_count = dict_row(conn, "SELECT COUNT(*) AS cnt FROM ecs_transactions")["cnt"] if has_ecs_transactions else 0
-
-    # customer -> account_ids
-    cust_to_accounts: DefaultDict[int, List[int]] = defaultdict(list)
-    account_to_customer: Dict[int, List[int]] = defaultdict(list)
-    all_account_ids = set()
-
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
-        for row in dict_rows(conn, f"""
-            SELECT party_id, account_id
-            FROM ecs_account_holders
-            WHERE party_id IN ({ph})
-        """, params):
-            pid = int(row["party_id"])
-            aid = int(row["account_id"])
-            cust_to_accounts[pid].append(aid)
-            account_to_customer[aid].append(pid)
-            all_account_ids.add(aid)
-
-    account_ids = sorted(all_account_ids)
+    txn_count = dict_row(conn, "SELECT EXISTS (SELECT 1 FROM ecs_transactions) AS cnt")["cnt"] if has_ecs_transactions else 0
 
-    # Build per-customer list of txns (we will collect and later trim per customer)
+    # Per-customer list of txns, newest first; ROW_NUMBER keeps only the top N per customer in SQLite
     cust_txns: DefaultDict[int, List[Dict]] = defaultdict(list)
 
-    if account_ids:
-        for aids in chunked(account_ids, 900):
-            ph, params = in_clause_params(aids)
-
-            if has_ecs_transactions and txn_count > 0:
-                # txn_type, amount, txn_ts, description, transfer_id etc.
-                rows = dict_rows(conn, f"""
-                    SELECT account_id, txn_type, amount, txn_ts, description, transfer_id, transaction_id
-                    FROM ecs_transactions
-                    WHERE account_id IN ({ph})
-                    ORDER BY txn_ts DESC
-                """, params)
-                for r in rows:
-                    aid = int(r["account_id"])
-                    for cid in account_to_customer.get(aid, []):
-                        cust_txns[cid].append({
-                            "source": "ecs_transactions",
-                            "transactionId": r.get("transaction_id"),
-                            "accountId": aid,
-                            "type": r.get("txn_type"),
-                            "amount": r.get("amount"),
-                            "timestamp": r.get("txn_ts"),
-                            "description": r.get("description"),
-                            "transferId": r.get("transfer_id"),
-                        })
-            else:
-                # fallback: postings + journal entry metadata
-                rows = dict_rows(conn, f"""
-                    SELECT ap.account_id, ap.amount, ap.posting_ts, ap.description,
-                           je.entry_id, je.source AS entry_source, je.reference, je.entry_ts
-                    FROM ecs_account_postings ap
+    for ids_sql, params in id_sets(customer_ids):
+        if has_ecs_transactions and txn_count > 0:
+            # txn_type, amount, txn_ts, description, transfer_id etc.
+            rows = dict_rows(conn, f"""
+                SELECT party_id, account_id, txn_type, amount, txn_ts, description, transfer_id, transaction_id
+                FROM (
+                    SELECT h.party_id, t.account_id, t.txn_type, t.amount, t.txn_ts, t.description,
+                           t.transfer_id, t.transaction_id,
+                           ROW_NUMBER() OVER (PARTITION BY h.party_id
+                                              ORDER BY t.txn_ts DESC, t.transaction_id DESC) AS rn
+                    FROM ecs_account_holders h
+                    JOIN ecs_transactions t ON t.account_id = h.account_id
+                    WHERE h.party_id IN {ids_sql}
+                )
+                WHERE rn <= ?
+                ORDER BY party_id, rn
+            """, params + (TXN_LIMIT_PER_CUSTOMER,))
+            for r in rows:
+                cust_txns[int(r["party_id"])].append({
+                    "source": "ecs_transactions",
+                    "transactionId": r.get("transaction_id"),
+                    "accountId": int(r["account_id"]),
+                    "type": r.get("txn_type"),
+                    "amount": r.get("amount"),
+                    "timestamp": r.get("txn_ts"),
+                    "description": r.get("description"),
+                    "transferId": r.get("transfer_id"),
+                })
+        else:
+            # fallback: postings + journal entry metadata
+            rows = dict_rows(conn, f"""
+                SELECT party_id, account_id, amount, posting_ts, description,
+                       entry_id, entry_source, reference, entry_ts
+                FROM (
+                    SELECT h.party_id, ap.account_id, ap.amount, ap.posting_ts, ap.description,
+                           je.entry_id, je.source AS entry_source, je.reference, je.entry_ts,
+                           ROW_NUMBER() OVER (PARTITION BY h.party_id
+                                              ORDER BY ap.posting_ts DESC, ap.posting_id DESC) AS rn
+                    FROM ecs_account_holders h
+                    JOIN ecs_account_postings ap ON ap.account_id = h.account_id
                     JOIN ecs_journal_entries je ON je.entry_id = ap.entry_id
                     WHERE je.status='POSTED'
-                      AND ap.account_id IN ({ph})
-                    ORDER BY ap.posting_ts DESC
-                """, params)
-                for r in rows:
-                    aid = int(r["account_id"])
-                    for cid in account_to_customer.get(aid, []):
-                        cust_txns[cid].append({
-                            "source": "ecs_account_postings",
-                            "entryId": r.get("entry_id"),
-                            "accountId": aid,
-                            "amount": r.get("amount"),
-                            "postingTs": r.get("posting_ts"),
-                            "description": r.get("description"),
-                            "entrySource": r.get("entry_source"),
-                            "reference": r.get("reference"),
-                            "entryTs": r.get("entry_ts"),
-                        })
+                      AND h.party_id IN {ids_sql}
+                )
+                WHERE rn <= ?
+                ORDER BY party_id, rn
+            """, params + (TXN_LIMIT_PER_CUSTOMER,))
+            for r in rows:
+                cust_txns[int(r["party_id"])].append({
+                    "source": "ecs_account_postings",
+                    "entryId": r.get("entry_id"),
+                    "accountId": int(r["account_id"]),
+                    "amount": r.get("amount"),
+                    "postingTs": r.get("posting_ts"),
+                    "description": r.get("description"),
+                    "entrySource": r.get("entry_source"),
+                    "reference": r.get("reference"),
+                    "entryTs": r.get("entry_ts"),
+                })
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("TRANSACTIONS", as_of_date)
     for cid in customer_ids:
-        txns = cust_txns.get(cid, [])
-
-        # sort newest first using whichever timestamp we have
-        def ts_key(x):
-            return x.get("timestamp") or x.get("postingTs") or ""
-
-        txns_sorted = sorted(txns, key=ts_key, reverse=True)[:TXN_LIMIT_PER_CUSTOMER]
+        # already newest first and limited by the query
+        txns_sorted = cust_txns.get(cid, [])
 
         payload = {"transactions": txns_sorted, "limit": TXN_LIMIT_PER_CUSTOMER}
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "TRANSACTIONS",
-            "asOfDate": as_of_date,
-            "customerId": cid,
-            "payload": payload
-        }
 
-        xml_parts = [
-            f'<TransactionsReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}">',
-            f'<Transactions limit="{TXN_LIMIT_PER_CUSTOMER}">'
-        ]
-        for t in txns_sorted:
-            xml_parts.append("<Transaction>")
-            for k, v in t.items():
-                xml_parts.append(xml_tag(k, v))
-            xml_parts.append("</Transaction>")
-        xml_parts.append("</Transactions></TransactionsReport>")
-
-        out[cid] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "TRANSACTIONS", cid, payload)
+        xml_doc = render_transactions_xml(cid, as_of_date, payload) if STORE_XML else ""
+        out[cid] = (module_json_doc(json_prefix, cid, payload), xml_doc)
 
     return out
 
 
+TRANSACTIONS_XML = [
+    xml_element("Transactions", [
+        xml_each("transactions", "Transaction", [
+            xml_switch("source", {
+                "ecs_transactions": xml_fields(
+                    "source", "transactionId", "accountId", "type", "amount", "timestamp",
+                    "description", "transferId"),
+                "ecs_account_postings": xml_fields(
+                    "source", "entryId", "accountId", "amount", "postingTs", "description",
+                    "entrySource", "reference", "entryTs"),
+            }),
+        ]),
+    ], attrs=[xml_attr("limit", "limit", escape=False)]),
+]
+render_transactions_xml = compile_xml_layout("TransactionsReport", TRANSACTIONS_XML)
+
 # -------------------------
 # CARDS
 # cards + open authorizations + recent settlements
 # -------------------------
-def build_cards_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_cards_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                            ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
-    # customer -> account_ids
-    cust_to_accounts: DefaultDict[int, List[int]] = defaultdict(list)
-    all_account_ids = set()
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
-        for row in dict_rows(conn, f"""
-            SELECT party_id, account_id
-            FROM ecs_account_holders
-            WHERE party_id IN ({ph})
-        """, params):
-            pid = int(row["party_id"])
-            aid = int(row["account_id"])
-            cust_to_accounts[pid].append(aid)
-            all_account_ids.add(aid)
-
-    account_ids = sorted(all_account_ids)
+    ctx = ctx or build_batch_context(conn, customer_ids)
+    account_to_customers = ctx.account_to_customers
+    account_ids = ctx.account_ids
     # Prefetch cards for those accounts
     cards_by_customer: DefaultDict[int, List[Dict]] = defaultdict(list)
     cards_map: Dict[int, Dict] = {}
 
     if account_ids:
-        for aids in chunked(account_ids, 900):
-            ph, params = in_clause_params(aids)
+        for ids_sql, params in id_sets(account_ids):
             for row in dict_rows(conn, f"""
                 SELECT card_id, account_id, pan_last4, card_type, status, issued_at, expires_on
                 FROM ecs_cards
-                WHERE account_id IN ({ph})
+                WHERE account_id IN {ids_sql}
             """, params):
-                cid_list = [c for c in customer_ids if int(row["account_id"]) in cust_to_accounts.get(c, [])]
+                cid_list = account_to_customers.get(int(row["account_id"]), [])
                 card = {
                     "cardId": row["card_id"],
                     "accountId": row["account_id"],
@@ -563,15 +662,19 @@ def build_cards_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -
         # Prefetch open auths for all cards involved
         all_card_ids = sorted(cards_map.keys())
         if all_card_ids:
-            for cids in chunked(all_card_ids, 900):
-                ph, params = in_clause_params(cids)
+            for ids_sql, params in id_sets(all_card_ids):
                 auths = dict_rows(conn, f"""
                     SELECT auth_id, card_id, account_id, amount, merchant, auth_ts, status, reference
-                    FROM ecs_card_authorizations
-                    WHERE card_id IN ({ph})
-                      AND status='APPROVED'
-                    ORDER BY auth_ts DESC
-                """, params)
+                    FROM (
+                        SELECT auth_id, card_id, account_id, amount, merchant, auth_ts, status, reference,
+                               ROW_NUMBER() OVER (PARTITION BY card_id ORDER BY auth_ts DESC, auth_id DESC) AS rn
+                        FROM ecs_card_authorizations
+                        WHERE card_id IN {ids_sql}
+                          AND status='APPROVED'
+                    )
+                    WHERE rn <= ?
+                    ORDER BY card_id, rn
+                """, params + (CARD_OPEN_AUTHS_LIMIT_PER_CUSTOMER,))
                 auths_by_card: DefaultDict[int, List[Dict]] = defaultdict(list)
                 for a in auths:
                     auths_by_card[int(a["card_id"])].append({
@@ -584,93 +687,87 @@ def build_cards_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -
                         "reference": a["reference"],
                     })
                 for card_id, lst in auths_by_card.items():
-                    cards_map[card_id]["openAuthorizations"] = lst[:CARD_OPEN_AUTHS_LIMIT_PER_CUSTOMER]
+                    cards_map[card_id]["openAuthorizations"] = lst
 
             # Prefetch settlements (join to auths)
-            settlements = dict_rows(conn, """
-                SELECT s.settlement_id, s.auth_id, s.entry_id, s.settled_ts,
-                       a.card_id, a.amount, a.merchant, a.reference
-                FROM ecs_card_settlements s
-                JOIN ecs_card_authorizations a ON a.auth_id = s.auth_id
-                WHERE a.card_id IN ({})
-                ORDER BY s.settled_ts DESC
-            """.format(",".join(["?"] * len(all_card_ids))), tuple(all_card_ids))
-
             settle_by_card: DefaultDict[int, List[Dict]] = defaultdict(list)
-            for s in settlements:
-                settle_by_card[int(s["card_id"])].append({
-                    "settlementId": s["settlement_id"],
-                    "authId": s["auth_id"],
-                    "entryId": s["entry_id"],
-                    "settledTs": s["settled_ts"],
-                    "amount": s["amount"],
-                    "merchant": s["merchant"],
-                    "reference": s["reference"],
-                })
+            for ids_sql, params in id_sets(all_card_ids):
+                settlements = dict_rows(conn, f"""
+                    SELECT settlement_id, auth_id, entry_id, settled_ts, card_id, amount, merchant, reference
+                    FROM (
+                        SELECT s.settlement_id, s.auth_id, s.entry_id, s.settled_ts,
+                               a.card_id, a.amount, a.merchant, a.reference,
+                               ROW_NUMBER() OVER (PARTITION BY a.card_id
+                                                  ORDER BY s.settled_ts DESC, s.settlement_id DESC) AS rn
+                        FROM ecs_card_settlements s
+                        JOIN ecs_card_authorizations a ON a.auth_id = s.auth_id
+                        WHERE a.card_id IN {ids_sql}
+                    )
+                    WHERE rn <= ?
+                    ORDER BY card_id, rn
+                """, params + (CARD_SETTLEMENTS_LIMIT_PER_CUSTOMER,))
+                for s in settlements:
+                    settle_by_card[int(s["card_id"])].append({
+                        "settlementId": s["settlement_id"],
+                        "authId": s["auth_id"],
+                        "entryId": s["entry_id"],
+                        "settledTs": s["settled_ts"],
+                        "amount": s["amount"],
+                        "merchant": s["merchant"],
+                        "reference": s["reference"],
+                    })
             for card_id, lst in settle_by_card.items():
-                cards_map[card_id]["recentSettlements"] = lst[:CARD_SETTLEMENTS_LIMIT_PER_CUSTOMER]
+                cards_map[card_id]["recentSettlements"] = lst
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("CARDS", as_of_date)
     for cust_id in customer_ids:
         payload = {"cards": cards_by_customer.get(cust_id, [])}
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "CARDS",
-            "asOfDate": as_of_date,
-            "customerId": cust_id,
-            "payload": payload
-        }
-        xml_parts = [
-            f'<CardsReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cust_id}"><Cards>'
-        ]
-        for card in cards_by_customer.get(cust_id, []):
-            xml_parts.append('<Card>')
-            xml_parts.append(xml_tag("CardId", card["cardId"]))
-            xml_parts.append(xml_tag("AccountId", card["accountId"]))
-            xml_parts.append(xml_tag("PanLast4", card["panLast4"]))
-            xml_parts.append(xml_tag("CardType", card["cardType"]))
-            xml_parts.append(xml_tag("Status", card["status"]))
-            xml_parts.append(xml_tag("IssuedAt", card["issuedAt"]))
-            xml_parts.append(xml_tag("ExpiresOn", card["expiresOn"]))
-
-            xml_parts.append('<OpenAuthorizations>')
-            for a in card["openAuthorizations"]:
-                xml_parts.append('<Authorization>')
-                for k, v in a.items():
-                    xml_parts.append(xml_tag(k, v))
-                xml_parts.append('</Authorization>')
-            xml_parts.append('</OpenAuthorizations>')
-
-            xml_parts.append('<RecentSettlements>')
-            for s in card["recentSettlements"]:
-                xml_parts.append('<Settlement>')
-                for k, v in s.items():
-                    xml_parts.append(xml_tag(k, v))
-                xml_parts.append('</Settlement>')
-            xml_parts.append('</RecentSettlements>')
-
-            xml_parts.append('</Card>')
-        xml_parts.append('</Cards></CardsReport>')
-        out[cust_id] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "CARDS", cust_id, payload)
+        xml_doc = render_cards_xml(cust_id, as_of_date, payload) if STORE_XML else ""
+        out[cust_id] = (module_json_doc(json_prefix, cust_id, payload), xml_doc)
     return out
 
 
+CARDS_XML = [
+    xml_element("Cards", [
+        xml_each("cards", "Card", [
+            xml_field("CardId", "cardId"),
+            xml_field("AccountId", "accountId"),
+            xml_field("PanLast4", "panLast4"),
+            xml_field("CardType", "cardType"),
+            xml_field("Status", "status"),
+            xml_field("IssuedAt", "issuedAt"),
+            xml_field("ExpiresOn", "expiresOn"),
+            xml_element("OpenAuthorizations", [
+                xml_each("openAuthorizations", "Authorization", xml_fields(
+                    "authId", "accountId", "amount", "merchant", "authTs", "status", "reference")),
+            ]),
+            xml_element("RecentSettlements", [
+                xml_each("recentSettlements", "Settlement", xml_fields(
+                    "settlementId", "authId", "entryId", "settledTs", "amount", "merchant", "reference")),
+            ]),
+        ]),
+    ]),
+]
+render_cards_xml = compile_xml_layout("CardsReport", CARDS_XML)
+
 # -------------------------
 # LOANS
 # -------------------------
-def build_loans_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_loans_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                            ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
     loans_by_customer: DefaultDict[int, List[Dict]] = defaultdict(list)
     loan_ids = []
 
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
+    for ids_sql, params in id_sets(customer_ids):
         for row in dict_rows(conn, f"""
             SELECT loan_id, party_id, branch_id, loan_product_id, principal, apr, term_months, status, originated_at
             FROM ecs_loans
-            WHERE party_id IN ({ph})
+            WHERE party_id IN {ids_sql}
             ORDER BY originated_at DESC
         """, params):
             loan = {
@@ -692,13 +789,16 @@ def build_loans_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -
     loan_ids = sorted(set(loan_ids))
     if loan_ids:
         # next due per loan (first DUE installment)
-        for lids in chunked(loan_ids, 900):
-            ph, params = in_clause_params(lids)
+        for ids_sql, params in id_sets(loan_ids):
             due_rows = dict_rows(conn, f"""
                 SELECT loan_id, installment_no, due_date, due_principal, due_interest
-                FROM ecs_loan_schedule
-                WHERE loan_id IN ({ph}) AND status='DUE'
-                ORDER BY loan_id, due_date
+                FROM (
+                    SELECT loan_id, installment_no, due_date, due_principal, due_interest,
+                           ROW_NUMBER() OVER (PARTITION BY loan_id ORDER BY due_date, installment_no) AS rn
+                    FROM ecs_loan_schedule
+                    WHERE loan_id IN {ids_sql} AND status='DUE'
+                )
+                WHERE rn = 1
             """, params)
             next_due_map = {}
             for r in due_rows:
@@ -714,10 +814,15 @@ def build_loans_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -
             # recent payments
             pay_rows = dict_rows(conn, f"""
                 SELECT payment_id, loan_id, entry_id, paid_at, amount
-                FROM ecs_loan_payments
-                WHERE loan_id IN ({ph})
-                ORDER BY paid_at DESC
-            """, params)
+                FROM (
+                    SELECT payment_id, loan_id, entry_id, paid_at, amount,
+                           ROW_NUMBER() OVER (PARTITION BY loan_id ORDER BY paid_at DESC, payment_id DESC) AS rn
+                    FROM ecs_loan_payments
+                    WHERE loan_id IN {ids_sql}
+                )
+                WHERE rn <= ?
+                ORDER BY loan_id, rn
+            """, params + (LOAN_PAYMENTS_LIMIT_PER_CUSTOMER,))
             pay_map: DefaultDict[int, List[Dict]] = defaultdict(list)
             for p in pay_rows:
                 pay_map[int(p["loan_id"])].append({
@@ -734,60 +839,55 @@ def build_loans_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -
                     if lid in next_due_map:
                         loan["nextDue"] = next_due_map[lid]
                     if lid in pay_map:
-                        loan["recentPayments"] = pay_map[lid][:LOAN_PAYMENTS_LIMIT_PER_CUSTOMER]
+                        loan["recentPayments"] = pay_map[lid]
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("LOANS", as_of_date)
     for cust_id in customer_ids:
         payload = {"loans": loans_by_customer.get(cust_id, [])}
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "LOANS",
-            "asOfDate": as_of_date,
-            "customerId": cust_id,
-            "payload": payload
-        }
-        xml_parts = [f'<LoansReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cust_id}"><Loans>']
-        for loan in loans_by_customer.get(cust_id, []):
-            xml_parts.append("<Loan>")
-            for k in ["loanId", "principal", "apr", "termMonths", "status", "originatedAt"]:
-                xml_parts.append(xml_tag(k, loan.get(k)))
-            if loan.get("nextDue"):
-                xml_parts.append("<NextDue>")
-                for k, v in loan["nextDue"].items():
-                    xml_parts.append(xml_tag(k, v))
-                xml_parts.append("</NextDue>")
-            xml_parts.append("<RecentPayments>")
-            for p in loan.get("recentPayments", []):
-                xml_parts.append("<Payment>")
-                for k, v in p.items():
-                    xml_parts.append(xml_tag(k, v))
-                xml_parts.append("</Payment>")
-            xml_parts.append("</RecentPayments>")
-            xml_parts.append("</Loan>")
-        xml_parts.append("</Loans></LoansReport>")
-        out[cust_id] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "LOANS", cust_id, payload)
+        xml_doc = render_loans_xml(cust_id, as_of_date, payload) if STORE_XML else ""
+        out[cust_id] = (module_json_doc(json_prefix, cust_id, payload), xml_doc)
     return out
 
 
+LOANS_XML = [
+    xml_element("Loans", [
+        xml_each("loans", "Loan", [
+            xml_fields("loanId", "principal", "apr", "termMonths", "status", "originatedAt"),
+            xml_object("nextDue", "NextDue", xml_fields("installmentNo", "dueDate", "duePrincipal", "dueInterest")),
+            xml_element("RecentPayments", [
+                xml_each("recentPayments", "Payment", xml_fields("paymentId", "entryId", "paidAt", "amount")),
+            ]),
+        ]),
+    ]),
+]
+render_loans_xml = compile_xml_layout("LoansReport", LOANS_XML)
+
 # -------------------------
 # COMPLIANCE
 # -------------------------
-def build_compliance_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_compliance_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                                 ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
     flags_by_customer: DefaultDict[int, List[Dict]] = defaultdict(list)
 
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
+    for ids_sql, params in id_sets(customer_ids):
         rows = dict_rows(conn, f"""
             SELECT flag_id, party_id, account_id, severity, category, note, created_at, status
-            FROM ecs_compliance_flags
-            WHERE party_id IN ({ph})
-            ORDER BY party_id,
-                     CASE status WHEN 'OPEN' THEN 0 ELSE 1 END,
-                     created_at DESC
-        """, params)
+            FROM (
+                SELECT flag_id, party_id, account_id, severity, category, note, created_at, status,
+                       ROW_NUMBER() OVER (PARTITION BY party_id
+                                          ORDER BY CASE status WHEN 'OPEN' THEN 0 ELSE 1 END,
+                                                   created_at DESC, flag_id DESC) AS rn
+                FROM ecs_compliance_flags
+                WHERE party_id IN {ids_sql}
+            )
+            WHERE rn <= ?
+            ORDER BY party_id, rn
+        """, params + (COMPLIANCE_FLAGS_LIMIT_PER_CUSTOMER,))
         for r in rows:
             flags_by_customer[int(r["party_id"])].append({
                 "flagId": r["flag_id"],
@@ -800,127 +900,220 @@ def build_compliance_docs_for_batch(conn, customer_ids: List[int], as_of_date: s
             })
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("COMPLIANCE", as_of_date)
     for cid in customer_ids:
-        flags = flags_by_customer.get(cid, [])[:COMPLIANCE_FLAGS_LIMIT_PER_CUSTOMER]
+        flags = flags_by_customer.get(cid, [])
         payload = {"flags": flags, "limit": COMPLIANCE_FLAGS_LIMIT_PER_CUSTOMER}
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "COMPLIANCE",
-            "asOfDate": as_of_date,
-            "customerId": cid,
-            "payload": payload
-        }
-        xml_parts = [
-            f'<ComplianceReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}"><Flags>'
-        ]
-        for f in flags:
-            xml_parts.append("<Flag>")
-            for k, v in f.items():
-                xml_parts.append(xml_tag(k, v))
-            xml_parts.append("</Flag>")
-        xml_parts.append("</Flags></ComplianceReport>")
-        out[cid] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "COMPLIANCE", cid, payload)
+        xml_doc = render_compliance_xml(cid, as_of_date, payload) if STORE_XML else ""
+        out[cid] = (module_json_doc(json_prefix, cid, payload), xml_doc)
     return out
 
 
+COMPLIANCE_XML = [
+    xml_element("Flags", [
+        xml_each("flags", "Flag", xml_fields(
+            "flagId", "accountId", "severity", "category", "note", "createdAt", "status")),
+    ]),
+]
+render_compliance_xml = compile_xml_layout("ComplianceReport", COMPLIANCE_XML)
+
 # -------------------------
 # FEES
 # -------------------------
-def build_fees_docs_for_batch(conn, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
+def build_fees_docs_for_batch(conn, customer_ids: List[int], as_of_date: str,
+                           ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
     if not customer_ids:
         return {}
 
-    # customer -> account_ids
-    cust_to_accounts: DefaultDict[int, List[int]] = defaultdict(list)
-    all_account_ids = set()
-    for ids in chunked(customer_ids, 900):
-        ph, params = in_clause_params(ids)
-        for row in dict_rows(conn, f"""
-            SELECT party_id, account_id
-            FROM ecs_account_holders
-            WHERE party_id IN ({ph})
-        """, params):
-            pid = int(row["party_id"])
-            aid = int(row["account_id"])
-            cust_to_accounts[pid].append(aid)
-            all_account_ids.add(aid)
-
-    account_ids = sorted(all_account_ids)
+    # newest fees first, top N per customer across all of their accounts
     fees_by_customer: DefaultDict[int, List[Dict]] = defaultdict(list)
 
-    if account_ids:
-        for aids in chunked(account_ids, 900):
-            ph, params = in_clause_params(aids)
-            rows = dict_rows(conn, f"""
-                SELECT fa.fee_id, fa.account_id, fa.entry_id, fa.applied_at,
-                       ft.code AS fee_code, ft.name AS fee_name, ft.amount AS fee_amount
-                FROM ecs_fees_applied fa
+    for ids_sql, params in id_sets(customer_ids):
+        rows = dict_rows(conn, f"""
+            SELECT party_id, fee_id, account_id, entry_id, applied_at, fee_code, fee_name, fee_amount
+            FROM (
+                SELECT h.party_id, fa.fee_id, fa.account_id, fa.entry_id, fa.applied_at,
+                       ft.code AS fee_code, ft.name AS fee_name, ft.amount AS fee_amount,
+                       ROW_NUMBER() OVER (PARTITION BY h.party_id
+                                          ORDER BY fa.applied_at DESC, fa.fee_id DESC) AS rn
+                FROM ecs_account_holders h
+                JOIN ecs_fees_applied fa ON fa.account_id = h.account_id
                 JOIN ecs_fee_types ft ON ft.fee_type_id = fa.fee_type_id
-                WHERE fa.account_id IN ({ph})
-                ORDER BY fa.applied_at DESC
-            """, params)
-
-            account_to_customers: DefaultDict[int, List[int]] = defaultdict(list)
-            for cust_id, a_list in cust_to_accounts.items():
-                for a in a_list:
-                    account_to_customers[a].append(cust_id)
+                WHERE h.party_id IN {ids_sql}
+            )
+            WHERE rn <= ?
+            ORDER BY party_id, rn
+        """, params + (FEES_LIMIT_PER_CUSTOMER,))
 
-            for r in rows:
-                aid = int(r["account_id"])
-                fee_obj = {
-                    "feeId": r["fee_id"],
-                    "accountId": aid,
-                    "entryId": r["entry_id"],
-                    "appliedAt": r["applied_at"],
-                    "feeCode": r["fee_code"],
-                    "feeName": r["fee_name"],
-                    "feeAmount": r["fee_amount"],
-                }
-                for cust_id in account_to_customers.get(aid, []):
-                    fees_by_customer[cust_id].append(fee_obj)
+        for r in rows:
+            fees_by_customer[int(r["party_id"])].append({
+                "feeId": r["fee_id"],
+                "accountId": int(r["account_id"]),
+                "entryId": r["entry_id"],
+                "appliedAt": r["applied_at"],
+                "feeCode": r["fee_code"],
+                "feeName": r["fee_name"],
+                "feeAmount": r["fee_amount"],
+            })
 
     out: Dict[int, Tuple[str, str]] = {}
+    json_prefix = module_json_prefix("FEES", as_of_date)
     for cid in customer_ids:
-        fees = fees_by_customer.get(cid, [])
-        fees_sorted = sorted(fees, key=lambda x: x.get("appliedAt") or "", reverse=True)[:FEES_LIMIT_PER_CUSTOMER]
+        fees_sorted = fees_by_customer.get(cid, [])
         payload = {"fees": fees_sorted, "limit": FEES_LIMIT_PER_CUSTOMER}
-        json_doc = {
-            "schemaVersion": "1.0",
-            "module": "FEES",
-            "asOfDate": as_of_date,
-            "customerId": cid,
-            "payload": payload
-        }
-        xml_parts = [f'<FeesReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}"><Fees>']
-        for f in fees_sorted:
-            xml_parts.append("<Fee>")
-            for k, v in f.items():
-                xml_parts.append(xml_tag(k, v))
-            xml_parts.append("</Fee>")
-        xml_parts.append("</Fees></FeesReport>")
-        out[cid] = (json.dumps(json_doc, ensure_ascii=False), "".join(xml_parts))
+        keep_payload(ctx, "FEES", cid, payload)
+        xml_doc = render_fees_xml(cid, as_of_date, payload) if STORE_XML else ""
+        out[cid] = (module_json_doc(json_prefix, cid, payload), xml_doc)
     return out
 
 
+FEES_XML = [
+    xml_element("Fees", [
+        xml_each("fees", "Fee", xml_fields(
+            "feeId", "accountId", "entryId", "appliedAt", "feeCode", "feeName", "feeAmount")),
+    ]),
+]
+render_fees_xml = compile_xml_layout("FeesReport", FEES_XML)
+
 # -------------------------
 # Module dispatcher
 # -------------------------
-def build_module_docs_for_batch(conn, module: str, customer_ids: List[int], as_of_date: str) -> Dict[int, Tuple[str, str]]:
-    if module == "CUSTOMER_PROFILE":
-        return build_customer_profile_docs_for_batch(conn, customer_ids, as_of_date)
-    if module == "ACCOUNTS":
-        return build_accounts_docs_for_batch(conn, customer_ids, as_of_date)
-    if module == "TRANSACTIONS":
-        return build_transactions_docs_for_batch(conn, customer_ids, as_of_date)
-    if module == "CARDS":
-        return build_cards_docs_for_batch(conn, customer_ids, as_of_date)
-    if module == "LOANS":
-        return build_loans_docs_for_batch(conn, customer_ids, as_of_date)
-    if module == "COMPLIANCE":
-        return build_compliance_docs_for_batch(conn, customer_ids, as_of_date)
-    if module == "FEES":
-        return build_fees_docs_for_batch(conn, customer_ids, as_of_date)
-    raise ValueError(f"Unsupported module: {module}")
+MODULE_BUILDERS = {
+    "CUSTOMER_PROFILE": build_customer_profile_docs_for_batch,
+    "ACCOUNTS": build_accounts_docs_for_batch,
+    "TRANSACTIONS": build_transactions_docs_for_batch,
+    "CARDS": build_cards_docs_for_batch,
+    "LOANS": build_loans_docs_for_batch,
+    "COMPLIANCE": build_compliance_docs_for_batch,
+    "FEES": build_fees_docs_for_batch,
+}
+
+# Module XML layouts; also used by the API to render module rows stored without XML
+MODULE_XML_RENDERERS = {
+    "CUSTOMER_PROFILE": render_customer_profile_xml,
+    "ACCOUNTS": render_accounts_xml,
+    "TRANSACTIONS": render_transactions_xml,
+    "CARDS": render_cards_xml,
+    "LOANS": render_loans_xml,
+    "COMPLIANCE": render_compliance_xml,
+    "FEES": render_fees_xml,
+}
+
+
+def build_module_docs_for_batch(conn, module: str, customer_ids: List[int], as_of_date: str,
+                                ctx: Optional[BatchContext] = None) -> Dict[int, Tuple[str, str]]:
+    builder = MODULE_BUILDERS.get(module)
+    if builder is None:
+        raise ValueError(f"Unsupported module: {module}")
+    return builder(conn, customer_ids, as_of_date, ctx)
+
+
+# -------------------------
+# Incremental runs (change tracking)
+# -------------------------
+@dataclass
+class DeltaBase:
+    """The previous tracked run an incremental run carries unchanged documents forward from."""
+    run_id: int
+    change_seq: int
+    as_of_date: str
+
+
+CARRY_FORWARD_SQL = """
+INSERT OR IGNORE INTO ecs_customer_rpt_modules
+  (run_id, customer_id, module_code, json_doc, xml_doc, generated_at, codec, doc_hash)
+SELECT ?, customer_id, module_code,
+       rebase_doc(json_doc, codec, ?, ?),
+       rebase_doc(xml_doc, codec, ?, ?),
+       generated_at, codec, doc_hash
+FROM ecs_customer_rpt_modules
+WHERE run_id = ? AND module_code = ? AND customer_id IN {ids_sql}
+"""
+
+
+def rebase_doc(doc, codec: Optional[str], old: str, new: str):
+    """Replaces the first `old` (the envelope asOfDate) in a stored document, keeping its codec."""
+    if doc is None or old == new:
+        return doc
+    return encode_doc(decode_doc(doc, codec).replace(old, new, 1), codec or "identity")
+
+
+def change_tracking_installed(conn: sqlite3.Connection) -> bool:
+    return table_exists(conn, "ecs_rpt_changes") and table_exists(conn, "ecs_rpt_run_watermarks")
+
+
+def record_run_watermark(conn: sqlite3.Connection, run_id: int):
+    # INSERT OR IGNORE: a re-started run keeps the watermark it was first started from
+    conn.execute("""
+        INSERT OR IGNORE INTO ecs_rpt_run_watermarks (run_id, change_seq)
+        SELECT ?, seq FROM ecs_rpt_change_seq WHERE id = 1
+    """, (run_id,))
+    conn.commit()
+
+
+def get_delta_base(conn: sqlite3.Connection, run_id: int) -> Optional[DeltaBase]:
+    r = dict_row(conn, """
+        SELECT w.run_id, w.change_seq, r.as_of_date
+        FROM ecs_rpt_run_watermarks w
+        JOIN ecs_rpt_runs r ON r.run_id = w.run_id
+        WHERE w.run_id < ? AND r.as_of_date IS NOT NULL
+        ORDER BY w.run_id DESC
+        LIMIT 1
+    """, (run_id,))
+    if not r:
+        return None
+    return DeltaBase(run_id=int(r["run_id"]), change_seq=int(r["change_seq"]), as_of_date=r["as_of_date"])
+
+
+def plan_batch_modules(conn, customer_ids: List[int], modules: List[str],
+                       base: Optional[DeltaBase]) -> Dict[str, List[int]]:
+    """
+    Customers to (re)build per module. Full runs build everything; incremental runs
+    build the pairs changed after the base run's watermark or missing from the base run.
+    """
+    if base is None:
+        return {module: customer_ids for module in modules}
+
+    changed: DefaultDict[str, set] = defaultdict(set)
+    present: DefaultDict[str, set] = defaultdict(set)
+    for ids_sql, params in id_sets(customer_ids):
+        for r in dict_rows(conn, f"""
+            SELECT customer_id, module_code
+            FROM ecs_rpt_changes
+            WHERE change_seq > ? AND customer_id IN {ids_sql}
+        """, (base.change_seq,) + params):
+            changed[r["module_code"]].add(int(r["customer_id"]))
+
+        for r in dict_rows(conn, f"""
+            SELECT customer_id, module_code
+            FROM ecs_customer_rpt_modules
+            WHERE run_id = ? AND customer_id IN {ids_sql}
+        """, (base.run_id,) + params):
+            present[r["module_code"]].add(int(r["customer_id"]))
+
+    return {
+        module: [cid for cid in customer_ids if cid in changed[module] or cid not in present[module]]
+        for module in modules
+    }
+
+
+def carry_forward_module_rows(conn: sqlite3.Connection, run_id: int, base: DeltaBase, as_of_date: str,
+                              module: str, customer_ids: List[int]):
+    """
+    Copies unchanged documents from the base run, re-stamped with this run's asOfDate
+    (deduplicated rows only copy their doc_hash: the envelope is not stored).
+    """
+    json_old = f'"asOfDate": {json.dumps(base.as_of_date, ensure_ascii=False)}'
+    json_new = f'"asOfDate": {json.dumps(as_of_date, ensure_ascii=False)}'
+    xml_old = f'asOfDate="{xml_escape(base.as_of_date)}"'
+    xml_new = f'asOfDate="{xml_escape(as_of_date)}"'
+
+    for ids_sql, params in id_sets(customer_ids):
+        conn.execute("BEGIN;")
+        conn.execute(CARRY_FORWARD_SQL.format(ids_sql=ids_sql),
+                     (run_id, json_old, json_new, xml_old, xml_new, base.run_id, module) + params)
+        conn.commit()
 
 
 # -------------------------
@@ -930,63 +1123,358 @@ def insert_rows(conn: sqlite3.Connection, rows: List[Tuple]):
     conn.executemany(INSERT_SQL, rows)
 
 
-def process_batch(conn: sqlite3.Connection, run_id: int, batch_no: int, as_of_date: str):
+FALLBACK_PAYLOAD = {"warning": "no data generated"}
+
+
+def build_module_rows(run_id: int, module: str, customer_ids: List[int], docs: Dict[int, Tuple[str, str]],
+                      as_of_date: str, generated_at: str) -> List[Tuple]:
+    rows: List[Tuple] = []
+    for cid in customer_ids:
+        json_doc, xml_doc = docs.get(cid, (None, None))
+        if json_doc is None:
+            # Should not happen often; but keep it safe
+            json_doc = module_json_doc(module_json_prefix(module, as_of_date), cid, FALLBACK_PAYLOAD)
+            xml_doc = f'<{module}Report schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}"><Warning>no data generated</Warning></{module}Report>'
+
+        rows.append((run_id, cid, module, json_doc, xml_doc, generated_at))
+    return rows
+
+
+def encode_module_rows(conn, rows: List[Tuple], as_of_date: str) -> Tuple[List[Tuple], List[Tuple]]:
+    """Raw module rows -> (rows to insert, new blob rows) per STORAGE_CODEC / DEDUP_DOCS."""
+    if not DEDUP_DOCS:
+        return [(run_id, cid, module, encode_doc(json_doc, STORAGE_CODEC), encode_doc(xml_doc, STORAGE_CODEC),
+                 generated_at, STORAGE_CODEC, None)
+                for run_id, cid, module, json_doc, xml_doc, generated_at in rows], []
+
+    out: List[Tuple] = []
+    bodies: Dict[str, Tuple[str, str]] = {}
+    for run_id, cid, module, json_doc, xml_doc, generated_at in rows:
+        h = dedup_doc(json_doc, xml_doc, module_json_head(module, as_of_date, cid), as_of_date, cid, bodies)
+        if h is None:
+            out.append((run_id, cid, module, encode_doc(json_doc, STORAGE_CODEC), encode_doc(xml_doc, STORAGE_CODEC),
+                        generated_at, STORAGE_CODEC, None))
+        else:
+            out.append((run_id, cid, module, "", "", generated_at, STORAGE_CODEC, h))
+    return out, new_blob_rows(conn, bodies, STORAGE_CODEC)
+
+
+def write_blobs(conn: sqlite3.Connection, blobs: List[Tuple]):
+    # blobs go in before the rows pointing to them
+    for start in range(0, len(blobs), INSERT_CHUNK_SIZE):
+        conn.execute("BEGIN;")
+        insert_blobs(conn, blobs[start:start + INSERT_CHUNK_SIZE])
+        conn.commit()
+
+
+def write_module_rows(conn: sqlite3.Connection, run_id: int, batch_no: int, module: str, rows: List[Tuple]):
+    # insert in chunks
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        conn.execute("BEGIN;")
+        insert_rows(conn, chunk)
+        conn.commit()
+
+        done = start + len(chunk)
+        if done // PROGRESS_EVERY > start // PROGRESS_EVERY:
+            print(f"[batch {batch_no}] module={module} inserted {done}/{len(rows)}")
+
+
+def write_module_batch(conn: sqlite3.Connection, run_id: int, batch_no: int, module: str, as_of_date: str,
+                       rows: List[Tuple], blobs: List[Tuple], started_at: str, base: Optional[DeltaBase] = None,
+                       carry_ids: Optional[List[int]] = None):
+    set_checkpoint(conn, run_id, batch_no, module, "RUNNING", started_at)
+    write_blobs(conn, blobs)
+    write_module_rows(conn, run_id, batch_no, module, rows)
+    if base is not None:
+        carry_ids = carry_ids or []
+        if carry_ids:
+            carry_forward_module_rows(conn, run_id, base, as_of_date, module, carry_ids)
+        print(f"[batch {batch_no}] module={module} rebuilt={len(rows)} carried forward={len(carry_ids)}")
+
+    cnt = dict_row(conn, """
+        SELECT COUNT(*) AS cnt
+        FROM ecs_customer_rpt_modules m
+        JOIN ecs_rpt_customer_worklist w ON w.customer_id = m.customer_id
+        WHERE m.run_id=? AND m.module_code=? AND w.batch_no=?
+    """, (run_id, module, batch_no))["cnt"]
+    print(f"[batch {batch_no}] module={module} DONE. rows in table for this batch: {cnt}")
+    set_checkpoint(conn, run_id, batch_no, module, "DONE", started_at, now_utc_z(), cnt)
+
+
+def prepare_batch(conn, customer_ids: List[int], modules: List[str], base: Optional[DeltaBase] = None,
+                  keep_payloads: bool = False) -> Tuple[Dict[str, List[int]], BatchContext]:
+    plan = plan_batch_modules(conn, customer_ids, modules, base)
+    if not modules:
+        ctx = BatchContext(customer_ids=customer_ids)
+    elif base is None:
+        ctx = build_batch_context(conn, customer_ids)
+    else:
+        ctx = build_batch_context(conn, sorted(set().union(*plan.values())))
+    if keep_payloads:
+        ctx.payloads = {}
+        if STORE_XML and UNIFIED_XML_MODE == "MODULE_FRAGMENTS":
+            ctx.fragments = {}
+    return plan, ctx
+
+
+def build_module_batch(conn, run_id: int, module: str, customer_ids: List[int], plan: Dict[str, List[int]],
+                       ctx: BatchContext, as_of_date: str, generated_at: str,
+                       base: Optional[DeltaBase] = None) -> Tuple[List[Tuple], List[Tuple], List[int]]:
+    """
+    Returns (rows, blobs, carry_ids): rows are the freshly built documents, blobs the
+    document bodies not stored yet (DEDUP_DOCS), carry_ids the customers whose
+    document is carried forward from `base`.
+    """
+    build_ids = plan[module]
+    docs = build_module_docs_for_batch(conn, module, build_ids, as_of_date, ctx) if build_ids else {}
+    rows = build_module_rows(run_id, module, build_ids, docs, as_of_date, generated_at)
+    if ctx.payloads is not None:
+        kept = ctx.payloads.setdefault(module, {})
+        for cid in build_ids:
+            kept.setdefault(cid, FALLBACK_PAYLOAD)
+    if ctx.fragments is not None:
+        ctx.fragments[module] = {row[1]: row[4] for row in rows}
+    rows, blobs = encode_module_rows(conn, rows, as_of_date)
+    carry_ids: List[int] = []
+    if base is not None:
+        rebuilt = set(build_ids)
+        carry_ids = [cid for cid in customer_ids if cid not in rebuilt]
+    return rows, blobs, carry_ids
+
+
+def pending_work(conn: sqlite3.Connection, run_id: int, batch_no: int) -> Tuple[List[str], bool]:
+    """(modules still to write, whether the unified rows are still to write) for one batch."""
+    done = get_done_checkpoints(conn, run_id, batch_no)
+    return [m for m in MODULES_TO_RUN if m not in done], FUSED and UNIFIED_CHECKPOINT not in done
+
+
+def build_unified_batch(conn, run_id: int, customer_ids: List[int], as_of_date: str, generated_at: str,
+                        ctx: BatchContext, base: Optional[DeltaBase] = None) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Unified rows from the in-memory payloads; modules not built in this pass
+    (earlier attempt, carried forward, not in MODULES_TO_RUN) are read back from storage.
+    """
+    use_fragments = ctx.fragments is not None
+    found: Dict[int, Dict[str, Dict]] = {cid: {} for cid in customer_ids}
+    found_xml: Dict[int, Dict[str, str]] = {cid: {} for cid in customer_ids}
+    for module, by_customer in (ctx.payloads or {}).items():
+        if module not in UNIFIED_MODULES:
+            continue
+        for cid, payload in by_customer.items():
+            found[cid][module] = payload
+            if use_fragments:
+                found_xml[cid][module] = ctx.fragments[module][cid]
+
+    missing = [cid for cid in customer_ids if len(found[cid]) < len(UNIFIED_MODULES)]
+    for source_run_id in (run_id, base.run_id if base else None):
+        if source_run_id is None or not missing:
+            continue
+        stored, stored_xml = fetch_module_docs(conn, source_run_id, missing, with_xml=use_fragments)
+        for cid in missing:
+            for module, payload in stored[cid].items():
+                if module not in found[cid]:
+                    found[cid][module] = payload
+                    if use_fragments:
+                        found_xml[cid][module] = stored_xml[cid][module]
+        missing = [cid for cid in missing if len(found[cid]) < len(UNIFIED_MODULES)]
+
+    rows: List[Tuple] = []
+    for cid in customer_ids:
+        fragments = order_module_fragments(found_xml[cid]) if use_fragments else None
+        final_json, final_xml = build_unified(cid, as_of_date, order_module_payloads(found[cid]), fragments,
+                                              STORE_XML)
+        rows.append((run_id, cid, final_json, final_xml, generated_at))
+    return encode_unified_rows(conn, rows, as_of_date, STORAGE_CODEC, DEDUP_DOCS)
+
+
+def write_unified_batch(conn: sqlite3.Connection, run_id: int, batch_no: int, rows: List[Tuple], blobs: List[Tuple],
+                        started_at: str):
+    set_checkpoint(conn, run_id, batch_no, UNIFIED_CHECKPOINT, "RUNNING", started_at)
+    write_blobs(conn, blobs)
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        conn.execute("BEGIN;")
+        insert_unified_rows(conn, rows[start:start + INSERT_CHUNK_SIZE])
+        conn.commit()
+
+    cnt = dict_row(conn, """
+        SELECT COUNT(*) AS cnt
+        FROM ecs_customer_rpt r
+        JOIN ecs_rpt_customer_worklist w ON w.customer_id = r.customer_id
+        WHERE r.run_id=? AND w.batch_no=?
+    """, (run_id, batch_no))["cnt"]
+    print(f"[batch {batch_no}] UNIFIED DONE. unified rows in final table for this batch: {cnt}")
+    set_checkpoint(conn, run_id, batch_no, UNIFIED_CHECKPOINT, "DONE", started_at, now_utc_z(), cnt)
+
+
+def process_batch(conn: sqlite3.Connection, run_id: int, batch_no: int, as_of_date: str,
+                  base: Optional[DeltaBase] = None):
+    modules, unify = pending_work(conn, run_id, batch_no)
+    if not modules and not unify:
+        print(f"[batch {batch_no}] already completed, skipping.")
+        return
+
     customer_ids = fetch_batch_customer_ids(conn, batch_no)
     if not customer_ids:
         print(f"[batch {batch_no}] no customers, skipping.")
         return
 
-    print(f"[batch {batch_no}] customers={len(customer_ids)} starting...")
+    print(f"[batch {batch_no}] customers={len(customer_ids)} starting... modules={modules}")
     generated_at = now_utc_z()
+    plan, ctx = prepare_batch(conn, customer_ids, modules, base, keep_payloads=unify)
 
-    for module in MODULES_TO_RUN:
+    for module in modules:
         print(f"[batch {batch_no}] module={module} prefetching...")
-        docs = build_module_docs_for_batch(conn, module, customer_ids, as_of_date)
-
-        # insert in chunks
-        rows_buf: List[Tuple] = []
-        for i, cid in enumerate(customer_ids, start=1):
-            json_doc, xml_doc = docs.get(cid, (None, None))
-            if json_doc is None:
-                # Should not happen often; but keep it safe
-                json_doc = json.dumps({
-                    "schemaVersion": "1.0",
-                    "module": module,
-                    "asOfDate": as_of_date,
-                    "customerId": cid,
-                    "payload": {"warning": "no data generated"}
-                }, ensure_ascii=False)
-                xml_doc = f'<{module}Report schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{cid}"><Warning>no data generated</Warning></{module}Report>'
-
-            rows_buf.append((run_id, cid, module, json_doc, xml_doc, generated_at))
-
-            if len(rows_buf) >= INSERT_CHUNK_SIZE:
-                conn.execute("BEGIN;")
-                insert_rows(conn, rows_buf)
-                conn.commit()
-                rows_buf.clear()
-
-            if i % PROGRESS_EVERY == 0:
-                print(f"[batch {batch_no}] module={module} inserted {i}/{len(customer_ids)}")
-
-        if rows_buf:
-            conn.execute("BEGIN;")
-            insert_rows(conn, rows_buf)
-            conn.commit()
-            rows_buf.clear()
-
-        cnt = dict_row(conn, """
-            SELECT COUNT(*) AS cnt
-            FROM ecs_customer_rpt_modules m
-            JOIN ecs_rpt_customer_worklist w ON w.customer_id = m.customer_id
-            WHERE m.run_id=? AND m.module_code=? AND w.batch_no=?
-        """, (run_id, module, batch_no))["cnt"]
-        print(f"[batch {batch_no}] module={module} DONE. rows in table for this batch: {cnt}")
+        started_at = now_utc_z()
+        try:
+            rows, blobs, carry_ids = build_module_batch(conn, run_id, module, customer_ids, plan, ctx,
+                                                        as_of_date, generated_at, base)
+            write_module_batch(conn, run_id, batch_no, module, as_of_date, rows, blobs, started_at, base, carry_ids)
+        except Exception as e:
+            fail_checkpoint(conn, run_id, batch_no, module, started_at, repr(e))
+            raise
+
+    if unify:
+        started_at = now_utc_z()
+        try:
+            rows, blobs = build_unified_batch(conn, run_id, customer_ids, as_of_date, generated_at, ctx, base)
+            write_unified_batch(conn, run_id, batch_no, rows, blobs, started_at)
+        except Exception as e:
+            fail_checkpoint(conn, run_id, batch_no, UNIFIED_CHECKPOINT, started_at, repr(e))
+            raise
 
     print(f"[batch {batch_no}] finished.")
 
 
+# -------------------------
+# Parallel execution
+# Workers only read and build documents; every finished module is sent to the
+# main process through a bounded queue, so there is exactly one writer.
+# -------------------------
+_worker_conn: Optional[sqlite3.Connection] = None
+_writer_queue = None
+
+
+def open_read_conn(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=SQLITE_TIMEOUT_SECONDS)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    return conn
+
+
+def _init_worker(db_path: str, queue, json_serializer: str):
+    global _worker_conn, _writer_queue
+    _worker_conn = open_read_conn(db_path)
+    _writer_queue = queue
+    set_json_serializer(json_serializer)
+
+
+def _build_batch_in_worker(task: Tuple[int, int, str, Optional[DeltaBase]]):
+    run_id, batch_no, as_of_date, base = task
+    module = None
+    started_at = now_utc_z()
+    try:
+        modules, unify = pending_work(_worker_conn, run_id, batch_no)
+        customer_ids = fetch_batch_customer_ids(_worker_conn, batch_no) if modules or unify else []
+        if not modules and not unify:
+            print(f"[batch {batch_no}] already completed, skipping.")
+        elif not customer_ids:
+            print(f"[batch {batch_no}] no customers, skipping.")
+        else:
+            print(f"[batch {batch_no}] customers={len(customer_ids)} starting (worker)... modules={modules}")
+            generated_at = now_utc_z()
+            plan, ctx = prepare_batch(_worker_conn, customer_ids, modules, base, keep_payloads=unify)
+            for module in modules:
+                started_at = now_utc_z()
+                _writer_queue.put(("STARTED", batch_no, module, (started_at, os.getpid())))
+                rows, blobs, carry_ids = build_module_batch(_worker_conn, run_id, module, customer_ids, plan, ctx,
+                                                            as_of_date, generated_at, base)
+                _writer_queue.put(("ROWS", batch_no, module, (rows, blobs, carry_ids, started_at)))
+            if unify:
+                module = UNIFIED_CHECKPOINT
+                started_at = now_utc_z()
+                _writer_queue.put(("STARTED", batch_no, module, (started_at, os.getpid())))
+                rows, blobs = build_unified_batch(_worker_conn, run_id, customer_ids, as_of_date, generated_at,
+                                                  ctx, base)
+                _writer_queue.put(("ROWS", batch_no, module, (rows, blobs, None, started_at)))
+        _writer_queue.put(("DONE", batch_no, None, None))
+    except Exception:
+        _writer_queue.put(("FAILED", batch_no, module, (started_at, traceback.format_exc())))
+        raise
+
+
+def check_workers(conn: sqlite3.Connection, run_id: int, workers: List, building: Dict[int, Tuple[int, str, str]]):
+    # A worker killed outright (OOM, crash) takes its task with it: the pool's result would
+    # never complete, so the run fails instead of waiting for it
+    for proc in workers:
+        if proc.exitcode is None:
+            continue
+        error = f"worker process {proc.pid} exited with code {proc.exitcode}"
+        if proc.pid in building:
+            batch_no, module, started_at = building[proc.pid]
+            fail_checkpoint(conn, run_id, batch_no, module, started_at, error)
+            error = f"[batch {batch_no}] module={module}: {error}"
+        raise RuntimeError(error)
+
+
+def run_batches_parallel(conn: sqlite3.Connection, run_id: int, as_of_date: str, batch_nos: List[int], workers: int,
+                         base: Optional[DeltaBase] = None):
+    queue = multiprocessing.Queue(maxsize=WRITER_QUEUE_MAX)
+    tasks = [(run_id, b, as_of_date, base) for b in batch_nos]
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(DB_PATH, queue, JSON_SERIALIZER)) as pool:
+        worker_procs = multiprocessing.active_children()
+        building: Dict[int, Tuple[int, str, str]] = {}  # worker pid -> (batch_no, module, started_at)
+        result = pool.map_async(_build_batch_in_worker, tasks, chunksize=1)
+
+        pending = len(tasks)
+        while pending:
+            try:
+                message = queue.get(timeout=WORKER_POLL_SECONDS)
+            except Empty:
+                message = None
+            check_workers(conn, run_id, worker_procs, building)
+            if message is None:
+                continue
+            kind, batch_no, module, data = message
+            if kind == "STARTED":
+                started_at, pid = data
+                building[pid] = (batch_no, module, started_at)
+            elif kind == "ROWS":
+                rows, blobs, carry_ids, started_at = data
+                try:
+                    if module == UNIFIED_CHECKPOINT:
+                        write_unified_batch(conn, run_id, batch_no, rows, blobs, started_at)
+                    else:
+                        write_module_batch(conn, run_id, batch_no, module, as_of_date, rows, blobs, started_at,
+                                           base, carry_ids)
+                except Exception as e:
+                    fail_checkpoint(conn, run_id, batch_no, module, started_at, repr(e))
+                    raise
+                for pid, work in list(building.items()):
+                    if work[:2] == (batch_no, module):
+                        del building[pid]
+            elif kind == "DONE":
+                pending -= 1
+                print(f"[batch {batch_no}] finished.")
+            else:
+                started_at, tb = data
+                if module is not None:
+                    fail_checkpoint(conn, run_id, batch_no, module, started_at, tb)
+                raise RuntimeError(f"[batch {batch_no}] worker failed:\n{tb}")
+
+        while not result.ready():
+            result.wait(WORKER_POLL_SECONDS)
+            if not result.ready():
+                check_workers(conn, run_id, worker_procs, {})
+        result.get()
+
+
 def main():
+    check_codec(STORAGE_CODEC)
+    check_serializer(JSON_SERIALIZER)
+    set_json_serializer(JSON_SERIALIZER)
     conn = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT_SECONDS)
     conn.row_factory = sqlite3.Row
 
@@ -995,11 +1483,25 @@ def main():
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA temp_store=MEMORY;")
+    ensure_etl_indexes(conn)
+    ensure_checkpoint_table(conn)
+    ensure_codec_columns(conn)
+    ensure_size_columns(conn)
+    ensure_doc_store(conn)
+    conn.create_function("rebase_doc", 4, rebase_doc, deterministic=True)
 
     run_id = get_latest_run_id(conn)
     as_of_date = get_as_of_date(conn, run_id)
     b0, b1 = get_batch_range(conn)
 
+    base = None
+    if change_tracking_installed(conn):
+        if INCREMENTAL:
+            base = get_delta_base(conn, run_id)
+        record_run_watermark(conn, run_id)
+    elif INCREMENTAL:
+        raise SystemExit("INCREMENTAL=True needs database/Customer_Report_Change_Tracking.sql applied first.")
+
     print("=====================================================")
     print("ETL: ecs_customer_rpt_modules (Python, FAST batch prefetch)")
     print(f"DB_PATH:     {DB_PATH}")
@@ -1007,12 +1509,37 @@ def main():
     print(f"AS_OF_DATE:  {as_of_date}")
     print(f"BATCH_RANGE: {b0}..{b1}")
     print(f"MODULES:     {MODULES_TO_RUN}")
+    print(f"WORKERS:     {WORKERS}")
+    print(f"FUSED:       {FUSED}")
+    print(f"STORE_XML:   {STORE_XML}")
+    print(f"CODEC:       {STORAGE_CODEC}")
+    print(f"DEDUP_DOCS:  {DEDUP_DOCS}")
+    print(f"JSON:        {JSON_SERIALIZER}")
+    if base is not None:
+        print(f"MODE:        INCREMENTAL (base run {base.run_id}, changes after seq {base.change_seq})")
+    elif INCREMENTAL:
+        print("MODE:        FULL (no previous tracked run to carry forward from)")
+    else:
+        print("MODE:        FULL")
     print("=====================================================")
 
-    for batch_no in range(b0, b1 + 1):
-        process_batch(conn, run_id, batch_no, as_of_date)
+    set_run_status(conn, run_id, "RUNNING")
+    try:
+        if WORKERS > 1:
+            run_batches_parallel(conn, run_id, as_of_date, list(range(b0, b1 + 1)), WORKERS, base)
+        else:
+            for batch_no in range(b0, b1 + 1):
+                process_batch(conn, run_id, batch_no, as_of_date, base)
+    except BaseException:
+        set_run_status(conn, run_id, "FAILED")
+        raise
+    else:
+        # Two-stage runs are marked SUCCESS by etl_unified_customer_reports.py
+        if FUSED:
+            set_run_status(conn, run_id, "SUCCESS")
+    finally:
+        conn.close()
 
-    conn.close()
     print("All batches complete.")
 
 
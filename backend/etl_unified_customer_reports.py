@@ -4,11 +4,43 @@ from datetime import datetime, date, timezone
 from xml.sax.saxutils import escape as xml_escape
 from typing import Dict, List, Tuple, Optional
 
+from report_checkpoints import (
+    ensure_checkpoint_table,
+    fail_checkpoint,
+    get_done_checkpoints,
+    set_checkpoint,
+    set_run_status,
+)
+from report_codec import check_codec, decode_doc, encode_doc
+from report_store import dedup_doc, ensure_codec_columns, ensure_doc_store, insert_blobs, join_xml, new_blob_rows, unified_json_head
+
 DB_PATH = r"C:/A/B/C/D/D/E/######.db"
 
 # Must match what you generated in stage 1
 MODULES = ["CUSTOMER_PROFILE", "ACCOUNTS", "TRANSACTIONS", "CARDS", "LOANS", "COMPLIANCE", "FEES"]
 
+# Unified XML layout:
+#   "JSON_TO_XML"      -> <MODULE><payload>...</payload></MODULE>, payload JSON converted by json_to_xml
+#   "MODULE_FRAGMENTS" -> <MODULE><...Report ...>...</...Report></MODULE>, the stored module xml_doc
+#                         spliced in as-is (no JSON walk, no re-escaping; module XML element names)
+UNIFIED_XML_MODE = "JSON_TO_XML"
+UNIFIED_XML_MODES = ("JSON_TO_XML", "MODULE_FRAGMENTS")
+
+# JSON-only storage: STORE_XML = False stores xml_doc = '' and the API renders the
+# JSON_TO_XML layout from json_doc when a client asks for XML (see api_server.py)
+STORE_XML = True
+
+# How unified json_doc / xml_doc are stored: "identity" (TEXT), "zlib" or "zstd" (compressed
+# BLOB), recorded per row in the `codec` column (see report_codec.py). Module rows are
+# decoded according to their own codec.
+STORAGE_CODEC = "identity"
+
+# Content-addressed storage of unified documents (see report_store.py and DEDUP_DOCS in
+# etl_customer_reports.py). Deduplicated module rows are read from their blob either way.
+# MODULE_FRAGMENTS XML embeds each module's asOfDate, so those unified documents only
+# deduplicate within a run.
+DEDUP_DOCS = False
+
 # performance / logging
 PROGRESS_EVERY = 500
 INSERT_CHUNK_SIZE = 500
@@ -64,6 +96,26 @@ def xml_tag(tag: str, content) -> str:
     return f"<{tag}>{xml_escape(str(content))}</{tag}>"
 
 
+# -------------------------
+# Run status / checkpoints
+# Shares ecs_rpt_checkpoints (report_checkpoints.py) with etl_customer_reports.py; this
+# stage uses module_code 'UNIFIED'.
+# -------------------------
+CHECKPOINT_MODULE = "UNIFIED"
+
+
+SIZE_COLUMNS = ("json_bytes", "xml_bytes")
+
+
+def ensure_size_columns(conn: sqlite3.Connection):
+    # Unified tables created before document sizes get the size columns (existing rows: NULL)
+    cols = [r["name"] for r in dict_rows(conn, "PRAGMA table_info(ecs_customer_rpt)")]
+    for col in SIZE_COLUMNS:
+        if cols and col not in cols:
+            conn.execute(f"ALTER TABLE ecs_customer_rpt ADD COLUMN {col} INTEGER")
+    conn.commit()
+
+
 # -------------------------
 # Worklist batch customers
 # -------------------------
@@ -107,7 +159,43 @@ def json_to_xml(value, node_name: str) -> str:
 # -------------------------
 # Build unified docs for one customer
 # -------------------------
-def build_unified(customer_id: int, as_of_date: str, module_payloads: Dict[str, Dict]) -> Tuple[str, str]:
+def unified_xml_open(customer_id: int, as_of_date: str) -> str:
+    return f'<CustomerUnifiedReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{customer_id}"><Modules>'
+
+
+UNIFIED_XML_CLOSE = "</Modules></CustomerUnifiedReport>"
+
+
+def build_unified_xml(customer_id: int, as_of_date: str, module_payloads: Dict[str, Dict]) -> str:
+    # XML: one root, module nodes contain payload converted to xml
+    xml_parts = [unified_xml_open(customer_id, as_of_date)]
+    for module_code, payload in module_payloads.items():
+        xml_parts.append(f"<{module_code}>")
+        xml_parts.append(json_to_xml(payload, "payload"))
+        xml_parts.append(f"</{module_code}>")
+    xml_parts.append(UNIFIED_XML_CLOSE)
+    return "".join(xml_parts)
+
+
+def build_unified_xml_from_fragments(customer_id: int, as_of_date: str, module_fragments: Dict[str, str]) -> str:
+    # module_fragments: {module_code: stored module xml_doc} in unified order ("" = missing module)
+    xml_parts = [unified_xml_open(customer_id, as_of_date)]
+    for module_code, fragment in module_fragments.items():
+        xml_parts.append(f"<{module_code}>")
+        xml_parts.append(fragment)
+        xml_parts.append(f"</{module_code}>")
+    xml_parts.append(UNIFIED_XML_CLOSE)
+    return "".join(xml_parts)
+
+
+def build_unified(customer_id: int, as_of_date: str, module_payloads: Dict[str, Dict],
+                  module_fragments: Optional[Dict[str, Optional[str]]] = None,
+                  with_xml: bool = True) -> Tuple[str, str]:
+    """
+    Unified (json_doc, xml_doc); the XML is spliced from module_fragments when given.
+    A module stored without XML (fragment None) falls back to the JSON_TO_XML layout;
+    with_xml=False returns xml_doc = '' (JSON-only storage).
+    """
     unified_json = {
         "schemaVersion": "1.0",
         "asOfDate": as_of_date,
@@ -115,34 +203,52 @@ def build_unified(customer_id: int, as_of_date: str, module_payloads: Dict[str,
         "modules": module_payloads
     }
 
-    # XML: one root, module nodes contain payload converted to xml
-    xml_parts = [
-        f'<CustomerUnifiedReport schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{customer_id}">',
-        "<Modules>"
-    ]
-    for module_code, payload in module_payloads.items():
-        xml_parts.append(f"<{module_code}>")
-        xml_parts.append(json_to_xml(payload, "payload"))
-        xml_parts.append(f"</{module_code}>")
-    xml_parts.append("</Modules></CustomerUnifiedReport>")
+    if not with_xml:
+        xml_doc = ""
+    elif module_fragments is not None and None not in module_fragments.values():
+        xml_doc = build_unified_xml_from_fragments(customer_id, as_of_date, module_fragments)
+    else:
+        xml_doc = build_unified_xml(customer_id, as_of_date, module_payloads)
 
-    return json.dumps(unified_json, ensure_ascii=False), "".join(xml_parts)
+    return json.dumps(unified_json, ensure_ascii=False), xml_doc
 
 
 # -------------------------
 # Fetch module docs for a batch, then unify
 # -------------------------
-def fetch_module_json_docs_for_batch(conn: sqlite3.Connection, run_id: int, customer_ids: List[int]) -> Dict[int, Dict[str, Dict]]:
+def order_module_payloads(found: Dict[str, Dict]) -> Dict[str, Dict]:
     """
-    Returns:
-      { customer_id: { module_code: payload_dict } }
-    Reads ecs_customer_rpt_modules.json_doc, extracts $.payload.
+    Unified module order: stored modules by module_code, then every missing
+    module as an empty payload (consistent unified shape).
     """
-    if not customer_ids:
-        return {}
+    out = {m: found[m] for m in sorted(found)}
+    for m in MODULES:
+        out.setdefault(m, {})
+    return out
+
 
-    # We can fetch in chunks to avoid big IN clause
+def order_module_fragments(found: Dict[str, str]) -> Dict[str, str]:
+    """Same order as order_module_payloads; a missing module becomes an empty element."""
+    out = {m: found[m] for m in sorted(found)}
+    for m in MODULES:
+        out.setdefault(m, "")
+    return out
+
+
+def fetch_module_docs(conn: sqlite3.Connection, run_id: int, customer_ids: List[int],
+                      with_xml: bool = False) -> Tuple[Dict[int, Dict[str, Dict]], Dict[int, Dict[str, str]]]:
+    """
+    Returns (payloads, fragments):
+      payloads:  { customer_id: { module_code: payload_dict } }  (only modules that are stored)
+      fragments: { customer_id: { module_code: xml_doc } }       (only filled when with_xml;
+                                                                  None = stored without XML)
+    Reads ecs_customer_rpt_modules.json_doc, extracts $.payload (a deduplicated row's
+    blob holds the payload JSON itself).
+    """
     out: Dict[int, Dict[str, Dict]] = {cid: {} for cid in customer_ids}
+    xml_out: Dict[int, Dict[str, str]] = {cid: {} for cid in customer_ids}
+    if not customer_ids:
+        return out, xml_out
 
     # Build a set for quick membership
     cid_set = set(customer_ids)
@@ -153,16 +259,22 @@ def fetch_module_json_docs_for_batch(conn: sqlite3.Connection, run_id: int, cust
         for i in range(0, len(lst), n):
             yield lst[i:i + n]
 
+    as_of_date = None
     for sub in chunks(customer_ids, 900):
         placeholders = ",".join(["?"] * len(sub))
         params = (run_id, *sub)
 
         rows = dict_rows(conn, f"""
-            SELECT customer_id, module_code, json_doc
-            FROM ecs_customer_rpt_modules
-            WHERE run_id = ?
-              AND customer_id IN ({placeholders})
-              AND module_code IN ({",".join(["?"]*len(MODULES))})
+            SELECT m.customer_id, m.module_code, m.doc_hash,
+                   COALESCE(b.codec, m.codec) AS codec,
+                   COALESCE(b.json_doc, m.json_doc) AS json_doc
+                   {", COALESCE(b.xml_doc, m.xml_doc) AS xml_doc" if with_xml else ""}
+            FROM ecs_customer_rpt_modules m
+            LEFT JOIN ecs_rpt_doc_blobs b ON b.doc_hash = m.doc_hash
+            WHERE m.run_id = ?
+              AND m.customer_id IN ({placeholders})
+              AND m.module_code IN ({",".join(["?"]*len(MODULES))})
+            ORDER BY m.customer_id, m.module_code
         """, params + tuple(MODULES))
 
         for r in rows:
@@ -171,68 +283,115 @@ def fetch_module_json_docs_for_batch(conn: sqlite3.Connection, run_id: int, cust
                 continue
             module_code = r["module_code"]
             try:
-                doc = json.loads(r["json_doc"])
-                payload = doc.get("payload", {})
+                doc = json.loads(decode_doc(r["json_doc"], r["codec"]))
+                payload = doc if r["doc_hash"] else doc.get("payload", {})
             except Exception:
                 payload = {"warning": "invalid json_doc"}
             out[cid][module_code] = payload
+            if with_xml:
+                xml_doc = decode_doc(r["xml_doc"], r["codec"])
+                if r["doc_hash"] and xml_doc:
+                    as_of_date = as_of_date or get_as_of_date(conn, run_id)
+                    xml_doc = join_xml(xml_doc, as_of_date, cid)
+                xml_out[cid][module_code] = xml_doc or None
 
-    # Ensure missing modules exist as empty payloads (consistent unified shape)
-    for cid in customer_ids:
-        for m in MODULES:
-            out[cid].setdefault(m, {})
+    return out, xml_out
 
-    return out
+
+def fetch_module_payloads(conn: sqlite3.Connection, run_id: int, customer_ids: List[int]) -> Dict[int, Dict[str, Dict]]:
+    return fetch_module_docs(conn, run_id, customer_ids)[0]
 
 
 # -------------------------
 # Insert unified rows into final table
 # Assumes ecs_customer_rpt columns:
-#   run_id, customer_id, json_doc, xml_doc, generated_at
+#   run_id, customer_id, json_doc, xml_doc, generated_at, codec, doc_hash, json_bytes, xml_bytes
+# json_bytes / xml_bytes are the UTF-8 sizes of the documents as served, so the API's report
+# listing comes from the index alone.
 # -------------------------
 INSERT_UNIFIED_SQL = """
 INSERT OR IGNORE INTO ecs_customer_rpt
-  (run_id, customer_id, json_doc, xml_doc, generated_at)
-VALUES (?, ?, ?, ?, ?)
+  (run_id, customer_id, json_doc, xml_doc, generated_at, codec, doc_hash, json_bytes, xml_bytes)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
 """
 
 
+def encode_unified_rows(conn: sqlite3.Connection, rows: List[Tuple], as_of_date: str, codec: str,
+                        dedup: bool) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Raw (run_id, customer_id, json_doc, xml_doc, generated_at) rows ->
+    (rows to insert, new blob rows), stored per `codec`, deduplicated when `dedup`.
+    """
+    out: List[Tuple] = []
+    bodies: Dict[str, Tuple[str, str]] = {}
+    for run_id, cid, json_doc, xml_doc, generated_at in rows:
+        # xml_doc '' (STORE_XML = False): the API renders it on request, size unknown here
+        sizes = (len(json_doc.encode("utf-8")), len(xml_doc.encode("utf-8")) if xml_doc else None)
+        h = dedup_doc(json_doc, xml_doc, unified_json_head(as_of_date, cid), as_of_date, cid, bodies) if dedup else None
+        if h is None:
+            out.append((run_id, cid, encode_doc(json_doc, codec), encode_doc(xml_doc, codec), generated_at, codec, None)
+                       + sizes)
+        else:
+            out.append((run_id, cid, "", "", generated_at, codec, h) + sizes)
+    return out, (new_blob_rows(conn, bodies, codec) if bodies else [])
+
+
 def insert_unified_rows(conn: sqlite3.Connection, rows: List[Tuple]):
     conn.executemany(INSERT_UNIFIED_SQL, rows)
 
 
 def process_batch(conn: sqlite3.Connection, run_id: int, as_of_date: str, batch_no: int):
+    if CHECKPOINT_MODULE in get_done_checkpoints(conn, run_id, batch_no):
+        print(f"[batch {batch_no}] already unified, skipping.")
+        return
+
+    started_at = now_utc_z()
+    set_checkpoint(conn, run_id, batch_no, CHECKPOINT_MODULE, "RUNNING", started_at)
+    try:
+        cnt = unify_batch(conn, run_id, as_of_date, batch_no)
+    except Exception as e:
+        fail_checkpoint(conn, run_id, batch_no, CHECKPOINT_MODULE, started_at, repr(e))
+        raise
+    set_checkpoint(conn, run_id, batch_no, CHECKPOINT_MODULE, "DONE", started_at, now_utc_z(), cnt)
+
+
+def write_unified_chunk(conn: sqlite3.Connection, rows: List[Tuple], as_of_date: str):
+    rows, blobs = encode_unified_rows(conn, rows, as_of_date, STORAGE_CODEC, DEDUP_DOCS)
+    conn.execute("BEGIN;")
+    insert_blobs(conn, blobs)
+    insert_unified_rows(conn, rows)
+    conn.commit()
+
+
+def unify_batch(conn: sqlite3.Connection, run_id: int, as_of_date: str, batch_no: int) -> int:
     customer_ids = fetch_batch_customer_ids(conn, batch_no)
     if not customer_ids:
         print(f"[batch {batch_no}] no customers, skipping.")
-        return
+        return 0
 
     print(f"[batch {batch_no}] customers={len(customer_ids)} unifying...")
     generated_at = now_utc_z()
 
-    # Load module payloads for this batch in bulk
-    module_payloads_map = fetch_module_json_docs_for_batch(conn, run_id, customer_ids)
+    # Load module docs for this batch in bulk
+    use_fragments = STORE_XML and UNIFIED_XML_MODE == "MODULE_FRAGMENTS"
+    payloads_map, fragments_map = fetch_module_docs(conn, run_id, customer_ids, with_xml=use_fragments)
 
     rows_buf: List[Tuple] = []
     for i, cid in enumerate(customer_ids, start=1):
-        payloads = module_payloads_map.get(cid, {m: {} for m in MODULES})
-        final_json, final_xml = build_unified(cid, as_of_date, payloads)
-
+        payloads = order_module_payloads(payloads_map[cid])
+        fragments = order_module_fragments(fragments_map[cid]) if use_fragments else None
+        final_json, final_xml = build_unified(cid, as_of_date, payloads, fragments, STORE_XML)
         rows_buf.append((run_id, cid, final_json, final_xml, generated_at))
 
         if len(rows_buf) >= INSERT_CHUNK_SIZE:
-            conn.execute("BEGIN;")
-            insert_unified_rows(conn, rows_buf)
-            conn.commit()
+            write_unified_chunk(conn, rows_buf, as_of_date)
             rows_buf.clear()
 
         if i % PROGRESS_EVERY == 0:
             print(f"[batch {batch_no}] unified inserted {i}/{len(customer_ids)}")
 
     if rows_buf:
-        conn.execute("BEGIN;")
-        insert_unified_rows(conn, rows_buf)
-        conn.commit()
+        write_unified_chunk(conn, rows_buf, as_of_date)
         rows_buf.clear()
 
     cnt = dict_row(conn, """
@@ -242,9 +401,14 @@ def process_batch(conn: sqlite3.Connection, run_id: int, as_of_date: str, batch_
         WHERE r.run_id=? AND w.batch_no=?
     """, (run_id, batch_no))["cnt"]
     print(f"[batch {batch_no}] DONE. unified rows in final table for this batch: {cnt}")
+    return cnt
 
 
 def main():
+    if UNIFIED_XML_MODE not in UNIFIED_XML_MODES:
+        raise SystemExit(f"Unsupported UNIFIED_XML_MODE: {UNIFIED_XML_MODE} (expected one of {UNIFIED_XML_MODES})")
+    check_codec(STORAGE_CODEC)
+
     conn = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT_SECONDS)
     conn.row_factory = sqlite3.Row
 
@@ -253,6 +417,10 @@ def main():
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA temp_store=MEMORY;")
+    ensure_checkpoint_table(conn)
+    ensure_codec_columns(conn)
+    ensure_size_columns(conn)
+    ensure_doc_store(conn)
 
     run_id = get_latest_run_id(conn)
     as_of_date = get_as_of_date(conn, run_id)
@@ -265,12 +433,24 @@ def main():
     print(f"AS_OF_DATE:  {as_of_date}")
     print(f"BATCH_RANGE: {b0}..{b1}")
     print(f"MODULES:     {MODULES}")
+    print(f"XML_MODE:    {UNIFIED_XML_MODE}")
+    print(f"STORE_XML:   {STORE_XML}")
+    print(f"CODEC:       {STORAGE_CODEC}")
+    print(f"DEDUP_DOCS:  {DEDUP_DOCS}")
     print("=====================================================")
 
-    for batch_no in range(b0, b1 + 1):
-        process_batch(conn, run_id, as_of_date, batch_no)
+    set_run_status(conn, run_id, "RUNNING")
+    try:
+        for batch_no in range(b0, b1 + 1):
+            process_batch(conn, run_id, as_of_date, batch_no)
+    except BaseException:
+        set_run_status(conn, run_id, "FAILED")
+        raise
+    else:
+        set_run_status(conn, run_id, "SUCCESS")
+    finally:
+        conn.close()
 
-    conn.close()
     print("All batches complete.")
 
 
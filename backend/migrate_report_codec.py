@@ -0,0 +1,107 @@
+"""
+Converts stored report documents (ecs_customer_rpt_modules / ecs_customer_rpt and the
+deduplicated bodies in ecs_rpt_doc_blobs) to TARGET_CODEC.
+
+Rows already in TARGET_CODEC are skipped, so the script can be stopped and re-run.
+Use TARGET_CODEC = "identity" to go back to plain TEXT. Freed pages are only returned
+to the OS by VACUUM (VACUUM_AFTER), which rewrites the whole file.
+"""
+import sqlite3
+from typing import List, Optional
+
+from report_codec import CODEC_COLUMN_DDL, check_codec, recode_doc
+
+DB_PATH = r"C:/A/B/C/D/E/F/######.db"
+
+TARGET_CODEC = "zlib"
+RUN_IDS: Optional[List[int]] = None  # None = every run (ecs_rpt_doc_blobs is shared by runs: always all)
+TABLES = ["ecs_customer_rpt_modules", "ecs_customer_rpt", "ecs_rpt_doc_blobs"]
+
+CHUNK_SIZE = 500
+PROGRESS_EVERY = 10000
+SQLITE_TIMEOUT_SECONDS = 60
+VACUUM_AFTER = False
+
+
+def ensure_codec_column(conn: sqlite3.Connection, table: str) -> List[str]:
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    if not cols:
+        raise SystemExit(f"Table {table} not found.")
+    if "codec" not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {CODEC_COLUMN_DDL}")
+        conn.commit()
+    return cols
+
+
+def migrate_table(conn: sqlite3.Connection, table: str, per_run: bool) -> int:
+    run_filter = ""
+    run_params: tuple = ()
+    if RUN_IDS is not None and per_run:
+        run_filter = f"AND run_id IN ({','.join('?' * len(RUN_IDS))})"
+        run_params = tuple(RUN_IDS)
+
+    converted = 0
+    last_rowid = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT rowid, json_doc, xml_doc, codec
+            FROM {table}
+            WHERE rowid > ? AND codec <> ? {run_filter}
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, TARGET_CODEC) + run_params + (CHUNK_SIZE,)).fetchall()
+        if not rows:
+            break
+
+        updates = [
+            (recode_doc(json_doc, codec, TARGET_CODEC), recode_doc(xml_doc, codec, TARGET_CODEC), TARGET_CODEC, rowid)
+            for rowid, json_doc, xml_doc, codec in rows
+        ]
+        conn.execute("BEGIN;")
+        conn.executemany(f"UPDATE {table} SET json_doc=?, xml_doc=?, codec=? WHERE rowid=?", updates)
+        conn.commit()
+
+        last_rowid = rows[-1][0]
+        before = converted
+        converted += len(rows)
+        if converted // PROGRESS_EVERY > before // PROGRESS_EVERY:
+            print(f"[{table}] converted {converted}")
+
+    return converted
+
+
+def main():
+    check_codec(TARGET_CODEC)
+
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT_SECONDS)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+
+    print("=====================================================")
+    print("MIGRATE: report document codec")
+    print(f"DB_PATH:      {DB_PATH}")
+    print(f"TARGET_CODEC: {TARGET_CODEC}")
+    print(f"RUN_IDS:      {'all' if RUN_IDS is None else RUN_IDS}")
+    print("=====================================================")
+
+    try:
+        for table in TABLES:
+            if table == "ecs_rpt_doc_blobs" and not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+            ).fetchone():
+                continue  # DEDUP_DOCS never used on this database
+            cols = ensure_codec_column(conn, table)
+            n = migrate_table(conn, table, "run_id" in cols)
+            print(f"[{table}] DONE. rows converted: {n}")
+
+        if VACUUM_AFTER:
+            print("VACUUM ...")
+            conn.execute("VACUUM;")
+    finally:
+        conn.close()
+
+    print("Migration complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/report_checkpoints.py
+"""
+Run status and restart checkpoints shared by the report ETLs.
+
+One ecs_rpt_checkpoints row per (run_id, batch_no, module_code): etl_customer_reports.py
+writes one per module, etl_unified_customer_reports.py one with module_code 'UNIFIED'.
+Batches whose checkpoint is DONE are skipped when a run is restarted.
+"""
+import sqlite3
+from datetime import datetime, timezone
+from typing import Optional, Set
+
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS ecs_rpt_checkpoints (
+  run_id      INTEGER NOT NULL,
+  batch_no    INTEGER NOT NULL,
+  module_code TEXT NOT NULL,
+  status      TEXT NOT NULL CHECK (status IN ('RUNNING','DONE','FAILED')),
+  started_at  DATETIME NOT NULL,
+  finished_at DATETIME,
+  row_count   INTEGER,
+  error       TEXT,
+  PRIMARY KEY (run_id, batch_no, module_code),
+  FOREIGN KEY (run_id) REFERENCES ecs_rpt_runs(run_id) ON DELETE CASCADE
+)
+"""
+
+UPSERT_CHECKPOINT_SQL = """
+INSERT INTO ecs_rpt_checkpoints
+  (run_id, batch_no, module_code, status, started_at, finished_at, row_count, error)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (run_id, batch_no, module_code) DO UPDATE SET
+  status = excluded.status,
+  started_at = excluded.started_at,
+  finished_at = excluded.finished_at,
+  row_count = excluded.row_count,
+  error = excluded.error
+"""
+
+
+def now_utc_z() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def ensure_checkpoint_table(conn: sqlite3.Connection):
+    conn.execute(CHECKPOINT_DDL)
+    conn.commit()
+
+
+def get_done_checkpoints(conn: sqlite3.Connection, run_id: int, batch_no: int) -> Set[str]:
+    rows = conn.execute("""
+        SELECT module_code
+        FROM ecs_rpt_checkpoints
+        WHERE run_id=? AND batch_no=? AND status='DONE'
+    """, (run_id, batch_no)).fetchall()
+    return {r[0] for r in rows}
+
+
+def set_checkpoint(conn: sqlite3.Connection, run_id: int, batch_no: int, module: str, status: str,
+                   started_at: str, finished_at: Optional[str] = None, row_count: Optional[int] = None,
+                   error: Optional[str] = None):
+    conn.execute(UPSERT_CHECKPOINT_SQL, (run_id, batch_no, module, status, started_at, finished_at, row_count, error))
+    conn.commit()
+
+
+def fail_checkpoint(conn: sqlite3.Connection, run_id: int, batch_no: int, module: str, started_at: str, error: str):
+    # only the open insert chunk is rolled back: the ETLs commit every INSERT_CHUNK_SIZE chunk,
+    # those persist and a re-run skips them through INSERT OR IGNORE
+    conn.rollback()
+    set_checkpoint(conn, run_id, batch_no, module, "FAILED", started_at, now_utc_z(), None, error)
+
+
+def set_run_status(conn: sqlite3.Connection, run_id: int, status: str):
+    conn.rollback()
+    if status == "RUNNING":
+        conn.execute("UPDATE ecs_rpt_runs SET status='RUNNING', finished_at=NULL WHERE run_id=?", (run_id,))
+    else:
+        conn.execute("UPDATE ecs_rpt_runs SET status=?, finished_at=CURRENT_TIMESTAMP WHERE run_id=?",
+                     (status, run_id))
+    conn.commit()
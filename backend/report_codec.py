@@ -0,0 +1,80 @@
+# backend/report_codec.py
+"""
+Storage codecs for report documents (ecs_customer_rpt_modules / ecs_customer_rpt).
+
+json_doc / xml_doc hold TEXT for codec 'identity' and a compressed BLOB of the UTF-8
+text for 'zlib' / 'zstd'; the row's `codec` column says which. An empty document
+(xml_doc with STORE_XML = False) stays '' under every codec. zstd needs the optional
+`zstandard` package.
+"""
+import zlib
+from typing import Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+IDENTITY = "identity"
+ZLIB = "zlib"
+ZSTD = "zstd"
+CODECS = (IDENTITY, ZLIB, ZSTD)
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# HTTP Content-Encoding token a stored codec can be sent as, without recompressing
+# (HTTP "deflate" is the zlib format)
+CONTENT_ENCODINGS = {ZLIB: "deflate", ZSTD: "zstd"}
+
+# DDL for databases created before the codec column existed
+CODEC_COLUMN_DDL = "codec TEXT NOT NULL DEFAULT 'identity'"
+
+StoredDoc = Union[str, bytes, None]
+
+
+def check_codec(codec: str):
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported codec: {codec} (expected one of {CODECS})")
+    if codec == ZSTD and zstandard is None:
+        raise ValueError("codec 'zstd' needs the zstandard package (pip install zstandard)")
+
+
+def encode_doc(text: Optional[str], codec: str) -> StoredDoc:
+    if not text or codec == IDENTITY:
+        return text
+    data = text.encode("utf-8")
+    if codec == ZLIB:
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == ZSTD:
+        check_codec(codec)
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported codec: {codec}")
+
+
+def decode_bytes(value: StoredDoc, codec: Optional[str]) -> Optional[bytes]:
+    """Stored document -> UTF-8 bytes."""
+    if value is None:
+        return None
+    if not value:
+        return b""
+    if codec in (None, IDENTITY):
+        return value.encode("utf-8") if isinstance(value, str) else bytes(value)
+    if codec == ZLIB:
+        return zlib.decompress(value)
+    if codec == ZSTD:
+        check_codec(codec)
+        return zstandard.ZstdDecompressor().decompress(value)
+    raise ValueError(f"Unsupported codec: {codec}")
+
+
+def decode_doc(value: StoredDoc, codec: Optional[str]) -> Optional[str]:
+    if value is None or (codec in (None, IDENTITY) and isinstance(value, str)):
+        return value
+    return decode_bytes(value, codec).decode("utf-8")
+
+
+def recode_doc(value: StoredDoc, codec: Optional[str], new_codec: str) -> StoredDoc:
+    if (codec or IDENTITY) == new_codec:
+        return value
+    return encode_doc(decode_doc(value, codec), new_codec)
@@ -0,0 +1,49 @@
+# backend/report_json.py
+"""
+JSON serializers for report documents (JSON_SERIALIZER in etl_customer_reports.py).
+
+  "stdlib" -> one prebuilt json.JSONEncoder(ensure_ascii=False): byte-identical to
+              json.dumps(obj, ensure_ascii=False), without building an encoder per call
+  "orjson" -> the optional orjson package, several times faster, but orjson has no
+              option for stdlib's ", " / ": " separators and formats some floats
+              differently (1e-05 -> 1e-5, NaN -> null): same parsed JSON, other bytes
+
+Stored bytes should not depend on which packages are installed (dedup hashes,
+comparisons between runs), so there is no automatic fallback: pick one explicitly.
+"""
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+STDLIB = "stdlib"
+ORJSON = "orjson"
+SERIALIZERS = (STDLIB, ORJSON)
+
+_stdlib_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def check_serializer(name: str):
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unsupported JSON serializer: {name} (expected one of {SERIALIZERS})")
+    if name == ORJSON and orjson is None:
+        raise ValueError("JSON serializer 'orjson' needs the orjson package (pip install orjson)")
+
+
+def dumps_stdlib(obj: Any) -> str:
+    return _stdlib_encode(obj)
+
+
+def dumps_orjson(obj: Any) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+DUMPS = {STDLIB: dumps_stdlib, ORJSON: dumps_orjson}
+
+
+def get_dumps(name: str) -> Callable[[Any], str]:
+    check_serializer(name)
+    return DUMPS[name]
@@ -0,0 +1,159 @@
+# backend/report_store.py
+"""
+Content-addressed storage for report documents (DEDUP_DOCS in the ETLs).
+
+A document is split into its envelope (schemaVersion / module / asOfDate / customerId,
+rebuilt from the row) and its body (the payload JSON and the XML after the root start
+tag). Bodies are stored once in ecs_rpt_doc_blobs, keyed by their SHA-256; a report row
+with doc_hash set keeps json_doc = xml_doc = '' and points to its blob. So a document
+that only differs from an earlier run by asOfDate is stored once.
+
+Documents without the standard envelope are stored inline (doc_hash NULL), as before.
+"""
+import hashlib
+import json
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape as xml_escape
+
+from report_codec import CODEC_COLUMN_DDL, decode_doc, encode_doc
+
+BLOB_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS ecs_rpt_doc_blobs (
+  doc_hash   TEXT PRIMARY KEY,
+  json_doc   TEXT NOT NULL,
+  xml_doc    TEXT NOT NULL,
+  codec      TEXT NOT NULL DEFAULT 'identity',
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# DDL for report tables created before the doc_hash column existed
+DOC_HASH_COLUMN_DDL = "doc_hash TEXT"
+REPORT_TABLES = ("ecs_customer_rpt_modules", "ecs_customer_rpt")
+
+INSERT_BLOB_SQL = """
+INSERT OR IGNORE INTO ecs_rpt_doc_blobs (doc_hash, json_doc, xml_doc, codec)
+VALUES (?, ?, ?, ?)
+"""
+
+HASH_CHUNK_SIZE = 900
+
+
+def ensure_doc_store(conn: sqlite3.Connection):
+    conn.execute(BLOB_TABLE_DDL)
+    for table in REPORT_TABLES:
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+        if cols and "doc_hash" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {DOC_HASH_COLUMN_DDL}")
+    conn.commit()
+
+
+def ensure_codec_columns(conn: sqlite3.Connection):
+    # Report tables created before compressed storage get the codec column (existing rows: 'identity')
+    for table in REPORT_TABLES:
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+        if cols and "codec" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {CODEC_COLUMN_DDL}")
+    conn.commit()
+
+
+# -------------------------
+# Envelopes
+# -------------------------
+def module_json_prefix(module: str, as_of_date: str) -> str:
+    """Module json_doc up to the customerId value (the same for a whole batch)."""
+    return (f'{{"schemaVersion": "1.0", "module": {json.dumps(module, ensure_ascii=False)}, '
+            f'"asOfDate": {json.dumps(as_of_date, ensure_ascii=False)}, "customerId": ')
+
+
+def module_json_head(module: str, as_of_date: str, customer_id: int) -> str:
+    """Module json_doc up to the payload: json_doc == head + payload JSON + '}'."""
+    return f'{module_json_prefix(module, as_of_date)}{customer_id}, "payload": '
+
+
+def unified_json_head(as_of_date: str, customer_id: int) -> str:
+    """Unified json_doc up to the modules: json_doc == head + modules JSON + '}'."""
+    return (f'{{"schemaVersion": "1.0", "asOfDate": {json.dumps(as_of_date, ensure_ascii=False)}, '
+            f'"customerId": {customer_id}, "modules": ')
+
+
+def xml_head(root: str, as_of_date: str, customer_id: int) -> str:
+    return f'<{root} schemaVersion="1.0" asOfDate="{xml_escape(as_of_date)}" customerId="{customer_id}">'
+
+
+def split_doc(json_doc: str, xml_doc: str, json_head: str, as_of_date: str,
+              customer_id: int) -> Optional[Tuple[str, str]]:
+    """(json body, xml body), or None when a document doesn't have the expected envelope."""
+    if not (json_doc.startswith(json_head) and json_doc.endswith("}")):
+        return None
+    json_body = json_doc[len(json_head):-1]
+    if not xml_doc:
+        return json_body, ""
+    head = xml_head(xml_doc[1:xml_doc.find(" ")], as_of_date, customer_id)
+    if not xml_doc.startswith(head):
+        return None
+    return json_body, xml_doc[len(head):]
+
+
+def join_xml(xml_body: str, as_of_date: str, customer_id: int) -> str:
+    """XML body -> full document; the root name is taken from the body's closing tag."""
+    if not xml_body:
+        return ""
+    root = xml_body[xml_body.rindex("</") + 2:-1]
+    return xml_head(root, as_of_date, customer_id) + xml_body
+
+
+def join_doc(json_head: str, json_body: str, xml_body: str, as_of_date: str,
+             customer_id: int) -> Tuple[str, str]:
+    """Inverse of split_doc."""
+    return json_head + json_body + "}", join_xml(xml_body, as_of_date, customer_id)
+
+
+def doc_hash(json_body: str, xml_body: str) -> str:
+    return hashlib.sha256(f"{json_body}\0{xml_body}".encode("utf-8")).hexdigest()
+
+
+def dedup_doc(json_doc: str, xml_doc: str, json_head: str, as_of_date: str, customer_id: int,
+              bodies: Dict[str, Tuple[str, str]]) -> Optional[str]:
+    """doc_hash of a document, its bodies collected in `bodies`; None = store it inline."""
+    split = split_doc(json_doc, xml_doc, json_head, as_of_date, customer_id)
+    if split is None:
+        return None
+    h = doc_hash(*split)
+    bodies[h] = split
+    return h
+
+
+# -------------------------
+# Blobs
+# -------------------------
+def new_blob_rows(conn: sqlite3.Connection, bodies: Dict[str, Tuple[str, str]], codec: str) -> List[Tuple]:
+    """
+    Blob rows for the bodies not stored yet (already stored hashes are skipped
+    before encoding). A concurrent writer may store the same hash first: the
+    insert is OR IGNORE.
+    """
+    pending = dict(bodies)
+    hashes = list(bodies)
+    for start in range(0, len(hashes), HASH_CHUNK_SIZE):
+        chunk = hashes[start:start + HASH_CHUNK_SIZE]
+        for (h,) in conn.execute(
+            "SELECT doc_hash FROM ecs_rpt_doc_blobs WHERE doc_hash IN (SELECT value FROM json_each(?))",
+            (json.dumps(chunk),),
+        ):
+            pending.pop(h, None)
+    return [(h, encode_doc(j, codec), encode_doc(x, codec), codec) for h, (j, x) in pending.items()]
+
+
+def insert_blobs(conn: sqlite3.Connection, blob_rows: List[Tuple]):
+    if blob_rows:
+        conn.executemany(INSERT_BLOB_SQL, blob_rows)
+
+
+def fetch_blob(conn: sqlite3.Connection, h: str) -> Optional[Tuple[str, str]]:
+    """Decoded (json body, xml body) of one blob."""
+    r = conn.execute("SELECT json_doc, xml_doc, codec FROM ecs_rpt_doc_blobs WHERE doc_hash=?", (h,)).fetchone()
+    if r is None:
+        return None
+    return decode_doc(r[0], r[2]), decode_doc(r[1], r[2])
@@ -0,0 +1,116 @@
+# backend/report_stream.py
+"""
+Chunked reads and on-the-fly compression for report documents served by api_server.py.
+
+  read_stored_chunks(conn, table, column, rowid)  stored value through the sqlite3 blob
+                                                  API (substr() before Python 3.11),
+                                                  CHUNK_SIZE bytes at a time
+  decode_chunks(chunks, codec)                    stored chunks -> UTF-8 chunks (report_codec)
+  json_string_chunks(chunks)                      UTF-8 chunks -> one JSON string literal,
+                                                  as json.dumps(ensure_ascii=False) writes it
+  compress_chunks(chunks, encoding)               "gzip", or "br" with the optional brotli package
+
+None of them holds more than about one chunk of a document at a time.
+"""
+import codecs
+import sqlite3
+import zlib
+from json.encoder import encode_basestring
+from typing import Iterable, Iterator, Optional
+
+from report_codec import IDENTITY, ZLIB, ZSTD, check_codec, zstandard
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+CHUNK_SIZE = 64 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+GZIP = "gzip"
+BROTLI = "br"
+
+
+def stored_size(conn: sqlite3.Connection, table: str, column: str, rowid: int) -> int:
+    """Size in bytes of a stored TEXT / BLOB value, without reading it."""
+    if not hasattr(conn, "blobopen"):  # Python < 3.11
+        row = conn.execute(
+            f'SELECT length(CAST("{column}" AS BLOB)) FROM "{table}" WHERE rowid = ?', (rowid,)
+        ).fetchone()
+        return (row[0] if row else None) or 0
+    with conn.blobopen(table, column, rowid, readonly=True) as blob:
+        return len(blob)
+
+
+def read_stored_chunks(conn: sqlite3.Connection, table: str, column: str, rowid: int) -> Iterator[bytes]:
+    # TEXT comes back as its UTF-8 bytes
+    if not hasattr(conn, "blobopen"):  # Python < 3.11: substr() over the value as bytes
+        sql = f'SELECT substr(CAST("{column}" AS BLOB), ?, ?) FROM "{table}" WHERE rowid = ?'
+        start = 1
+        while True:
+            row = conn.execute(sql, (start, CHUNK_SIZE, rowid)).fetchone()
+            data = row[0] if row else None
+            if not data:
+                return
+            yield data
+            start += len(data)
+    with conn.blobopen(table, column, rowid, readonly=True) as blob:
+        while True:
+            data = blob.read(CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+
+def decode_chunks(chunks: Iterable[bytes], codec: Optional[str]) -> Iterator[bytes]:
+    if codec in (None, IDENTITY):
+        yield from chunks
+        return
+    if codec == ZLIB:
+        d = zlib.decompressobj()
+    elif codec == ZSTD:
+        check_codec(codec)
+        d = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        raise ValueError(f"Unsupported codec: {codec}")
+    for chunk in chunks:
+        data = d.decompress(chunk)
+        if data:
+            yield data
+    # older zstandard decompression objects have no flush()
+    data = d.flush() if hasattr(d, "flush") else b""
+    if data:
+        yield data
+
+
+def json_string_chunks(chunks: Iterable[bytes]) -> Iterator[str]:
+    # escaping is per character, so escaping the pieces one by one gives the same text;
+    # the incremental decoder keeps multi-byte characters split across chunks together
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    yield '"'
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield encode_basestring(text)[1:-1]
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield encode_basestring(text)[1:-1]
+    yield '"'
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == GZIP:
+        c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        process, finish = c.compress, c.flush
+    elif encoding == BROTLI and brotli is not None:
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = c.process, c.finish
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
@@ -0,0 +1,570 @@
+"""
+Builds a synthetic bank database (database/Database_Schema.sql) at a chosen scale, for
+measuring how the report ETL scales.
+
+Deterministic: the same SEED and CUSTOMERS always give the same rows. Customers are
+generated in chunks of CHUNK_CUSTOMERS with one random.Random per chunk, seeded from
+(SEED, chunk number); every id is assigned here, never by AUTOINCREMENT order. Values are
+drawn a column at a time per chunk (one choices()/comprehension per column, not one call
+chain per row) and written with executemany, one transaction per chunk. Secondary
+indexes, views and triggers are created after the load.
+
+Per-customer volumes are averages (the *_PER_* and *_SHARE constants); at the defaults a
+customer has about 85 rows across the schema. Timestamps fall in the HISTORY_DAYS before
+AS_OF_DATE. With PREPARE_REPORT_RUN the database ends ready for etl_customer_reports.py
+(Customer_Report_ETL.sql applied: report tables, a RUNNING run and the batch worklist).
+"""
+import os
+import random
+import sqlite3
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+BASE = Path(__file__).resolve().parent.parent
+DB_PATH = r"C:/A/B/C/D/E/F/######.db"
+
+SCHEMA_SQL_PATH = BASE / "database" / "Database_Schema.sql"
+AUTH_SQL_PATH = Path(__file__).resolve().parent / "sql" / "001_auth.sql"
+REPORT_SQL_PATH = BASE / "database" / "Customer_Report_ETL.sql"
+POST_LOAD_MARKER = "-- Post-load: indexes, views, triggers"
+
+# Scale and determinism
+CUSTOMERS = 10_000                # scale factor: 10_000 .. 5_000_000
+SEED = 20240101
+CHUNK_CUSTOMERS = 5_000           # customers per RNG stream and per transaction
+OVERWRITE = False                 # replace an existing DB_PATH
+PREPARE_REPORT_RUN = True         # apply Customer_Report_ETL.sql after the load
+
+AS_OF_DATE = "2025-12-31"
+HISTORY_DAYS = 3 * 365
+
+# Average volumes
+ACCOUNTS_PER_CUSTOMER = 1.3       # at least 1
+JOINT_HOLDER_SHARE = 0.2          # accounts with a second (JOINT) holder
+PHONE_SHARE = 0.8                 # customers with a phone contact
+TRANSACTIONS_PER_ACCOUNT = 6      # legacy ecs_transactions
+TRANSFER_SHARE = 0.1              # withdrawals that are one leg of a transfer
+POSTINGS_PER_ACCOUNT = 6          # deposits / withdrawals through the ledger
+REVERSED_SHARE = 0.05             # journal entries left REVERSED
+CARD_SHARE = 0.6                  # accounts with a debit card
+AUTHS_PER_CARD = 8
+FEES_PER_ACCOUNT = 2
+LOAN_SHARE = 0.2                  # customers with a loan
+FLAGS_PER_CUSTOMER = 0.3
+LEDGER_LINES = False              # GL lines per journal entry: not read by the ETL, ~25 rows per customer
+
+PROGRESS_EVERY_CHUNKS = 20
+
+
+# -------------------------
+# Reference data
+# -------------------------
+CURRENCIES = [("EUR", "Euro", "€", 2)]
+
+BRANCHES = [
+    ("ATH-001", "Athens Central", "Athens"), ("ATH-002", "Athens Syntagma", "Athens"),
+    ("ATH-003", "Piraeus Port", "Piraeus"), ("THE-001", "Thessaloniki Center", "Thessaloniki"),
+    ("THE-002", "Thessaloniki Kalamaria", "Thessaloniki"), ("PAT-001", "Patras", "Patras"),
+    ("HER-001", "Heraklion", "Heraklion"), ("LAR-001", "Larissa", "Larissa"),
+    ("VOL-001", "Volos", "Volos"), ("IOA-001", "Ioannina", "Ioannina"),
+]
+EMPLOYEES_PER_BRANCH = 12
+
+DEPOSIT_PRODUCTS = [  # (code, name, currency, overdraft_allowed, overdraft_limit, account_type)
+    ("CHK-EUR", "Checking EUR", "EUR", 1, 500.0, "CHECKING"),
+    ("SAV-EUR", "Savings EUR", "EUR", 0, 0.0, "SAVINGS"),
+]
+
+GL_ACCOUNTS = [  # gl_account_id = position + 1
+    ("1000", "Cash on Hand", "ASSET", "EUR"),
+    ("1100", "Loan Receivables", "ASSET", "EUR"),
+    ("2000", "Customer Deposits", "LIABILITY", "EUR"),
+    ("4000", "Interest Income", "INCOME", "EUR"),
+    ("4010", "Fee Income", "INCOME", "EUR"),
+]
+GL_CASH, GL_LOANS, GL_DEPOSITS, GL_INTEREST, GL_FEES = 1, 2, 3, 4, 5
+
+LOAN_PRODUCTS = [
+    ("LN-STD-36", "Standard Loan 36m", 0.085, 36),
+    ("LN-STD-60", "Standard Loan 60m", 0.095, 60),
+]
+
+FEE_TYPES = [
+    ("MONTHLY", "Monthly account maintenance", 2.50),
+    ("ODF", "Overdraft fee", 15.00),
+    ("CARD", "Card annual fee", 12.00),
+    ("WIRE", "Outgoing wire & SEPA fee", 1.20),
+]
+
+FIRST_NAMES = [
+    "Maria", "Eleni", "Katerina", "Sofia", "Ioanna", "Anna", "Christina", "Dimitra", "Georgia", "Vasiliki",
+    "Angeliki", "Zoë", "Chloé", "Despina", "Irene", "Giorgos", "Nikos", "Dimitris", "Kostas", "Yannis",
+    "Petros", "Alexandros", "Panagiotis", "Christos", "Michalis", "Stavros", "Thanasis", "Vasilis",
+    "Andreas", "Spyros", "Manolis", "Ilias", "Sean", "Liam", "José", "Zoé",
+]
+LAST_NAMES = [
+    "Papadopoulos", "Georgiou", "Nikolaou", "Ioannou", "Pappas", "Oikonomou", "Makris", "Vlachos",
+    "Angelopoulos", "Dimitriou", "Konstantinou", "Karagiannis", "Alexiou", "Christodoulou", "Papageorgiou",
+    "Athanasiou", "Michailidis", "Theodorou", "Antoniou", "Stavrou", "Panagiotopoulos", "Kyriakou",
+    "O'Brien", "Müller", "Núñez",
+]
+EMAIL_DOMAINS = ["example.com", "mail.example", "bank.local", "example.gr"]
+
+CITIES = [  # (city, region, postal code prefix)
+    ("Athens", "Attica", "10"), ("Piraeus", "Attica", "18"), ("Thessaloniki", "Central Macedonia", "54"),
+    ("Patras", "Western Greece", "26"), ("Heraklion", "Crete", "71"), ("Larissa", "Thessaly", "41"),
+    ("Volos", "Thessaly", "38"), ("Ioannina", "Epirus", "45"),
+]
+STREETS = ["Ermou", "Stadiou", "Panepistimiou", "Akadimias", "Tsimiski", "Egnatia", "Kifisias",
+           "Vasilissis Sofias", "Syngrou", "Patision", "Alexandras", "Mesogeion"]
+
+MERCHANTS = ["Coffee Island", "Sklavenitis", "AB Vassilopoulos", "Public", "Kotsovolos", "Shell",
+             "Aegean Airlines", "OTE <Cosmote>", "Marks & Spencer", "Zara", "e-food", "Vodafone",
+             "IKEA", "Lidl", "Praktiker", "Jumbo"]
+
+DOC_TYPES = [("NATIONAL_ID", "AK"), ("PASSPORT", "PP"), ("DRIVER_LICENSE", "DL")]
+FLAG_CATEGORIES = ["KYC", "AML", "FRAUD"]
+FLAG_NOTES = {"KYC": "Document review due", "AML": "Unusual cash activity", "FRAUD": "Card used in 2 countries <24h"}
+
+
+# -------------------------
+# Column generators
+# One call fills a whole column for a chunk.
+# -------------------------
+AS_OF = date.fromisoformat(AS_OF_DATE)
+DAYS = [(AS_OF - timedelta(days=i)).isoformat() for i in range(HISTORY_DAYS)]
+CUSTOMER_DAYS = [(AS_OF - timedelta(days=i)).isoformat() for i in range(HISTORY_DAYS, 12 * 365)]
+BIRTH_DAYS = [(date(1945, 1, 1) + timedelta(days=i)).isoformat() for i in range(0, 60 * 365, 3)]
+LOAN_DAYS = DAYS + CUSTOMER_DAYS[:2 * 365]  # originated up to 5 years back
+EXPIRY_DAYS = [(AS_OF + timedelta(days=i)).isoformat() for i in range(30, 10 * 365, 7)]
+CLOCK = [f"{h:02d}:{m:02d}:{s:02d}" for h in range(7, 23) for m in range(60) for s in range(0, 60, 5)]
+
+
+def timestamps(rng: random.Random, n: int, days: Sequence[str] = DAYS) -> List[str]:
+    return [f"{d} {t}" for d, t in zip(rng.choices(days, k=n), rng.choices(CLOCK, k=n))]
+
+
+def amounts(rng: random.Random, low: float, high: float, n: int) -> List[float]:
+    span = high - low
+    return [round(low + span * rng.random(), 2) for _ in range(n)]
+
+
+def shares(rng: random.Random, share: float, n: int) -> List[bool]:
+    return [rng.random() < share for _ in range(n)]
+
+
+def counts(rng: random.Random, mean: float, n: int, minimum: int = 0) -> List[int]:
+    """n counts, uniform on [minimum, 2 * mean - minimum] with random rounding: average `mean`."""
+    spread = 2.0 * (mean - minimum)
+    return [minimum + int(spread * rng.random() + rng.random()) for _ in range(n)]
+
+
+def weighted(rng: random.Random, values: Sequence, weights: Sequence[float], n: int) -> List:
+    return rng.choices(values, weights=weights, k=n)
+
+
+def repeat_each(values: Sequence, times: Sequence[int]) -> List:
+    out: List = []
+    for v, k in zip(values, times):
+        out += [v] * k
+    return out
+
+
+def add_months(day: str, months: int) -> str:
+    y, m = int(day[:4]), int(day[5:7]) - 1 + months
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}-{min(int(day[8:10]), 28):02d}"
+
+
+_SLUG = str.maketrans({"'": "", "ë": "e", "é": "e", "ü": "u", "ú": "u", "ñ": "n"})
+
+
+def slug(name: str) -> str:
+    return name.lower().translate(_SLUG)
+
+
+# -------------------------
+# Row building
+# -------------------------
+INSERT_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "ecs_customers": ("customer_id", "first_name", "last_name", "email", "created_at"),
+    "ecs_parties": ("party_id", "party_type", "full_name", "created_at", "status"),
+    "ecs_person_details": ("party_id", "first_name", "last_name", "date_of_birth", "tax_id"),
+    "ecs_party_contacts": ("party_id", "type", "value", "is_primary"),
+    "ecs_addresses": ("address_id", "line1", "line2", "city", "region", "postal_code", "country"),
+    "ecs_party_addresses": ("party_id", "address_id", "addr_type", "is_primary"),
+    "ecs_party_id_documents": ("party_id", "doc_type", "doc_number", "issued_by", "expires_on"),
+    "ecs_accounts": ("account_id", "customer_id", "account_type", "balance", "created_at", "account_number",
+                     "brach_id", "product_id", "status"),
+    "ecs_account_holders": ("account_id", "party_id", "role", "added_at"),
+    "ecs_transactions": ("account_id", "txn_type", "amount", "txn_ts", "description", "transfer_id"),
+    "ecs_journal_entries": ("entry_id", "entry_ts", "source", "reference", "status", "memo"),
+    "ecs_ledger_lines": ("entry_id", "gl_account_id", "currency_code", "debit", "credit", "description"),
+    "ecs_account_postings": ("entry_id", "account_id", "currency_code", "amount", "posting_ts", "description"),
+    "ecs_cards": ("card_id", "account_id", "pan_last4", "card_type", "status", "issued_at", "expires_on"),
+    "ecs_card_authorizations": ("auth_id", "card_id", "account_id", "amount", "merchant", "auth_ts", "status",
+                                "reference"),
+    "ecs_card_settlements": ("auth_id", "entry_id", "settled_ts"),
+    "ecs_fees_applied": ("fee_type_id", "account_id", "entry_id", "applied_at"),
+    "ecs_loans": ("loan_id", "party_id", "branch_id", "loan_product_id", "principal", "apr", "term_months",
+                  "status", "originated_at"),
+    "ecs_loan_schedule": ("loan_id", "installment_no", "due_date", "due_principal", "due_interest", "status"),
+    "ecs_loan_payments": ("loan_id", "entry_id", "paid_at", "amount"),
+    "ecs_compliance_flags": ("party_id", "account_id", "severity", "category", "note", "created_at", "status"),
+}
+# parents before children, so the file is laid out in load order
+LOAD_ORDER = list(INSERT_COLUMNS)
+
+
+def insert_sql(table: str) -> str:
+    cols = INSERT_COLUMNS[table]
+    return f"INSERT INTO {table}({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+
+@dataclass
+class IdCounters:
+    """Last id handed out per table; ids continue across chunks."""
+    account: int = 0
+    card: int = 0
+    auth: int = 0
+    loan: int = 0
+    entry: int = 0
+    transfer: int = 0
+
+
+class ChunkRows:
+    """Rows of one chunk per table, plus journal entries with their GL lines."""
+
+    def __init__(self, ids: IdCounters):
+        self.ids = ids
+        self.tables: Dict[str, List[Tuple]] = defaultdict(list)
+
+    def entry(self, ts: str, source: str, status: str, memo, debit_gl: int, credit_gls: Sequence[Tuple[int, float]],
+              amount: float) -> int:
+        """Journal entry; GL lines debit `debit_gl` by amount and credit each (gl, part)."""
+        self.ids.entry += 1
+        eid = self.ids.entry
+        self.tables["ecs_journal_entries"].append((eid, ts, source, f"{source}-{eid:010d}", status, memo))
+        if LEDGER_LINES:
+            lines = self.tables["ecs_ledger_lines"]
+            lines.append((eid, debit_gl, "EUR", amount, 0.0, None))
+            for gl, part in credit_gls:
+                lines.append((eid, gl, "EUR", 0.0, part, None))
+        return eid
+
+
+def build_chunk(rng: random.Random, ids: IdCounters, first_cid: int, last_cid: int) -> Dict[str, List[Tuple]]:
+    cids = list(range(first_cid, last_cid + 1))
+    n = len(cids)
+    out = ChunkRows(ids)
+    t = out.tables
+
+    # Customers, parties, KYC
+    first = rng.choices(FIRST_NAMES, k=n)
+    last = rng.choices(LAST_NAMES, k=n)
+    created = timestamps(rng, n, CUSTOMER_DAYS)
+    domains = rng.choices(EMAIL_DOMAINS, k=n)
+    emails = [f"{slug(f)}.{slug(l)}.{cid}@{d}" for cid, f, l, d in zip(cids, first, last, domains)]
+    t["ecs_customers"] = list(zip(cids, first, last, emails, created))
+    t["ecs_parties"] = [
+        (cid, "PERSON", f"{f} {l}", c, s)
+        for cid, f, l, c, s in zip(cids, first, last, created,
+                                   weighted(rng, ("ACTIVE", "BLOCKED", "CLOSED"), (96, 3, 1), n))
+    ]
+    t["ecs_person_details"] = [
+        (cid, f, l, dob, f"TAX{cid:09d}")
+        for cid, f, l, dob in zip(cids, first, last, rng.choices(BIRTH_DAYS, k=n))
+    ]
+    t["ecs_party_contacts"] = [(cid, "EMAIL", e, 1) for cid, e in zip(cids, emails)] + [
+        (cid, "PHONE", f"+30 69{rng.randrange(10 ** 8):08d}", 0)
+        for cid, has_phone in zip(cids, shares(rng, PHONE_SHARE, n)) if has_phone
+    ]
+    t["ecs_addresses"] = [
+        (cid, f"{street} {no}", f"Apt {rng.randrange(1, 30)}" if has_apt else None, city, region,
+         f"{prefix}{rng.randrange(1000):03d}", "GR")
+        for cid, street, no, has_apt, (city, region, prefix) in zip(
+            cids, rng.choices(STREETS, k=n), [rng.randrange(1, 250) for _ in range(n)], shares(rng, 0.4, n),
+            rng.choices(CITIES, k=n))
+    ]
+    t["ecs_party_addresses"] = [(cid, cid, "HOME", 1) for cid in cids]
+    docs = rng.choices(DOC_TYPES, k=n)
+    t["ecs_party_id_documents"] = [
+        (cid, doc_type, f"{prefix}{cid:010d}", "GR", expires)
+        for cid, (doc_type, prefix), expires in zip(cids, docs, rng.choices(EXPIRY_DAYS, k=n))
+    ]
+
+    # Accounts and holders
+    per_customer = counts(rng, ACCOUNTS_PER_CUSTOMER, n, minimum=1)
+    owners = repeat_each(cids, per_customer)
+    n_acc = len(owners)
+    account_ids = list(range(ids.account + 1, ids.account + n_acc + 1))
+    ids.account += n_acc
+    accounts_of: Dict[int, List[int]] = defaultdict(list)
+    for aid, cid in zip(account_ids, owners):
+        accounts_of[cid].append(aid)
+    products = weighted(rng, (1, 2), (70, 30), n_acc)
+    opened = timestamps(rng, n_acc, CUSTOMER_DAYS)
+    branches = [rng.randrange(1, len(BRANCHES) + 1) for _ in range(n_acc)]
+    statuses = weighted(rng, ("OPEN", "FROZEN", "CLOSED"), (95, 3, 2), n_acc)
+
+    holders = [(aid, cid, "PRIMARY", ts) for aid, cid, ts in zip(account_ids, owners, opened)]
+    for aid, cid, ts, joint in zip(account_ids, owners, opened, shares(rng, JOINT_HOLDER_SHARE, n_acc)):
+        other = cids[rng.randrange(n)]
+        if joint and other != cid:
+            holders.append((aid, other, "JOINT", ts))
+    t["ecs_account_holders"] = holders
+
+    # Legacy transactions: ecs_accounts.balance is their running total and never negative
+    balances = dict.fromkeys(account_ids, 0.0)
+    per_account = counts(rng, TRANSACTIONS_PER_ACCOUNT, n_acc)
+    total = sum(per_account)
+    # (account, ts) sorted: each account's transactions in time order
+    txn_keys = sorted(zip(repeat_each(account_ids, per_account), timestamps(rng, total)))
+    txn_rows = t["ecs_transactions"]
+    for (aid, ts), amount, is_out, transfer in zip(txn_keys, amounts(rng, 5, 900, total), shares(rng, 0.45, total),
+                                                   shares(rng, TRANSFER_SHARE, total)):
+        if not is_out or amount > balances[aid]:
+            balances[aid] = round(balances[aid] + amount, 2)
+            txn_rows.append((aid, "DEPOSIT", amount, ts, "Cash deposit", None))
+            continue
+        balances[aid] = round(balances[aid] - amount, 2)
+        target = account_ids[rng.randrange(n_acc)]
+        if not transfer or target == aid:
+            txn_rows.append((aid, "WITHDRAWAL", amount, ts, "Cash withdrawal", None))
+            continue
+        ids.transfer += 1
+        transfer_id = f"TRF-{ids.transfer:010d}"
+        balances[target] = round(balances[target] + amount, 2)
+        txn_rows.append((aid, "WITHDRAWAL", amount, ts, "Transfer out", transfer_id))
+        txn_rows.append((target, "DEPOSIT", amount, ts, "Transfer in", transfer_id))
+
+    t["ecs_accounts"] = [
+        (aid, cid, DEPOSIT_PRODUCTS[product - 1][5], balances[aid], ts, f"ACCT-{aid:010d}", branch, product, status)
+        for aid, cid, product, ts, branch, status in zip(account_ids, owners, products, opened, branches, statuses)
+    ]
+
+    # Ledger postings: deposits and withdrawals
+    postings = t["ecs_account_postings"]
+    per_account = counts(rng, POSTINGS_PER_ACCOUNT, n_acc)
+    post_accounts = repeat_each(account_ids, per_account)
+    total = len(post_accounts)
+    for aid, amount, ts, is_out, reversed_ in zip(post_accounts, amounts(rng, 5, 1500, total), timestamps(rng, total),
+                                                  shares(rng, 0.5, total), shares(rng, REVERSED_SHARE, total)):
+        status = "REVERSED" if reversed_ else "POSTED"
+        if is_out:
+            eid = out.entry(ts, "WITHDRAWAL", status, "Cash withdrawal", GL_DEPOSITS, [(GL_CASH, amount)], amount)
+            postings.append((eid, aid, "EUR", -amount, ts, "Withdrawal"))
+        else:
+            eid = out.entry(ts, "DEPOSIT", status, "Cash deposit", GL_CASH, [(GL_DEPOSITS, amount)], amount)
+            postings.append((eid, aid, "EUR", amount, ts, "Deposit"))
+
+    # Cards, authorizations, settlements (a CAPTURED auth is settled by a CARD entry)
+    card_accounts = [aid for aid, has_card in zip(account_ids, shares(rng, CARD_SHARE, n_acc)) if has_card]
+    n_cards = len(card_accounts)
+    card_ids = list(range(ids.card + 1, ids.card + n_cards + 1))
+    ids.card += n_cards
+    t["ecs_cards"] = [
+        (card_id, aid, f"{rng.randrange(10000):04d}", "DEBIT", status, issued, expires)
+        for card_id, aid, status, issued, expires in zip(
+            card_ids, card_accounts, weighted(rng, ("ACTIVE", "BLOCKED", "EXPIRED"), (90, 5, 5), n_cards),
+            timestamps(rng, n_cards), rng.choices(EXPIRY_DAYS[:160], k=n_cards))
+    ]
+    per_card = counts(rng, AUTHS_PER_CARD, n_cards)
+    auth_cards = repeat_each(list(zip(card_ids, card_accounts)), per_card)
+    total = len(auth_cards)
+    auth_statuses = weighted(rng, ("APPROVED", "CAPTURED", "REVERSED", "EXPIRED"), (45, 40, 10, 5), total)
+    auth_rows = t["ecs_card_authorizations"]
+    for (card_id, aid), amount, merchant, ts, status in zip(auth_cards, amounts(rng, 1, 250, total),
+                                                            rng.choices(MERCHANTS, k=total), timestamps(rng, total),
+                                                            auth_statuses):
+        ids.auth += 1
+        auth_id = ids.auth
+        reference = f"AUTH-{auth_id:012d}"
+        auth_rows.append((auth_id, card_id, aid, amount, merchant, ts, status, reference))
+        if status == "CAPTURED":
+            eid = out.entry(ts, "CARD", "POSTED", f"Card settlement: {merchant}", GL_DEPOSITS, [(GL_FEES, amount)],
+                            amount)
+            postings.append((eid, aid, "EUR", -amount, ts, "Card settlement"))
+            t["ecs_card_settlements"].append((auth_id, eid, ts))
+
+    # Fees
+    per_account = counts(rng, FEES_PER_ACCOUNT, n_acc)
+    fee_accounts = repeat_each(account_ids, per_account)
+    total = len(fee_accounts)
+    fee_types = [rng.randrange(len(FEE_TYPES)) for _ in range(total)]
+    for aid, fee_type, ts in zip(fee_accounts, fee_types, timestamps(rng, total)):
+        _, name, amount = FEE_TYPES[fee_type]
+        eid = out.entry(ts, "FEE", "POSTED", name, GL_DEPOSITS, [(GL_FEES, amount)], amount)
+        postings.append((eid, aid, "EUR", -amount, ts, f"Fee: {name}"))
+        t["ecs_fees_applied"].append((fee_type + 1, aid, eid, ts))
+
+    # Loans: monthly schedule from origination, installments due by AS_OF_DATE are paid
+    # from the customer's first account
+    borrowers = [cid for cid, has_loan in zip(cids, shares(rng, LOAN_SHARE, n)) if has_loan]
+    for cid, product, principal, originated in zip(
+            borrowers, [rng.randrange(len(LOAN_PRODUCTS)) for _ in borrowers],
+            [round(rng.uniform(1_000, 50_000), -2) for _ in borrowers],
+            timestamps(rng, len(borrowers), LOAN_DAYS)):
+        _, _, apr, term = LOAN_PRODUCTS[product]
+        ids.loan += 1
+        loan_id = ids.loan
+        due_principal = round(principal / term, 2)
+        due_interest = round(principal * apr / 12, 2)
+        paid = 0
+        for no in range(1, term + 1):
+            due = add_months(originated[:10], no)
+            if due > AS_OF_DATE:
+                t["ecs_loan_schedule"].append((loan_id, no, due, due_principal, due_interest, "DUE"))
+                continue
+            paid += 1
+            t["ecs_loan_schedule"].append((loan_id, no, due, due_principal, due_interest, "PAID"))
+            amount = round(due_principal + due_interest, 2)
+            ts = f"{due} 09:00:00"
+            eid = out.entry(ts, "LOAN", "POSTED", "Loan installment", GL_DEPOSITS,
+                            [(GL_LOANS, due_principal), (GL_INTEREST, due_interest)], amount)
+            postings.append((eid, accounts_of[cid][0], "EUR", -amount, ts, "Loan payment"))
+            t["ecs_loan_payments"].append((loan_id, eid, ts, amount))
+        status = "CLOSED" if paid == term else "ACTIVE"
+        t["ecs_loans"].append((loan_id, cid, rng.randrange(1, len(BRANCHES) + 1), product + 1, principal, apr, term,
+                               status, originated))
+
+    # Compliance flags
+    per_customer = counts(rng, FLAGS_PER_CUSTOMER, n)
+    flagged = repeat_each(cids, per_customer)
+    total = len(flagged)
+    t["ecs_compliance_flags"] = [
+        (cid, rng.choice(accounts_of[cid]) if on_account else None, severity, category, FLAG_NOTES[category], ts,
+         status)
+        for cid, on_account, severity, category, ts, status in zip(
+            flagged, shares(rng, 0.5, total), weighted(rng, ("LOW", "MEDIUM", "HIGH"), (60, 30, 10), total),
+            rng.choices(FLAG_CATEGORIES, k=total), timestamps(rng, total),
+            weighted(rng, ("OPEN", "RESOLVED"), (70, 30), total))
+    ]
+    return t
+
+
+# -------------------------
+# Load
+# -------------------------
+def read_schema() -> Tuple[str, str]:
+    """(tables DDL, post-load DDL) of Database_Schema.sql."""
+    sql = SCHEMA_SQL_PATH.read_text(encoding="utf-8")
+    head, marker, tail = sql.partition(POST_LOAD_MARKER)
+    if not marker:
+        raise SystemExit(f"{SCHEMA_SQL_PATH} has no '{POST_LOAD_MARKER}' section.")
+    return head, tail
+
+
+def load_reference_data(conn: sqlite3.Connection):
+    conn.executemany("INSERT INTO ecs_currencies VALUES (?,?,?,?)", CURRENCIES)
+    conn.executemany(
+        "INSERT INTO ecs_branches(branch_id, code, name, city, created_at) VALUES (?,?,?,?,?)",
+        [(i, code, name, city, "2010-01-01 00:00:00") for i, (code, name, city) in enumerate(BRANCHES, 1)],
+    )
+    conn.executemany(
+        "INSERT INTO ecs_employees(branch_id, full_name, role, status, hired_at) VALUES (?,?,?,?,?)",
+        [(b, f"{FIRST_NAMES[(b * 7 + i) % len(FIRST_NAMES)]} {LAST_NAMES[(b * 3 + i) % len(LAST_NAMES)]}",
+          "MANAGER" if i == 0 else ("TELLER" if i % 3 else "BACKOFFICE"), "ACTIVE", f"{2010 + i % 15}-03-01 09:00:00")
+         for b in range(1, len(BRANCHES) + 1) for i in range(EMPLOYEES_PER_BRANCH)],
+    )
+    conn.executemany(
+        "INSERT INTO ecs_deposit_products(product_id, code, name, currency_code, overdraft_allowed, overdraft_limit) "
+        "VALUES (?,?,?,?,?,?)",
+        [(i, *p[:5]) for i, p in enumerate(DEPOSIT_PRODUCTS, 1)],
+    )
+    conn.executemany(
+        "INSERT INTO ecs_gl_accounts(gl_account_id, code, name, type, currency_code) VALUES (?,?,?,?,?)",
+        [(i, *g) for i, g in enumerate(GL_ACCOUNTS, 1)],
+    )
+    conn.executemany(
+        "INSERT INTO ecs_loan_products(loan_product_id, code, name, apr, term_months) VALUES (?,?,?,?,?)",
+        [(i, *p) for i, p in enumerate(LOAN_PRODUCTS, 1)],
+    )
+    conn.executemany(
+        "INSERT INTO ecs_fee_types(fee_type_id, code, name, amount) VALUES (?,?,?,?)",
+        [(i, *f) for i, f in enumerate(FEE_TYPES, 1)],
+    )
+
+
+def chunk_rng(seed: int, chunk_no: int) -> random.Random:
+    return random.Random(f"{seed}:{chunk_no}")
+
+
+def generate(db_path: str, customers: int = CUSTOMERS, seed: int = SEED, overwrite: bool = OVERWRITE,
+             prepare_report_run: bool = PREPARE_REPORT_RUN) -> Dict[str, int]:
+    """Builds db_path; returns the rows written per table."""
+    if os.path.exists(db_path):
+        if not overwrite:
+            raise SystemExit(f"{db_path} exists (set OVERWRITE = True to replace it).")
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    tables_ddl, post_load_ddl = read_schema()
+    conn = sqlite3.connect(db_path)
+    try:
+        # a half-built file is thrown away, so the load runs without a journal
+        conn.execute("PRAGMA journal_mode=OFF;")
+        conn.execute("PRAGMA synchronous=OFF;")
+        conn.execute("PRAGMA cache_size=-262144;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.executescript(tables_ddl)
+        load_reference_data(conn)
+        conn.commit()
+
+        written: Dict[str, int] = defaultdict(int)
+        ids = IdCounters()
+        chunks = (customers + CHUNK_CUSTOMERS - 1) // CHUNK_CUSTOMERS
+        t0 = time.perf_counter()
+        for chunk_no in range(chunks):
+            first_cid = chunk_no * CHUNK_CUSTOMERS + 1
+            last_cid = min(customers, first_cid + CHUNK_CUSTOMERS - 1)
+            rows = build_chunk(chunk_rng(seed, chunk_no), ids, first_cid, last_cid)
+            conn.execute("BEGIN;")
+            for table in LOAD_ORDER:
+                if rows.get(table):
+                    conn.executemany(insert_sql(table), rows[table])
+                    written[table] += len(rows[table])
+            conn.commit()
+            if (chunk_no + 1) % PROGRESS_EVERY_CHUNKS == 0 or chunk_no + 1 == chunks:
+                elapsed = time.perf_counter() - t0
+                print(f"[seed] customers {last_cid:,}/{customers:,}  rows {sum(written.values()):,}  "
+                      f"{elapsed:.1f}s  ({sum(written.values()) / elapsed:,.0f} rows/s)")
+
+        print("[seed] indexes, views, triggers...")
+        conn.executescript(post_load_ddl)
+        conn.executescript(AUTH_SQL_PATH.read_text(encoding="utf-8"))
+        conn.execute("ANALYZE;")
+        conn.commit()
+        conn.execute("PRAGMA journal_mode=WAL;")
+        if prepare_report_run:
+            conn.executescript(REPORT_SQL_PATH.read_text(encoding="utf-8"))
+            conn.commit()
+        return dict(written)
+    finally:
+        conn.close()
+
+
+def main():
+    print("=====================================================")
+    print("SEED: synthetic bank database")
+    print(f"DB_PATH:    {DB_PATH}")
+    print(f"CUSTOMERS:  {CUSTOMERS:,}")
+    print(f"SEED:       {SEED}")
+    print(f"AS_OF_DATE: {AS_OF_DATE}")
+    print("=====================================================")
+    t0 = time.perf_counter()
+    written = generate(DB_PATH)
+    elapsed = time.perf_counter() - t0
+    for table in LOAD_ORDER:
+        print(f"  {table:<26} {written.get(table, 0):>14,}")
+    total = sum(written.values())
+    print(f"Rows: {total:,} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s, "
+          f"{CUSTOMERS / elapsed:,.0f} customers/s), file {os.path.getsize(DB_PATH) / 2 ** 20:,.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
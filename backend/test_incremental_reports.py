@@ -0,0 +1,158 @@
+"""
+Incremental module runs (etl_customer_reports.py, INCREMENTAL = True) against a full rebuild.
+
+A small synthetic database (seed_synthetic_db.py) with change tracking gets a full run, then
+inserts, updates and deletes across the tracked source tables. An incremental run and a
+full run on the changed data must then store the same documents.
+
+  python -m pytest test_incremental_reports.py      (or: python test_incremental_reports.py)
+"""
+import contextlib
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import unittest
+
+import etl_customer_reports
+import seed_synthetic_db
+from report_codec import decode_doc
+
+CUSTOMERS = 300
+CHANGE_TRACKING_SQL_PATH = seed_synthetic_db.BASE / "database" / "Customer_Report_Change_Tracking.sql"
+
+NOT_POSTED_POSTING = """
+    SELECT MIN(ap.posting_id)
+    FROM ecs_account_postings ap
+    JOIN ecs_journal_entries e ON e.entry_id = ap.entry_id
+    WHERE e.status <> 'POSTED'
+"""
+
+# Each statement must change exactly one row. Postings can only change while their entry is
+# not POSTED, and the documents only show POSTED entries: those two just run the triggers.
+CHANGES = [
+    # inserts
+    "INSERT INTO ecs_compliance_flags(party_id, severity, category, note) VALUES (3, 'HIGH', 'AML', 'inserted')",
+    "INSERT INTO ecs_transactions(account_id, txn_type, amount, description) "
+    "SELECT MIN(account_id), 'DEPOSIT', 12.5, 'inserted' FROM ecs_accounts",
+    # updates
+    "UPDATE ecs_customers SET last_name = 'Updated' WHERE customer_id = 5",
+    "UPDATE ecs_compliance_flags SET status = 'RESOLVED' "
+    "WHERE flag_id = (SELECT MIN(flag_id) FROM ecs_compliance_flags WHERE status = 'OPEN')",
+    "UPDATE ecs_transactions SET amount = amount + 1 WHERE transaction_id = (SELECT MAX(transaction_id) FROM ecs_transactions)",
+    f"UPDATE ecs_account_postings SET description = 'updated' WHERE posting_id = ({NOT_POSTED_POSTING})",
+    "UPDATE ecs_fees_applied SET applied_at = datetime(applied_at, '+1 day') WHERE fee_id = (SELECT MIN(fee_id) FROM ecs_fees_applied)",
+    "UPDATE ecs_loan_payments SET amount = amount + 1 "
+    "WHERE payment_id = (SELECT payment_id FROM ecs_loan_payments ORDER BY paid_at DESC, payment_id DESC LIMIT 1 OFFSET 1)",
+    "UPDATE ecs_card_settlements SET settled_ts = datetime(settled_ts, '+1 hour') "
+    "WHERE settlement_id = (SELECT MIN(settlement_id) FROM ecs_card_settlements)",
+    "UPDATE ecs_cards SET account_id = (SELECT MAX(account_id) FROM ecs_accounts) WHERE card_id = (SELECT MIN(card_id) FROM ecs_cards)",
+    "UPDATE ecs_loans SET party_id = party_id + 1 WHERE loan_id = (SELECT MIN(loan_id) FROM ecs_loans)",
+    "UPDATE ecs_account_holders SET party_id = party_id + 1 WHERE rowid = (SELECT MIN(h.rowid) FROM ecs_account_holders h "
+    "WHERE h.role = 'JOINT' AND NOT EXISTS (SELECT 1 FROM ecs_account_holders x "
+    "WHERE x.account_id = h.account_id AND x.party_id = h.party_id + 1))",
+    # deletes
+    "DELETE FROM ecs_compliance_flags WHERE flag_id = (SELECT MAX(flag_id) FROM ecs_compliance_flags WHERE party_id <> 3)",
+    "DELETE FROM ecs_transactions WHERE transaction_id = (SELECT MIN(transaction_id) FROM ecs_transactions WHERE transfer_id IS NULL)",
+    f"DELETE FROM ecs_account_postings WHERE posting_id = ({NOT_POSTED_POSTING})",
+    "DELETE FROM ecs_fees_applied WHERE fee_id = (SELECT MAX(fee_id) FROM ecs_fees_applied)",
+    "DELETE FROM ecs_loan_payments WHERE payment_id = (SELECT MAX(payment_id) FROM ecs_loan_payments)",
+    "DELETE FROM ecs_card_settlements WHERE settlement_id = (SELECT MAX(settlement_id) FROM ecs_card_settlements)",
+    "DELETE FROM ecs_card_authorizations WHERE auth_id = "
+    "(SELECT MAX(auth_id) FROM ecs_card_authorizations WHERE auth_id NOT IN (SELECT auth_id FROM ecs_card_settlements))",
+    "DELETE FROM ecs_cards WHERE card_id = (SELECT MAX(card_id) FROM ecs_cards)",
+    "DELETE FROM ecs_loans WHERE loan_id = (SELECT MAX(loan_id) FROM ecs_loans)",
+    "DELETE FROM ecs_customers WHERE customer_id = (SELECT MAX(customer_id) FROM ecs_customers)",
+]
+
+
+class IncrementalRunTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, "incremental.db")
+        cls.saved = (etl_customer_reports.DB_PATH, etl_customer_reports.INCREMENTAL)
+        etl_customer_reports.DB_PATH = cls.db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            seed_synthetic_db.generate(cls.db_path, CUSTOMERS, overwrite=True)
+        cls.execute_script(CHANGE_TRACKING_SQL_PATH)
+        cls.run_etl(incremental=False)
+
+        conn = sqlite3.connect(cls.db_path)
+        try:
+            for sql in CHANGES:
+                changed = conn.execute(sql).rowcount
+                assert changed == 1, f"{changed} rows changed by: {sql}"
+            conn.commit()
+        finally:
+            conn.close()
+
+        cls.execute_script(seed_synthetic_db.REPORT_SQL_PATH)
+        cls.incremental_log = cls.run_etl(incremental=True)
+        cls.incremental_run = cls.latest_run()
+        cls.execute_script(seed_synthetic_db.REPORT_SQL_PATH)
+        cls.run_etl(incremental=False)
+        cls.full_run = cls.latest_run()
+
+    @classmethod
+    def tearDownClass(cls):
+        etl_customer_reports.DB_PATH, etl_customer_reports.INCREMENTAL = cls.saved
+        cls.tmp.cleanup()
+
+    @classmethod
+    def execute_script(cls, path):
+        conn = sqlite3.connect(cls.db_path)
+        try:
+            conn.executescript(path.read_text(encoding="utf-8"))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @classmethod
+    def run_etl(cls, incremental: bool) -> str:
+        etl_customer_reports.INCREMENTAL = incremental
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            etl_customer_reports.main()
+        return out.getvalue()
+
+    @classmethod
+    def latest_run(cls) -> int:
+        conn = sqlite3.connect(cls.db_path)
+        try:
+            return conn.execute("SELECT MAX(run_id) FROM ecs_rpt_runs").fetchone()[0]
+        finally:
+            conn.close()
+
+    def module_docs(self, run_id: int):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {
+                (r[0], r[1]): (decode_doc(r[2], r[4]), decode_doc(r[3], r[4]))
+                for r in conn.execute("""
+                    SELECT customer_id, module_code, json_doc, xml_doc, codec
+                    FROM ecs_customer_rpt_modules
+                    WHERE run_id = ?
+                """, (run_id,))
+            }
+        finally:
+            conn.close()
+
+    def test_incremental_run_carries_forward(self):
+        self.assertIn("MODE:        INCREMENTAL", self.incremental_log)
+        carried = sum(int(n) for n in re.findall(r"carried forward=(\d+)", self.incremental_log))
+        rebuilt = sum(int(n) for n in re.findall(r"rebuilt=(\d+)", self.incremental_log))
+        self.assertGreater(carried, rebuilt)
+        self.assertGreater(rebuilt, 0)
+
+    def test_incremental_matches_full_rebuild(self):
+        incremental = self.module_docs(self.incremental_run)
+        full = self.module_docs(self.full_run)
+        self.assertEqual(sorted(incremental), sorted(full))
+        stale = sorted(key for key in full if incremental[key] != full[key])
+        self.assertEqual(stale, [], "documents that differ from the full rebuild")
+
+
+if __name__ == "__main__":
+    unittest.main()
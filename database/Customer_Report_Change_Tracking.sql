@@ -0,0 +1,372 @@
+-- Customer Report change tracking (incremental runs of backend/etl_customer_reports.py)
+--
+-- Every tracked write marks the affected (customer_id, module_code) pairs as changed by
+-- stamping them with the next value of a global change sequence. Each ETL run records the
+-- sequence value it started from in ecs_rpt_run_watermarks; an INCREMENTAL run rebuilds
+-- only the pairs stamped after its base run's watermark and carries the rest forward.
+--
+-- Reference data (deposit products, fee types, loan products, branches) is not tracked:
+-- run a full (non-incremental) report run after changing it.
+
+CREATE TABLE IF NOT EXISTS ecs_rpt_change_seq (
+  id  INTEGER PRIMARY KEY CHECK (id = 1),
+  seq INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO ecs_rpt_change_seq(id, seq) VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS ecs_rpt_changes (
+  customer_id INTEGER NOT NULL,
+  module_code TEXT NOT NULL,
+  change_seq  INTEGER NOT NULL,
+  changed_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (customer_id, module_code)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rpt_changes_seq ON ecs_rpt_changes(change_seq);
+
+CREATE TABLE IF NOT EXISTS ecs_rpt_run_watermarks (
+  run_id      INTEGER PRIMARY KEY,
+  change_seq  INTEGER NOT NULL,
+  recorded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (run_id) REFERENCES ecs_rpt_runs(run_id) ON DELETE CASCADE
+);
+
+-- Write-only entry point used by the source triggers below
+CREATE VIEW IF NOT EXISTS v_rpt_mark_changed
+AS
+  SELECT customer_id, module_code FROM ecs_rpt_changes WHERE 0;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_mark_changed
+INSTEAD OF INSERT ON v_rpt_mark_changed
+FOR EACH ROW WHEN NEW.customer_id IS NOT NULL
+BEGIN
+  UPDATE ecs_rpt_change_seq SET seq = seq + 1 WHERE id = 1;
+  INSERT INTO ecs_rpt_changes(customer_id, module_code, change_seq, changed_at)
+  VALUES (NEW.customer_id, NEW.module_code, (SELECT seq FROM ecs_rpt_change_seq WHERE id = 1), CURRENT_TIMESTAMP)
+  ON CONFLICT (customer_id, module_code) DO UPDATE SET change_seq = excluded.change_seq,
+                                                       changed_at = excluded.changed_at;
+END;
+
+-- CUSTOMER_PROFILE
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_customers_ins AFTER INSERT ON ecs_customers
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.customer_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_customers_upd AFTER UPDATE ON ecs_customers
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.customer_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_customers_del AFTER DELETE ON ecs_customers
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.customer_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_contacts_ins AFTER INSERT ON ecs_party_contacts
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_contacts_upd AFTER UPDATE ON ecs_party_contacts
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_contacts_del AFTER DELETE ON ecs_party_contacts
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_party_addresses_ins AFTER INSERT ON ecs_party_addresses
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_party_addresses_upd AFTER UPDATE ON ecs_party_addresses
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_party_addresses_del AFTER DELETE ON ecs_party_addresses
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_addresses_upd AFTER UPDATE ON ecs_addresses
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT pa.party_id, 'CUSTOMER_PROFILE' FROM ecs_party_addresses pa WHERE pa.address_id = NEW.address_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_id_documents_ins AFTER INSERT ON ecs_party_id_documents
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_id_documents_upd AFTER UPDATE ON ecs_party_id_documents
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'CUSTOMER_PROFILE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_id_documents_del AFTER DELETE ON ecs_party_id_documents
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'CUSTOMER_PROFILE');
+END;
+
+-- ACCOUNTS (holders also drive TRANSACTIONS, CARDS and FEES)
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_holders_ins AFTER INSERT ON ecs_account_holders
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'ACCOUNTS' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+  INSERT INTO v_rpt_mark_changed
+  SELECT NEW.party_id, m.column1 FROM (VALUES ('TRANSACTIONS'), ('CARDS'), ('FEES')) m;
+END;
+
+-- dropped first so re-running this file replaces the version that only marked NEW's account
+DROP TRIGGER IF EXISTS trg_rpt_chg_holders_upd;
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_holders_upd AFTER UPDATE ON ecs_account_holders
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'ACCOUNTS' FROM ecs_account_holders h WHERE h.account_id IN (OLD.account_id, NEW.account_id);
+  INSERT INTO v_rpt_mark_changed
+  SELECT OLD.party_id, m.column1 FROM (VALUES ('ACCOUNTS'), ('TRANSACTIONS'), ('CARDS'), ('FEES')) m;
+  INSERT INTO v_rpt_mark_changed
+  SELECT NEW.party_id, m.column1 FROM (VALUES ('ACCOUNTS'), ('TRANSACTIONS'), ('CARDS'), ('FEES')) m;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_holders_del AFTER DELETE ON ecs_account_holders
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'ACCOUNTS' FROM ecs_account_holders h WHERE h.account_id = OLD.account_id;
+  INSERT INTO v_rpt_mark_changed
+  SELECT OLD.party_id, m.column1 FROM (VALUES ('ACCOUNTS'), ('TRANSACTIONS'), ('CARDS'), ('FEES')) m;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_accounts_upd AFTER UPDATE ON ecs_accounts
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'ACCOUNTS' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_parties_name_upd AFTER UPDATE OF full_name ON ecs_parties
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT DISTINCT h2.party_id, 'ACCOUNTS'
+    FROM ecs_account_holders h1
+    JOIN ecs_account_holders h2 ON h2.account_id = h1.account_id
+   WHERE h1.party_id = NEW.party_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_postings_ins AFTER INSERT ON ecs_account_postings
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, m.column1
+    FROM ecs_account_holders h, (VALUES ('ACCOUNTS'), ('TRANSACTIONS')) m
+   WHERE h.account_id = NEW.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_postings_upd AFTER UPDATE ON ecs_account_postings
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, m.column1
+    FROM ecs_account_holders h, (VALUES ('ACCOUNTS'), ('TRANSACTIONS')) m
+   WHERE h.account_id IN (OLD.account_id, NEW.account_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_postings_del AFTER DELETE ON ecs_account_postings
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, m.column1
+    FROM ecs_account_holders h, (VALUES ('ACCOUNTS'), ('TRANSACTIONS')) m
+   WHERE h.account_id = OLD.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_entries_status_upd AFTER UPDATE OF status ON ecs_journal_entries
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT DISTINCT h.party_id, m.column1
+    FROM ecs_account_postings ap
+    JOIN ecs_account_holders h ON h.account_id = ap.account_id,
+         (VALUES ('ACCOUNTS'), ('TRANSACTIONS')) m
+   WHERE ap.entry_id = NEW.entry_id;
+END;
+
+-- TRANSACTIONS
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_transactions_ins AFTER INSERT ON ecs_transactions
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'TRANSACTIONS' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_transactions_upd AFTER UPDATE ON ecs_transactions
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'TRANSACTIONS' FROM ecs_account_holders h WHERE h.account_id IN (OLD.account_id, NEW.account_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_transactions_del AFTER DELETE ON ecs_transactions
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'TRANSACTIONS' FROM ecs_account_holders h WHERE h.account_id = OLD.account_id;
+END;
+
+-- CARDS
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_cards_ins AFTER INSERT ON ecs_cards
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+END;
+
+-- dropped first so re-running this file replaces the version that only marked NEW's account
+DROP TRIGGER IF EXISTS trg_rpt_chg_cards_upd;
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_cards_upd AFTER UPDATE ON ecs_cards
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS' FROM ecs_account_holders h WHERE h.account_id IN (OLD.account_id, NEW.account_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_cards_del AFTER DELETE ON ecs_cards
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS' FROM ecs_account_holders h WHERE h.account_id = OLD.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_card_auths_ins AFTER INSERT ON ecs_card_authorizations
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_card_auths_upd AFTER UPDATE OF status ON ecs_card_authorizations
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_card_auths_del AFTER DELETE ON ecs_card_authorizations
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS' FROM ecs_account_holders h WHERE h.account_id = OLD.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_card_settlements_ins AFTER INSERT ON ecs_card_settlements
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS'
+    FROM ecs_card_authorizations a
+    JOIN ecs_account_holders h ON h.account_id = a.account_id
+   WHERE a.auth_id = NEW.auth_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_card_settlements_upd AFTER UPDATE ON ecs_card_settlements
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS'
+    FROM ecs_card_authorizations a
+    JOIN ecs_account_holders h ON h.account_id = a.account_id
+   WHERE a.auth_id IN (OLD.auth_id, NEW.auth_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_card_settlements_del AFTER DELETE ON ecs_card_settlements
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'CARDS'
+    FROM ecs_card_authorizations a
+    JOIN ecs_account_holders h ON h.account_id = a.account_id
+   WHERE a.auth_id = OLD.auth_id;
+END;
+
+-- LOANS
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loans_ins AFTER INSERT ON ecs_loans
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'LOANS');
+END;
+
+-- dropped first so re-running this file replaces the version that only marked NEW.party_id
+DROP TRIGGER IF EXISTS trg_rpt_chg_loans_upd;
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loans_upd AFTER UPDATE ON ecs_loans
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'LOANS');
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'LOANS');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loans_del AFTER DELETE ON ecs_loans
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'LOANS');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loan_schedule_ins AFTER INSERT ON ecs_loan_schedule
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT l.party_id, 'LOANS' FROM ecs_loans l WHERE l.loan_id = NEW.loan_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loan_schedule_upd AFTER UPDATE ON ecs_loan_schedule
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT l.party_id, 'LOANS' FROM ecs_loans l WHERE l.loan_id = NEW.loan_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loan_schedule_del AFTER DELETE ON ecs_loan_schedule
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT l.party_id, 'LOANS' FROM ecs_loans l WHERE l.loan_id = OLD.loan_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loan_payments_ins AFTER INSERT ON ecs_loan_payments
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT l.party_id, 'LOANS' FROM ecs_loans l WHERE l.loan_id = NEW.loan_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loan_payments_upd AFTER UPDATE ON ecs_loan_payments
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT l.party_id, 'LOANS' FROM ecs_loans l WHERE l.loan_id IN (OLD.loan_id, NEW.loan_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_loan_payments_del AFTER DELETE ON ecs_loan_payments
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT l.party_id, 'LOANS' FROM ecs_loans l WHERE l.loan_id = OLD.loan_id;
+END;
+
+-- COMPLIANCE
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_flags_ins AFTER INSERT ON ecs_compliance_flags
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'COMPLIANCE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_flags_upd AFTER UPDATE ON ecs_compliance_flags
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'COMPLIANCE');
+  INSERT INTO v_rpt_mark_changed VALUES (NEW.party_id, 'COMPLIANCE');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_flags_del AFTER DELETE ON ecs_compliance_flags
+BEGIN
+  INSERT INTO v_rpt_mark_changed VALUES (OLD.party_id, 'COMPLIANCE');
+END;
+
+-- FEES
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_fees_ins AFTER INSERT ON ecs_fees_applied
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'FEES' FROM ecs_account_holders h WHERE h.account_id = NEW.account_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_fees_upd AFTER UPDATE ON ecs_fees_applied
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'FEES' FROM ecs_account_holders h WHERE h.account_id IN (OLD.account_id, NEW.account_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rpt_chg_fees_del AFTER DELETE ON ecs_fees_applied
+BEGIN
+  INSERT INTO v_rpt_mark_changed
+  SELECT h.party_id, 'FEES' FROM ecs_account_holders h WHERE h.account_id = OLD.account_id;
+END;
+
+SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_rpt_%' ORDER BY name;
@@ -24,27 +24,59 @@ CREATE TABLE IF NOT EXISTS ecs_customer_rpt_modules (
   run_id      INTEGER NOT NULL,
   customer_id INTEGER NOT NULL,
   module_code TEXT NOT NULL,
-  json_doc    TEXT NOT NULL,
-  xml_doc     TEXT NOT NULL,
+  json_doc    TEXT NOT NULL,                    -- TEXT, or compressed BLOB when codec <> 'identity'
+  xml_doc     TEXT NOT NULL,                    -- '' when the ETL ran with STORE_XML = False
   generated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  codec       TEXT NOT NULL DEFAULT 'identity',  -- 'identity' | 'zlib' | 'zstd' (backend/report_codec.py)
+  doc_hash    TEXT,                             -- set: documents are in ecs_rpt_doc_blobs (json_doc = xml_doc = '')
   PRIMARY KEY (run_id, customer_id, module_code),
   FOREIGN KEY (run_id) REFERENCES ecs_rpt_runs(run_id) ON DELETE CASCADE,
   FOREIGN KEY (module_code) REFERENCES ecs_rpt_modules(module_code)
 );
 
-CREATE INDEX IF NOT EXISTS idx_crm_customer ON ecs_customer_rpt_modules(customer_id);
+-- Covering index for the API's module endpoints: the customer's latest run and the modules
+-- it has, without reading document pages (supersedes idx_crm_customer(customer_id))
+DROP INDEX IF EXISTS idx_crm_customer;
+CREATE INDEX IF NOT EXISTS idx_crm_customer_run ON ecs_customer_rpt_modules(customer_id, run_id, module_code);
 
 CREATE TABLE IF NOT EXISTS ecs_customer_rpt (
   run_id      INTEGER NOT NULL,
   customer_id INTEGER NOT NULL,
-  json_doc    TEXT NOT NULL,
-  xml_doc     TEXT NOT NULL,
+  json_doc    TEXT NOT NULL,                    -- TEXT, or compressed BLOB when codec <> 'identity'
+  xml_doc     TEXT NOT NULL,                    -- '' when the ETL ran with STORE_XML = False
   generated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  codec       TEXT NOT NULL DEFAULT 'identity',  -- 'identity' | 'zlib' | 'zstd' (backend/report_codec.py)
+  doc_hash    TEXT,                             -- set: documents are in ecs_rpt_doc_blobs (json_doc = xml_doc = '')
+  json_bytes  INTEGER,                          -- UTF-8 size of the decoded json_doc (NULL: written before sizes)
+  xml_bytes   INTEGER,                          -- same for xml_doc; also NULL when the ETL ran with STORE_XML = False
   PRIMARY KEY (run_id, customer_id),
   FOREIGN KEY (run_id) REFERENCES ecs_rpt_runs(run_id) ON DELETE CASCADE
 );
 
-CREATE INDEX IF NOT EXISTS idx_cr_unified_customer ON ecs_customer_rpt(customer_id);
+-- Covering index for the latest report per customer, the API's ETag checks and the report
+-- listing (run, generated_at, sizes), which then read no document pages
+-- (supersedes idx_cr_unified_customer(customer_id) and idx_cr_customer_run)
+DROP INDEX IF EXISTS idx_cr_unified_customer;
+DROP INDEX IF EXISTS idx_cr_customer_run;
+CREATE INDEX IF NOT EXISTS idx_cr_customer_listing
+  ON ecs_customer_rpt(customer_id, run_id, generated_at, codec, json_bytes, xml_bytes);
+
+-- Content-addressed document bodies (DEDUP_DOCS, backend/report_store.py): the payload JSON
+-- and the XML after the root start tag, without the run-varying envelope; codec as above.
+-- Blobs no report row points to any more can be removed with:
+--   DELETE FROM ecs_rpt_doc_blobs WHERE doc_hash NOT IN (
+--     SELECT doc_hash FROM ecs_customer_rpt_modules WHERE doc_hash IS NOT NULL
+--     UNION SELECT doc_hash FROM ecs_customer_rpt WHERE doc_hash IS NOT NULL);
+CREATE TABLE IF NOT EXISTS ecs_rpt_doc_blobs (
+  doc_hash   TEXT PRIMARY KEY,                  -- sha256 of the bodies
+  json_doc   TEXT NOT NULL,
+  xml_doc    TEXT NOT NULL,
+  codec      TEXT NOT NULL DEFAULT 'identity',
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Restart checkpoints (ecs_rpt_checkpoints) are created by the ETLs on start-up, from
+-- backend/report_checkpoints.py
 
 
 SELECT name FROM sqlite_master
@@ -70,7 +102,26 @@ VALUES (date('now'), 'RUNNING', 'Customer modular reports');
 
 SELECT last_insert_rowid() AS run_id;
 
-DELETE FROM ecs_customer_rpt_modules;
+-- Module rows of older runs. Kept: the latest run with module rows (INCREMENTAL runs of
+-- etl_customer_reports.py carry unchanged documents forward from it) and the latest run
+-- with unified reports (the API's module endpoints serve it until this run's unified
+-- stage has finished).
+DELETE FROM ecs_customer_rpt_modules
+WHERE run_id < (
+  SELECT MIN(run_id) FROM (
+    SELECT MAX(run_id) AS run_id FROM ecs_customer_rpt_modules
+    UNION ALL
+    SELECT MAX(run_id) FROM ecs_customer_rpt
+  )
+);
+
+-- Batch ETL lookups (party -> accounts, per-key top-N windows); also created by etl_customer_reports.py on start-up
+CREATE INDEX IF NOT EXISTS idx_account_holders_party ON ecs_account_holders(party_id, account_id);
+CREATE INDEX IF NOT EXISTS idx_postings_account_ts ON ecs_account_postings(account_id, posting_ts DESC);
+CREATE INDEX IF NOT EXISTS idx_fees_account_ts ON ecs_fees_applied(account_id, applied_at DESC);
+CREATE INDEX IF NOT EXISTS idx_auth_card_status_ts ON ecs_card_authorizations(card_id, status, auth_ts DESC);
+CREATE INDEX IF NOT EXISTS idx_loan_payments_loan_ts ON ecs_loan_payments(loan_id, paid_at DESC);
+CREATE INDEX IF NOT EXISTS idx_flags_party_status_ts ON ecs_compliance_flags(party_id, status, created_at DESC);
 
 CREATE TABLE IF NOT EXISTS ecs_rpt_customer_worklist (
   customer_id INTEGER PRIMARY KEY,
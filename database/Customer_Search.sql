@@ -0,0 +1,158 @@
+-- Customer search index (GET /api/customers/search in backend/api_server.py)
+--
+-- One FTS5 row per customer (rowid = customer_id) with everything an employee searches
+-- by: names, email, contact values, account numbers and ID document numbers. Parties,
+-- contacts and ID documents belong to the customer whose customer_id equals their
+-- party_id. prefix = '2 3 4' keeps short prefix queries ("jo*", "acc*") on one doclist
+-- each instead of merging every matching term.
+--
+-- The triggers below keep it current: any tracked write rebuilds the affected customer's
+-- row through v_customer_search_refresh. Re-running this file rebuilds the whole index
+-- (the bulk load at the end), e.g. after loading data with the triggers absent.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ecs_customer_search USING fts5(
+  name,
+  email,
+  contacts,
+  accounts,
+  documents,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3 4'
+);
+
+-- ID documents by party (the table only has UNIQUE(doc_type, doc_number))
+CREATE INDEX IF NOT EXISTS idx_party_id_documents_party ON ecs_party_id_documents(party_id);
+
+-- Write-only entry point used by the source triggers below
+CREATE VIEW IF NOT EXISTS v_customer_search_refresh
+AS
+  SELECT customer_id FROM ecs_customers WHERE 0;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_refresh
+INSTEAD OF INSERT ON v_customer_search_refresh
+FOR EACH ROW WHEN NEW.customer_id IS NOT NULL
+BEGIN
+  DELETE FROM ecs_customer_search WHERE rowid = NEW.customer_id;
+  INSERT INTO ecs_customer_search(rowid, name, email, contacts, accounts, documents)
+  SELECT c.customer_id,
+         c.first_name || ' ' || c.last_name
+           || coalesce(' ' || (SELECT p.full_name FROM ecs_parties p WHERE p.party_id = c.customer_id), ''),
+         c.email,
+         (SELECT group_concat(pc.value, ' ') FROM ecs_party_contacts pc WHERE pc.party_id = c.customer_id),
+         (SELECT group_concat(a.account_number, ' ') FROM ecs_accounts a WHERE a.customer_id = c.customer_id),
+         (SELECT group_concat(d.doc_number, ' ') FROM ecs_party_id_documents d WHERE d.party_id = c.customer_id)
+  FROM ecs_customers c
+  WHERE c.customer_id = NEW.customer_id;
+END;
+
+-- Customers
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_customers_ins AFTER INSERT ON ecs_customers
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (NEW.customer_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_customers_upd
+AFTER UPDATE OF customer_id, first_name, last_name, email ON ecs_customers
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.customer_id);
+  INSERT INTO v_customer_search_refresh VALUES (NEW.customer_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_customers_del AFTER DELETE ON ecs_customers
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.customer_id);
+END;
+
+-- Parties
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_parties_ins AFTER INSERT ON ecs_parties
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (NEW.party_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_parties_upd
+AFTER UPDATE OF party_id, full_name ON ecs_parties
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.party_id);
+  INSERT INTO v_customer_search_refresh VALUES (NEW.party_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_parties_del AFTER DELETE ON ecs_parties
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.party_id);
+END;
+
+-- Contacts
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_contacts_ins AFTER INSERT ON ecs_party_contacts
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (NEW.party_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_contacts_upd
+AFTER UPDATE OF party_id, value ON ecs_party_contacts
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.party_id);
+  INSERT INTO v_customer_search_refresh VALUES (NEW.party_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_contacts_del AFTER DELETE ON ecs_party_contacts
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.party_id);
+END;
+
+-- Accounts
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_accounts_ins AFTER INSERT ON ecs_accounts
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (NEW.customer_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_accounts_upd
+AFTER UPDATE OF customer_id, account_number ON ecs_accounts
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.customer_id);
+  INSERT INTO v_customer_search_refresh VALUES (NEW.customer_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_accounts_del AFTER DELETE ON ecs_accounts
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.customer_id);
+END;
+
+-- ID documents
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_id_documents_ins AFTER INSERT ON ecs_party_id_documents
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (NEW.party_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_id_documents_upd
+AFTER UPDATE OF party_id, doc_number ON ecs_party_id_documents
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.party_id);
+  INSERT INTO v_customer_search_refresh VALUES (NEW.party_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_customer_search_id_documents_del AFTER DELETE ON ecs_party_id_documents
+BEGIN
+  INSERT INTO v_customer_search_refresh VALUES (OLD.party_id);
+END;
+
+-- Bulk (re)load: one pass per source table instead of one trigger call per customer
+DELETE FROM ecs_customer_search;
+
+INSERT INTO ecs_customer_search(rowid, name, email, contacts, accounts, documents)
+SELECT c.customer_id,
+       c.first_name || ' ' || c.last_name || coalesce(' ' || p.full_name, ''),
+       c.email,
+       pc.contacts,
+       a.accounts,
+       d.documents
+FROM ecs_customers c
+LEFT JOIN ecs_parties p ON p.party_id = c.customer_id
+LEFT JOIN (SELECT party_id, group_concat(value, ' ') AS contacts
+           FROM ecs_party_contacts GROUP BY party_id) pc ON pc.party_id = c.customer_id
+LEFT JOIN (SELECT customer_id, group_concat(account_number, ' ') AS accounts
+           FROM ecs_accounts GROUP BY customer_id) a ON a.customer_id = c.customer_id
+LEFT JOIN (SELECT party_id, group_concat(doc_number, ' ') AS documents
+           FROM ecs_party_id_documents GROUP BY party_id) d ON d.party_id = c.customer_id
+ORDER BY c.customer_id;
+
+INSERT INTO ecs_customer_search(ecs_customer_search) VALUES ('optimize');
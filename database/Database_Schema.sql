@@ -0,0 +1,533 @@
+-- Core banking schema (ecs_*), net of Database_Setup.sql, DB_Upgrade_Phases.sql,
+-- DB_Upgrade_Phases_V2.sql and Views.sql: every table in its final shape (columns added
+-- by ALTER TABLE included), without the seed data and the walkthrough statements.
+-- Login tables: backend/sql/001_auth.sql. Report tables: Customer_Report_ETL.sql.
+--
+-- backend/gen_synthetic_db.py creates the tables, bulk-loads them and only then runs the
+-- part after the "-- Post-load" marker (indexes, views, triggers), so the load does not
+-- maintain secondary indexes row by row. Run top to bottom it is a plain empty schema.
+
+-- Reference data
+CREATE TABLE IF NOT EXISTS ecs_currencies (
+  currency_code TEXT PRIMARY KEY,            -- e.g. 'EUR'
+  name          TEXT NOT NULL,
+  symbol        TEXT NOT NULL,
+  minor_unit    INTEGER NOT NULL DEFAULT 2   -- decimals
+);
+
+CREATE TABLE IF NOT EXISTS ecs_branches (
+  branch_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+  code        TEXT NOT NULL UNIQUE,
+  name        TEXT NOT NULL,
+  city        TEXT NOT NULL,
+  created_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ecs_employees (
+  employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  branch_id   INTEGER NOT NULL,
+  full_name   TEXT NOT NULL,
+  role        TEXT NOT NULL CHECK (role IN ('TELLER','MANAGER','BACKOFFICE')),
+  status      TEXT NOT NULL DEFAULT 'ACTIVE' CHECK (status IN ('ACTIVE','SUSPENDED','LEFT')),
+  hired_at    DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (branch_id) REFERENCES ecs_branches(branch_id)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_deposit_products (
+  product_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+  code            TEXT NOT NULL UNIQUE,
+  name            TEXT NOT NULL,
+  currency_code   TEXT NOT NULL,
+  overdraft_allowed INTEGER NOT NULL DEFAULT 0 CHECK (overdraft_allowed IN (0,1)),
+  overdraft_limit REAL NOT NULL DEFAULT 0.0,
+  FOREIGN KEY (currency_code) REFERENCES ecs_currencies(currency_code)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_gl_accounts (
+  gl_account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  code          TEXT NOT NULL UNIQUE,           -- e.g. 1010
+  name          TEXT NOT NULL,
+  type          TEXT NOT NULL CHECK (type IN ('ASSET','LIABILITY','INCOME','EXPENSE','EQUITY')),
+  currency_code TEXT NOT NULL,
+  FOREIGN KEY (currency_code) REFERENCES ecs_currencies(currency_code)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_loan_products (
+  loan_product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  code            TEXT NOT NULL UNIQUE,
+  name            TEXT NOT NULL,
+  apr             REAL NOT NULL CHECK (apr >= 0),    -- annual percentage rate
+  term_months     INTEGER NOT NULL CHECK (term_months > 0)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_fee_types (
+  fee_type_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  code        TEXT NOT NULL UNIQUE,
+  name        TEXT NOT NULL,
+  amount      REAL NOT NULL CHECK (amount >= 0)
+);
+
+-- Customers and parties (party_id = customer_id)
+CREATE TABLE IF NOT EXISTS ecs_customers (
+  customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  first_name  TEXT NOT NULL,
+  last_name   TEXT NOT NULL,
+  email       TEXT UNIQUE NOT NULL,
+  created_at  DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ecs_parties (
+  party_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  party_type   TEXT NOT NULL CHECK (party_type IN ('PERSON','BUSINESS')),
+  full_name    TEXT NOT NULL,
+  created_at   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  status       TEXT NOT NULL DEFAULT 'ACTIVE' CHECK (status IN ('ACTIVE','BLOCKED','CLOSED'))
+);
+
+CREATE TABLE IF NOT EXISTS ecs_person_details (
+  party_id      INTEGER PRIMARY KEY,
+  first_name    TEXT NOT NULL,
+  last_name     TEXT NOT NULL,
+  date_of_birth DATE,
+  tax_id        TEXT,
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ecs_addresses (
+  address_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+  line1       TEXT NOT NULL,
+  line2       TEXT,
+  city        TEXT NOT NULL,
+  region      TEXT,
+  postal_code TEXT,
+  country     TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ecs_party_addresses (
+  party_id    INTEGER NOT NULL,
+  address_id  INTEGER NOT NULL,
+  addr_type   TEXT NOT NULL CHECK (addr_type IN ('HOME','WORK','MAILING')),
+  is_primary  INTEGER NOT NULL DEFAULT 0 CHECK (is_primary IN (0,1)),
+  PRIMARY KEY (party_id, address_id),
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id) ON DELETE CASCADE,
+  FOREIGN KEY (address_id) REFERENCES ecs_addresses(address_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ecs_party_contacts (
+  contact_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  party_id   INTEGER NOT NULL,
+  type       TEXT NOT NULL CHECK (type IN ('EMAIL','PHONE')),
+  value      TEXT NOT NULL,
+  is_primary INTEGER NOT NULL DEFAULT 0 CHECK (is_primary IN (0,1)),
+  UNIQUE(party_id, type, value),
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ecs_party_id_documents (
+  doc_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  party_id   INTEGER NOT NULL,
+  doc_type   TEXT NOT NULL CHECK (doc_type IN ('PASSPORT','NATIONAL_ID','DRIVER_LICENSE')),
+  doc_number TEXT NOT NULL,
+  issued_by  TEXT,
+  expires_on DATE,
+  UNIQUE(doc_type, doc_number),
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id) ON DELETE CASCADE
+);
+
+-- Accounts (brach_id: column name as created by DB_Upgrade_Phases.sql)
+CREATE TABLE IF NOT EXISTS ecs_accounts (
+  account_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  customer_id    INTEGER NOT NULL,
+  account_type   TEXT NOT NULL CHECK (account_type IN ('CHECKING', 'SAVINGS')),
+  balance        REAL NOT NULL DEFAULT 0.0,
+  created_at     DATETIME DEFAULT CURRENT_TIMESTAMP,
+  account_number TEXT,
+  brach_id       INTEGER,
+  product_id     INTEGER,
+  status         TEXT NOT NULL DEFAULT 'OPEN' CHECK (status IN ('OPEN','FROZEN','CLOSED')),
+  FOREIGN KEY (customer_id)
+      REFERENCES ecs_customers(customer_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ecs_account_holders (
+  account_id   INTEGER NOT NULL,
+  party_id     INTEGER NOT NULL,
+  role         TEXT NOT NULL CHECK (role IN ('PRIMARY','JOINT','AUTHORIZED')),
+  added_at     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (account_id, party_id),
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id) ON DELETE CASCADE,
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id) ON DELETE CASCADE
+);
+
+-- Legacy transaction log (ecs_accounts.balance is its running total)
+CREATE TABLE IF NOT EXISTS ecs_transactions (
+  transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  account_id     INTEGER NOT NULL,
+  txn_type       TEXT NOT NULL CHECK (txn_type IN ('DEPOSIT','WITHDRAWAL')),
+  amount         REAL NOT NULL CHECK (amount > 0),
+  txn_ts         DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  description    TEXT,
+  transfer_id    TEXT,
+  FOREIGN KEY (account_id)
+    REFERENCES ecs_accounts(account_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ecs_transaction_audit (
+  audit_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+  transaction_id INTEGER NOT NULL,
+  action         TEXT NOT NULL,                 -- 'INSERT'
+  audit_ts       DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Double-entry ledger: GL lines plus customer postings per journal entry
+CREATE TABLE IF NOT EXISTS ecs_journal_entries (
+  entry_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  entry_ts     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  source       TEXT NOT NULL,                   -- 'DEPOSIT','WITHDRAWAL','TRANSFER','FEE','LOAN','CARD'
+  reference    TEXT,                            -- external reference / correlation id
+  status       TEXT NOT NULL DEFAULT 'POSTED' CHECK (status IN ('POSTED','REVERSED')),
+  memo         TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ecs_ledger_lines (
+  line_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+  entry_id     INTEGER NOT NULL,
+  account_id   INTEGER,                         -- customer account (sub-ledger)
+  gl_account_id INTEGER,                        -- GL account
+  currency_code TEXT NOT NULL,
+  debit        REAL NOT NULL DEFAULT 0.0 CHECK (debit >= 0),
+  credit       REAL NOT NULL DEFAULT 0.0 CHECK (credit >= 0),
+  description  TEXT,
+  CHECK (NOT (debit > 0 AND credit > 0)),
+  CHECK (debit > 0 OR credit > 0),
+  FOREIGN KEY (entry_id) REFERENCES ecs_journal_entries(entry_id) ON DELETE CASCADE,
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id),
+  FOREIGN KEY (gl_account_id) REFERENCES ecs_gl_accounts(gl_account_id),
+  FOREIGN KEY (currency_code) REFERENCES ecs_currencies(currency_code)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_account_postings (
+  posting_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+  entry_id     INTEGER NOT NULL,
+  account_id   INTEGER NOT NULL,
+  currency_code TEXT NOT NULL,
+  amount       REAL NOT NULL,                 -- +in, -out (customer perspective)
+  posting_ts   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  description  TEXT,
+  FOREIGN KEY (entry_id) REFERENCES ecs_journal_entries(entry_id) ON DELETE CASCADE,
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id),
+  FOREIGN KEY (currency_code) REFERENCES ecs_currencies(currency_code)
+);
+
+-- Cards
+CREATE TABLE IF NOT EXISTS ecs_cards (
+  card_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  account_id  INTEGER NOT NULL,
+  pan_last4   TEXT NOT NULL,
+  card_type   TEXT NOT NULL CHECK (card_type IN ('DEBIT')),
+  status      TEXT NOT NULL DEFAULT 'ACTIVE' CHECK (status IN ('ACTIVE','BLOCKED','EXPIRED','CLOSED')),
+  issued_at   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  expires_on  DATE,
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_card_authorizations (
+  auth_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  card_id     INTEGER NOT NULL,
+  account_id  INTEGER NOT NULL,
+  amount      REAL NOT NULL CHECK (amount > 0),
+  merchant    TEXT NOT NULL,
+  auth_ts     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  status      TEXT NOT NULL DEFAULT 'APPROVED'
+              CHECK (status IN ('APPROVED','REVERSED','EXPIRED','CAPTURED')),
+  reference   TEXT NOT NULL UNIQUE,
+  FOREIGN KEY (card_id) REFERENCES ecs_cards(card_id),
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_card_settlements (
+  settlement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  auth_id       INTEGER NOT NULL UNIQUE,
+  entry_id      INTEGER NOT NULL UNIQUE,
+  settled_ts    DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (auth_id) REFERENCES ecs_card_authorizations(auth_id),
+  FOREIGN KEY (entry_id) REFERENCES ecs_journal_entries(entry_id)
+);
+
+-- Loans
+CREATE TABLE IF NOT EXISTS ecs_loans (
+  loan_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+  party_id       INTEGER NOT NULL,
+  branch_id      INTEGER NOT NULL,
+  loan_product_id INTEGER NOT NULL,
+  principal      REAL NOT NULL CHECK (principal > 0),
+  apr            REAL NOT NULL CHECK (apr >= 0),
+  term_months    INTEGER NOT NULL CHECK (term_months > 0),
+  status         TEXT NOT NULL DEFAULT 'ACTIVE' CHECK (status IN ('PENDING','ACTIVE','CLOSED','DEFAULT')),
+  originated_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id),
+  FOREIGN KEY (branch_id) REFERENCES ecs_branches(branch_id),
+  FOREIGN KEY (loan_product_id) REFERENCES ecs_loan_products(loan_product_id)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_loan_schedule (
+  schedule_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+  loan_id       INTEGER NOT NULL,
+  installment_no INTEGER NOT NULL,
+  due_date      DATE NOT NULL,
+  due_principal REAL NOT NULL DEFAULT 0 CHECK (due_principal >= 0),
+  due_interest  REAL NOT NULL DEFAULT 0 CHECK (due_interest >= 0),
+  status        TEXT NOT NULL DEFAULT 'DUE' CHECK (status IN ('DUE','PAID')),
+  UNIQUE(loan_id, installment_no),
+  FOREIGN KEY (loan_id) REFERENCES ecs_loans(loan_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ecs_loan_payments (
+  payment_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+  loan_id      INTEGER NOT NULL,
+  entry_id     INTEGER NOT NULL UNIQUE,
+  paid_at      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  amount       REAL NOT NULL CHECK (amount > 0),
+  FOREIGN KEY (loan_id) REFERENCES ecs_loans(loan_id),
+  FOREIGN KEY (entry_id) REFERENCES ecs_journal_entries(entry_id)
+);
+
+-- Fees and compliance
+CREATE TABLE IF NOT EXISTS ecs_fees_applied (
+  fee_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  fee_type_id INTEGER NOT NULL,
+  account_id INTEGER NOT NULL,
+  entry_id   INTEGER NOT NULL UNIQUE,
+  applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (fee_type_id) REFERENCES ecs_fee_types(fee_type_id),
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id),
+  FOREIGN KEY (entry_id) REFERENCES ecs_journal_entries(entry_id)
+);
+
+CREATE TABLE IF NOT EXISTS ecs_compliance_flags (
+  flag_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+  party_id    INTEGER,
+  account_id  INTEGER,
+  severity    TEXT NOT NULL CHECK (severity IN ('LOW','MEDIUM','HIGH')),
+  category    TEXT NOT NULL,   -- e.g. 'KYC','AML','FRAUD'
+  note        TEXT,
+  created_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  status      TEXT NOT NULL DEFAULT 'OPEN' CHECK (status IN ('OPEN','RESOLVED')),
+  FOREIGN KEY (party_id) REFERENCES ecs_parties(party_id),
+  FOREIGN KEY (account_id) REFERENCES ecs_accounts(account_id)
+);
+
+-- Post-load: indexes, views, triggers
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_account_number ON ecs_accounts(account_number);
+CREATE INDEX IF NOT EXISTS idx_accounts_customer_id ON ecs_accounts(customer_id);
+CREATE INDEX IF NOT EXISTS idx_customers_name ON ecs_customers(last_name, first_name);
+CREATE INDEX IF NOT EXISTS idx_employees_branch ON ecs_employees(branch_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_ts ON ecs_transactions(account_id, txn_ts);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_id ON ecs_transactions(account_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_transfer_id ON ecs_transactions(transfer_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_lines_entry ON ecs_ledger_lines(entry_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_lines_account ON ecs_ledger_lines(account_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_lines_gl ON ecs_ledger_lines(gl_account_id);
+CREATE INDEX IF NOT EXISTS idx_postings_account ON ecs_account_postings(account_id);
+CREATE INDEX IF NOT EXISTS idx_postings_entry ON ecs_account_postings(entry_id);
+CREATE INDEX IF NOT EXISTS idx_cards_account ON ecs_cards(account_id);
+CREATE INDEX IF NOT EXISTS idx_auth_account_status ON ecs_card_authorizations(account_id, status);
+CREATE INDEX IF NOT EXISTS idx_auth_card ON ecs_card_authorizations(card_id);
+CREATE INDEX IF NOT EXISTS idx_loans_party ON ecs_loans(party_id);
+CREATE INDEX IF NOT EXISTS idx_loan_schedule_loan ON ecs_loan_schedule(loan_id);
+CREATE INDEX IF NOT EXISTS idx_loan_payments_loan ON ecs_loan_payments(loan_id);
+CREATE INDEX IF NOT EXISTS idx_fees_account ON ecs_fees_applied(account_id);
+CREATE INDEX IF NOT EXISTS idx_flags_party ON ecs_compliance_flags(party_id);
+CREATE INDEX IF NOT EXISTS idx_flags_account ON ecs_compliance_flags(account_id);
+
+CREATE VIEW IF NOT EXISTS v_account_balances
+AS
+  SELECT a.account_id,
+         a.account_number,
+         dp.currency_code,
+         ROUND(COALESCE(SUM(p.amount),0), 2) AS balance,
+         CASE WHEN (p.entry_id IS NULL OR je.status='POSTED') THEN 'YES' ELSE 'NO' END AS Verdict
+    FROM ecs_accounts a
+    LEFT JOIN ecs_deposit_products dp ON dp.product_id = a.product_id
+    LEFT JOIN ecs_account_postings p ON p.account_id = a.account_id
+    LEFT JOIN ecs_journal_entries je ON je.entry_id = p.entry_id AND je.status='POSTED'
+   GROUP BY a.account_id;
+
+CREATE VIEW IF NOT EXISTS v_account_available
+AS
+  SELECT b.account_id,
+         b.account_number,
+         b.balance,
+         ROUND(   b.balance
+                - COALESCE(( SELECT SUM(a.amount)
+                               FROM ecs_card_authorizations a
+                              WHERE a.account_id = b.account_id
+                                AND a.status = 'APPROVED' ),0), 2
+         ) AS available
+    FROM v_account_balances b;
+
+CREATE VIEW IF NOT EXISTS v_customer_summary
+AS
+SELECT c.customer_id,
+       c.first_name,
+       c.last_name,
+       c.email,
+       COUNT(a.account_id) AS accounts_count,
+       ROUND(COALESCE(SUM(a.balance),0), 2) AS total_balance
+  FROM ecs_customers c
+  LEFT JOIN ecs_accounts a ON a.customer_id = c.customer_id
+ GROUP BY c.customer_id;
+
+CREATE VIEW IF NOT EXISTS v_account_statement
+AS
+  SELECT a.account_id,
+         a.account_number,
+         t.transaction_id,
+         t.txn_ts,
+         t.txn_type,
+         t.amount,
+         t.transfer_id,
+         t.description
+    FROM ecs_accounts a
+    JOIN ecs_transactions t ON t.account_id = a.account_id;
+
+CREATE VIEW IF NOT EXISTS v_transfer_intergrity
+AS
+  WITH x AS ( SELECT transfer_id, COUNT(*) AS legs, ROUND(SUM(CASE txn_type WHEN 'DEPOSIT' THEN amount ELSE -amount END), 6) AS net, MIN(amount) AS min_amt, MAX(amount) AS max_amt
+                FROM ecs_transactions
+               WHERE transfer_id IS NOT NULL
+               GROUP BY transfer_id )
+  SELECT *, CASE WHEN legs <> 2 OR net <> 0 OR min_amt <> max_amt THEN 'BAD' ELSE 'GOOD' END as IntCheck
+    FROM x
+   ORDER BY transfer_id DESC
+   LIMIT 100;
+
+CREATE VIEW IF NOT EXISTS v_mismatch_finder
+AS
+  SELECT a.account_id,
+         a.balance AS stored_balance,
+         ROUND(( SELECT COALESCE(SUM(CASE txn_type WHEN 'DEPOSIT' THEN amount ELSE -amount END), 0.0)
+                   FROM ecs_transactions t
+                  WHERE t.account_id = a.account_id ), 2) AS computed_balance,
+         CASE
+           WHEN ROUND(a.balance, 2) <> ROUND(( SELECT COALESCE(SUM(CASE txn_type WHEN 'DEPOSIT' THEN amount ELSE -amount END), 0.0)
+                                                 FROM ecs_transactions t
+                                                WHERE t.account_id = a.account_id ), 2) THEN
+             'ERROR'
+           ELSE
+             'GOOD'
+         END as MisMatch
+    FROM ecs_accounts a;
+
+CREATE TRIGGER IF NOT EXISTS trg_accounts_no_negative_balance
+BEFORE UPDATE OF balance ON ecs_accounts
+FOR EACH ROW
+WHEN NEW.balance < 0
+BEGIN
+  SELECT RAISE(ABORT, 'Insufficient funds: balance cannot go negative');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_transactions_audit_insert
+AFTER INSERT ON ecs_transactions
+FOR EACH ROW
+BEGIN
+  INSERT INTO ecs_transaction_audit (transaction_id, action) VALUES (NEW.transaction_id, 'INSERT');
+END;
+
+-- Database_Setup.sql reads `FROM transactions` here, which fails every insert with a transfer_id
+CREATE TRIGGER IF NOT EXISTS trg_no_self_transfer
+BEFORE INSERT ON ecs_transactions
+FOR EACH ROW
+  WHEN     NEW.transfer_id IS NOT NULL
+       AND EXISTS ( SELECT 1
+                      FROM ecs_transactions t
+                     WHERE t.transfer_id = NEW.transfer_id
+                       AND t.account_id = NEW.account_id )
+BEGIN
+  SELECT RAISE(ABORT, 'Invalid transfer: duplicate leg for same account');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posting_requires_balance
+BEFORE UPDATE OF status ON ecs_journal_entries
+FOR EACH ROW WHEN NEW.status = 'POSTED'
+BEGIN
+  SELECT CASE
+           WHEN ( SELECT ROUND(COALESCE(SUM(debit), 0) - COALESCE(SUM(credit), 0), 6)
+                    FROM ecs_ledger_lines
+                   WHERE entry_id = NEW.entry_id ) <> 0.0 THEN
+             RAISE(ABORT, 'Cannot POST: journal entry not balanced')
+         END;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_overdraft_on_post
+BEFORE UPDATE OF status ON ecs_journal_entries
+FOR EACH ROW WHEN NEW.status='POSTED'
+BEGIN
+  SELECT CASE
+           WHEN EXISTS ( SELECT 1
+                           FROM ecs_account_postings ap
+                           JOIN ecs_accounts a ON a.account_id = ap.account_id
+                           JOIN ecs_deposit_products dp ON dp.product_id = a.product_id
+                          WHERE ap.entry_id = NEW.entry_id
+                            AND (   ( SELECT COALESCE(SUM(p.amount),0)
+                                        FROM ecs_account_postings p
+                                        JOIN ecs_journal_entries j ON j.entry_id = p.entry_id
+                                       WHERE p.account_id = ap.account_id AND j.status='POSTED' )
+                                  + ( SELECT COALESCE(SUM(p2.amount),0)
+                                        FROM ecs_account_postings p2
+                                       WHERE p2.entry_id = NEW.entry_id AND p2.account_id = ap.account_id )
+                                  < -(CASE WHEN dp.overdraft_allowed=1 THEN dp.overdraft_limit ELSE 0 END))) THEN
+             RAISE(ABORT, 'Insufficient funds: overdraft limit exceeded')
+           END;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_delete_posted_entries
+BEFORE DELETE ON ecs_journal_entries
+FOR EACH ROW WHEN OLD.status = 'POSTED'
+BEGIN
+  SELECT RAISE(ABORT, 'Cannot delete POSTED journal entry');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_update_posted_entries
+BEFORE UPDATE ON ecs_journal_entries
+FOR EACH ROW WHEN OLD.status = 'POSTED'
+BEGIN
+  SELECT RAISE(ABORT, 'Cannot update POSTED journal entry');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_delete_posted_ledger_lines
+BEFORE DELETE ON ecs_ledger_lines
+FOR EACH ROW WHEN ( SELECT status
+                      FROM ecs_journal_entries
+                     WHERE entry_id = OLD.entry_id )= 'POSTED'
+BEGIN
+  SELECT RAISE(ABORT, 'Cannot delete ledger line of POSTED entry');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_update_posted_ledger_lines
+BEFORE UPDATE ON ecs_ledger_lines
+FOR EACH ROW WHEN ( SELECT status
+                      FROM ecs_journal_entries
+                     WHERE entry_id = OLD.entry_id )= 'POSTED'
+BEGIN
+  SELECT RAISE(ABORT, 'Cannot update ledger line of POSTED entry');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_delete_posted_account_postings
+BEFORE DELETE ON ecs_account_postings
+FOR EACH ROW WHEN ( SELECT status
+                      FROM ecs_journal_entries
+                     WHERE entry_id = OLD.entry_id )= 'POSTED'
+BEGIN
+  SELECT RAISE(ABORT, 'Cannot delete account posting of POSTED entry');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_no_update_posted_account_postings
+BEFORE UPDATE ON ecs_account_postings
+FOR EACH ROW WHEN ( SELECT status
+                      FROM ecs_journal_entries
+                     WHERE entry_id = OLD.entry_id )= 'POSTED'
+BEGIN
+  SELECT RAISE(ABORT, 'Cannot update account posting of POSTED entry');
+END;
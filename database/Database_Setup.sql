@@ -285,6 +285,31 @@ CREATE TABLE IF NOT EXISTS ecs_users (
 CREATE INDEX IF NOT EXISTS idx_ecs_users_role ON ecs_users(role);
 CREATE INDEX IF NOT EXISTS idx_ecs_users_customer_id ON ecs_users(customer_id);
 
+-- Principal change counter: bumped whenever a change can affect an authenticated user
+-- (role, customer_id, is_active, or the row being deleted). The API server caches
+-- principals for a short TTL and drops its cache as soon as it sees the counter move.
+CREATE TABLE IF NOT EXISTS ecs_users_version (
+  id      INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO ecs_users_version(id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_ecs_users_version_upd
+AFTER UPDATE OF role, customer_id, is_active ON ecs_users
+FOR EACH ROW WHEN OLD.role IS NOT NEW.role
+               OR OLD.customer_id IS NOT NEW.customer_id
+               OR OLD.is_active IS NOT NEW.is_active
+BEGIN
+  UPDATE ecs_users_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ecs_users_version_del
+AFTER DELETE ON ecs_users
+BEGIN
+  UPDATE ecs_users_version SET version = version + 1 WHERE id = 1;
+END;
+
 -- ecs_employees definition
 
 CREATE TABLE ecs_employees (
@@ -19,6 +19,7 @@
     const elPageSub = $("pageSub");
 
     // Customers list (employee only)
+    const elCustomerSearch = $("customerSearch");
     const elCustomerSelect = $("customerSelect");
     const elPrevCustomersBtn = $("prevCustomersBtn");
     const elNextCustomersBtn = $("nextCustomersBtn");
@@ -50,10 +51,30 @@
     let currentModule = "customer_reports"; // customer_reports | json_raw | xml_raw
     let currentReport = null;
 
-    // customers pagination (employee only)
+    // what extractReport() reads from a report row
+    const REPORT_FIELDS = "run_id,customer_id,generated_at,json_doc,xml_doc";
+
+    // A loaded report starts as its module list (json/xml null): the report view fetches
+    // each module's payload when its section is opened. The raw views, XML mode, downloads
+    // and print load the full unified report once (ensureFullReport). Without module rows
+    // the full report is loaded straight away (loadReport).
+    const MODULE_ORDER = [
+        "CUSTOMER_PROFILE", "COMPLIANCE", "ACCOUNTS", "CARDS", "LOANS", "FEES", "TRANSACTIONS"
+    ];
+
+    // customers pagination (employee only), keyset: the API returns next_cursor per page
     const PAGE_LIMIT = 1000;
-    let customersOffset = 0;
-    let lastPageSize = 0;
+    let customersCursor = null;      // cursor the current page was loaded with (null = first page)
+    let customersPrevCursors = [];   // cursors of the pages before it, for "Prev"
+    let customersNextCursor = null;  // null = no next page
+
+    // customer search (employee only): results replace the page in the select while the box
+    // has a query; clearing it goes back to the current page
+    const SEARCH_LIMIT = 20;
+    const SEARCH_MIN_CHARS = 2;
+    const SEARCH_DELAY_MS = 250;
+    let searchTimer = null;
+    let searchSeq = 0;               // only the latest request may render its results
 
     // -----------------------------
     // Helpers
@@ -101,7 +122,9 @@
 
         if (!res.ok) {
             const detail = await readErrorDetail(res);
-            throw new Error(`API ${res.status} ${res.statusText}: ${detail}`);
+            const err = new Error(`API ${res.status} ${res.statusText}: ${detail}`);
+            err.status = res.status;
+            throw err;
         }
 
         return res;
@@ -151,6 +174,61 @@
         };
     }
 
+    function extractModuleList(list) {
+        return {
+            runId: list?.run_id ?? null,
+            customerId: list?.customer_id != null ? String(list.customer_id) : "",
+            generatedAt: list?.generated_at != null ? String(list.generated_at) : "",
+            json: null,
+            xml: null,
+            modules: Array.isArray(list?.modules) ? list.modules : [],
+            moduleData: {},
+        };
+    }
+
+    // API paths of the loaded report, per role
+    function reportPaths(report) {
+        const run = encodeURIComponent(report.runId);
+        if (getStoredUser()?.role === "CUSTOMER") {
+            return {
+                module: (code) => `/customer/modules/${encodeURIComponent(code)}?run_id=${run}`,
+                full: `/customer/reports/${run}?fields=${REPORT_FIELDS}`,
+            };
+        }
+        const cid = encodeURIComponent(report.customerId);
+        return {
+            module: (code) => `/customers/${cid}/modules/${encodeURIComponent(code)}?run_id=${run}`,
+            full: `/customers/${cid}?run_id=${run}`,
+        };
+    }
+
+    // The module list, or the full unified report when there is none: a run that is being
+    // rebuilt can have no module rows yet for a customer whose unified report is served
+    async function loadReport(modulesPath, fullPath) {
+        try {
+            const res = await apiFetch(modulesPath);
+            return extractModuleList(await res.json());
+        } catch (e) {
+            if (e.status !== 404) throw e;
+        }
+        const res = await apiFetch(fullPath);
+        return extractReport(await res.json());
+    }
+
+    async function ensureFullReport() {
+        const report = currentReport;
+        if (!report || report.json != null) return;
+        setStatus("Loading full report...");
+        const res = await apiFetch(reportPaths(report).full);
+        const full = extractReport(await res.json());
+        // the user may have loaded another report meanwhile
+        if (currentReport === report) {
+            report.json = full.json;
+            report.xml = full.xml;
+            report.generatedAt = report.generatedAt || full.generatedAt;
+        }
+    }
+
     function setLabels(report) {
         if (elCustomerIdLabel) elCustomerIdLabel.textContent = report?.customerId ?? "-";
         if (elGeneratedAtLabel) elGeneratedAtLabel.textContent = report?.generatedAt ?? "-";
@@ -445,6 +523,14 @@
         }
     }
 
+    function sortModuleNames(names) {
+        return [...names].sort((a, b) => {
+            const ia = MODULE_ORDER.indexOf(String(a).toUpperCase());
+            const ib = MODULE_ORDER.indexOf(String(b).toUpperCase());
+            return (ia === -1 ? 999 : ia) - (ib === -1 ? 999 : ib);
+        });
+    }
+
     function renderReportLike(parsed) {
         const frag = document.createDocumentFragment();
 
@@ -455,20 +541,7 @@
 
         const modules = normalizeObject(modulesRaw);
 
-        const preferredOrder = [
-            "CUSTOMER_PROFILE", "COMPLIANCE", "ACCOUNTS", "CARDS", "LOANS", "FEES", "TRANSACTIONS"
-        ];
-
-        const names = Object.keys(modules);
-        names.sort((a, b) => {
-            const A = String(a).toUpperCase();
-            const B = String(b).toUpperCase();
-            const ia = preferredOrder.indexOf(A);
-            const ib = preferredOrder.indexOf(B);
-            return (ia === -1 ? 999 : ia) - (ib === -1 ? 999 : ib);
-        });
-
-        names.forEach((moduleName) => {
+        sortModuleNames(Object.keys(modules)).forEach((moduleName) => {
             const data = modules[moduleName];
             if (isEmptyVal(data)) return;
 
@@ -493,6 +566,51 @@
         return frag;
     }
 
+    function renderModuleBody(page, data) {
+        const body = document.createElement("div");
+        body.className = "module-body";
+        renderAny("", data, body);
+        if (!body.children.length) body.appendChild(h("div", "muted", "No data."));
+        page.appendChild(body);
+    }
+
+    async function openModule(report, code, page) {
+        if (page.dataset.loaded) return;
+        page.dataset.loaded = "1";
+        try {
+            if (!(code in report.moduleData)) {
+                const res = await apiFetch(`${reportPaths(report).module(code)}&path=${encodeURIComponent("$.payload")}`);
+                report.moduleData[code] = await res.json();
+            }
+            renderModuleBody(page, report.moduleData[code]);
+        } catch (e) {
+            delete page.dataset.loaded;
+            setError(String(e));
+        }
+    }
+
+    // one collapsed section per module; its payload is fetched when opened
+    function renderLazyModules(report) {
+        const frag = document.createDocumentFragment();
+
+        sortModuleNames(report.modules).forEach((code) => {
+            const page = document.createElement("details");
+            page.className = "module-page";
+
+            const head = document.createElement("summary");
+            head.className = "module-head";
+            head.appendChild(h("span", "module-title", titleize(code)));
+            page.appendChild(head);
+
+            page.addEventListener("toggle", () => {
+                if (page.open) openModule(report, code, page);
+            });
+            frag.appendChild(page);
+        });
+
+        return frag;
+    }
+
     // -----------------------------
     // UI switching + render pipeline
     // -----------------------------
@@ -517,6 +635,22 @@
             }
         }
 
+        show();
+    }
+
+    function needsFullReport() {
+        return currentModule !== "customer_reports" || currentMode !== "JSON";
+    }
+
+    // render(), after loading the full report when the current view needs it
+    async function show() {
+        try {
+            if (needsFullReport()) await ensureFullReport();
+        } catch (e) {
+            setStatus("");
+            setError(String(e));
+            return;
+        }
         render();
     }
 
@@ -561,6 +695,12 @@
         if (elNarrative) elNarrative.style.display = "";
         if (elRaw) elRaw.style.display = "none";
 
+        if (currentMode === "JSON" && currentReport.json == null) {
+            setStatus("JSON — open a section to load it.");
+            if (elNarrative) elNarrative.appendChild(renderLazyModules(currentReport));
+            return;
+        }
+
         if (currentMode === "JSON") {
             const parsed = safeJsonParse(currentReport.json);
             if (!parsed) {
@@ -624,29 +764,31 @@
     }
 
     function updatePagerButtons() {
-        if (elPrevCustomersBtn) elPrevCustomersBtn.disabled = customersOffset <= 0;
-        if (elNextCustomersBtn) elNextCustomersBtn.disabled = lastPageSize < PAGE_LIMIT;
+        if (elPrevCustomersBtn) elPrevCustomersBtn.disabled = customersPrevCursors.length === 0;
+        if (elNextCustomersBtn) elNextCustomersBtn.disabled = !customersNextCursor;
     }
 
-    async function loadCustomersPage(offset) {
+    async function loadCustomersPage(cursor) {
         setError("");
         setStatus("Loading customers list...");
 
         try {
-            const res = await apiFetch(`/customers?limit=${PAGE_LIMIT}&offset=${offset}`);
+            const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+            const res = await apiFetch(`/customers?limit=${PAGE_LIMIT}${query}`);
             const data = await res.json().catch(() => ({}));
             const items = Array.isArray(data.items) ? data.items : [];
-            lastPageSize = items.length;
-            customersOffset = offset;
+            customersCursor = cursor;
+            customersNextCursor = data.next_cursor || null;
 
             renderCustomerSelect(items);
             updatePagerButtons();
 
-            setStatus(`Customers loaded: ${items.length} (offset ${customersOffset}). Select one and click Load Report.`);
+            const page = customersPrevCursors.length + 1;
+            setStatus(`Customers loaded: ${items.length} (page ${page}). Select one and click Load Report.`);
         } catch (e) {
             // ✅ This is the important fix: show real backend error instead of pretending 0 customers
-            lastPageSize = 0;
-            customersOffset = offset;
+            customersCursor = cursor;
+            customersNextCursor = null;
             renderCustomerSelect([]);
             updatePagerButtons();
             setStatus("");
@@ -654,6 +796,50 @@
         }
     }
 
+    async function searchCustomers(q) {
+        const seq = ++searchSeq;
+        setError("");
+        setStatus("Searching customers...");
+
+        try {
+            const res = await apiFetch(`/customers/search?q=${encodeURIComponent(q)}&limit=${SEARCH_LIMIT}`);
+            const data = await res.json().catch(() => ({}));
+            if (seq !== searchSeq) return;
+            const items = Array.isArray(data.items) ? data.items : [];
+
+            renderCustomerSelect(items);
+            if (elPrevCustomersBtn) elPrevCustomersBtn.disabled = true;
+            if (elNextCustomersBtn) elNextCustomersBtn.disabled = true;
+
+            const more = items.length >= SEARCH_LIMIT ? " (first results, refine the search for more)" : "";
+            setStatus(`Matches for "${q}": ${items.length}${more}.`);
+        } catch (e) {
+            if (seq !== searchSeq) return;
+            renderCustomerSelect([]);
+            setStatus("");
+            setError(String(e));
+        }
+    }
+
+    function onSearchInput() {
+        clearTimeout(searchTimer);
+        const q = String(elCustomerSearch?.value || "").trim();
+        searchTimer = setTimeout(() => {
+            if (q.length >= SEARCH_MIN_CHARS) {
+                searchCustomers(q);
+            } else if (!q) {
+                searchSeq++;  // drop a search still in flight
+                loadCustomersPage(customersCursor);
+            }
+        }, SEARCH_DELAY_MS);
+    }
+
+    function reloadCustomers() {
+        const q = String(elCustomerSearch?.value || "").trim();
+        if (q.length >= SEARCH_MIN_CHARS) searchCustomers(q);
+        else loadCustomersPage(customersCursor);
+    }
+
     // -----------------------------
     // Loading
     // -----------------------------
@@ -672,12 +858,14 @@
         if (elSideCustomer) elSideCustomer.textContent = user.customer_id ?? "-";
 
         if (user.role === "CUSTOMER") {
+            if (elCustomerSearch) elCustomerSearch.style.display = "none";
             if (elCustomerSelect) elCustomerSelect.style.display = "none";
             if (elPrevCustomersBtn) elPrevCustomersBtn.style.display = "none";
             if (elNextCustomersBtn) elNextCustomersBtn.style.display = "none";
             if (elReloadBtn) elReloadBtn.style.display = "none";
 
             try {
+                // Summary listing (no documents), then the latest run's report
                 const res = await apiFetch("/customer/reports");
                 const rows = await res.json();
 
@@ -689,9 +877,14 @@
                     return;
                 }
 
-                currentReport = extractReport(rows[0]);
+                const runId = encodeURIComponent(rows[0].run_id);
+                currentReport = await loadReport(
+                    `/customer/modules?run_id=${runId}`,
+                    `/customer/reports/${runId}?fields=${REPORT_FIELDS}`
+                );
+                currentReport.generatedAt = currentReport.generatedAt || String(rows[0].generated_at ?? "");
+                await show();
                 setStatus("Loaded your latest report.");
-                render();
             } catch (e) {
                 setStatus("");
                 setError(String(e));
@@ -700,12 +893,17 @@
         }
 
         // EMPLOYEE / ADMIN:
+        if (elCustomerSearch) {
+            elCustomerSearch.style.display = "";
+            elCustomerSearch.value = "";
+        }
         if (elCustomerSelect) elCustomerSelect.style.display = "";
         if (elPrevCustomersBtn) elPrevCustomersBtn.style.display = "";
         if (elNextCustomersBtn) elNextCustomersBtn.style.display = "";
         if (elReloadBtn) elReloadBtn.style.display = "";
 
-        await loadCustomersPage(0);
+        customersPrevCursors = [];
+        await loadCustomersPage(null);
     }
 
     async function loadSelectedCustomerReport() {
@@ -731,11 +929,10 @@
         }
 
         try {
-            const res = await apiFetch(`/customers/${encodeURIComponent(customerId)}`);
-            const row = await res.json();
-            currentReport = extractReport(row);
+            const cid = encodeURIComponent(customerId);
+            currentReport = await loadReport(`/customers/${cid}/modules`, `/customers/${cid}`);
+            await show();
             setStatus(`Loaded report for customer_id=${customerId}.`);
-            render();
         } catch (e) {
             setStatus("");
             setError(String(e));
@@ -754,46 +951,53 @@
             currentMode = "JSON";
             elBtnJson.classList.add("active");
             if (elBtnXml) elBtnXml.classList.remove("active");
-            render();
+            show();
         });
 
         if (elBtnXml) elBtnXml.addEventListener("click", () => {
             currentMode = "XML";
             elBtnXml.classList.add("active");
             if (elBtnJson) elBtnJson.classList.remove("active");
-            render();
+            show();
         });
 
-        if (elReloadBtn) elReloadBtn.addEventListener("click", () => loadCustomersPage(customersOffset));
+        if (elReloadBtn) elReloadBtn.addEventListener("click", reloadCustomers);
+
+        if (elCustomerSearch) elCustomerSearch.addEventListener("input", onSearchInput);
 
         if (elPrevCustomersBtn) elPrevCustomersBtn.addEventListener("click", () => {
-            const nextOffset = Math.max(0, customersOffset - PAGE_LIMIT);
-            loadCustomersPage(nextOffset);
+            if (customersPrevCursors.length === 0) return;
+            loadCustomersPage(customersPrevCursors.pop());
         });
 
         if (elNextCustomersBtn) elNextCustomersBtn.addEventListener("click", () => {
-            const nextOffset = customersOffset + PAGE_LIMIT;
-            loadCustomersPage(nextOffset);
+            if (!customersNextCursor) return;
+            customersPrevCursors.push(customersCursor);
+            loadCustomersPage(customersNextCursor);
         });
 
         if (elLoadBtn) elLoadBtn.addEventListener("click", loadSelectedCustomerReport);
 
         if (elLogoutBtn) elLogoutBtn.addEventListener("click", logoutToLogin);
 
-        if (elDownloadJson) elDownloadJson.addEventListener("click", () => {
+        if (elDownloadJson) elDownloadJson.addEventListener("click", async () => {
             if (!currentReport) return;
+            try { await ensureFullReport(); } catch (e) { setError(String(e)); return; }
             const parsed = safeJsonParse(currentReport.json);
             const content = parsed ? JSON.stringify(parsed, null, 2) : String(currentReport.json ?? "");
             downloadText(`${buildBaseFilename(currentReport)}.json`, content, "application/json");
         });
 
-        if (elDownloadXml) elDownloadXml.addEventListener("click", () => {
+        if (elDownloadXml) elDownloadXml.addEventListener("click", async () => {
             if (!currentReport) return;
+            try { await ensureFullReport(); } catch (e) { setError(String(e)); return; }
             downloadText(`${buildBaseFilename(currentReport)}.xml`, String(currentReport.xml ?? ""), "application/xml");
         });
 
-        if (elPrintBtn) elPrintBtn.addEventListener("click", () => {
+        if (elPrintBtn) elPrintBtn.addEventListener("click", async () => {
             if (!currentReport) return;
+            // print every module, not just the opened sections
+            try { await ensureFullReport(); } catch (e) { setError(String(e)); return; }
 
             const prevModule = currentModule;
             if (prevModule !== "customer_reports") setActiveModule("customer_reports");